@@ -8,29 +8,51 @@ Calculation of features for NetSimile algorithm.
 
 import networkx as nx
 import numpy as np
+from scipy import sparse as sps
 from scipy import stats
 
+from .sampling import sample_nodes, sample_indices, StreamingMoments, QuantileSketch
+
 _eps = 1e-10
 
 
-def get_features(G):
-    """Extract features for NetSimile algorithm."""
-    nodes = list(G.nodes())
+def get_features(G, nodes=None):
+    """Extract features for NetSimile algorithm.
+
+    Parameters
+    ----------
+    G : networkx graph
+
+    nodes : list, optional (default=None)
+        Nodes whose features are extracted, in row order. Features still
+        depend on the whole graph. All nodes of G if None.
+
+    Returns
+    -------
+    feature_mat : NumPy array
+        One row of 7 features per node.
+    """
+    subset = nodes is not None
+    nodes = list(nodes) if subset else list(G.nodes())
     n = len(nodes)
     if n == 0:
         return np.empty((0, 7))
 
-    node_to_idx = {node: idx for idx, node in enumerate(nodes)}
+    # neighbors
+    neighbors = [list(G.neighbors(node)) for node in nodes]
+
+    # degrees and clustering coefficients are needed for the nodes and their neighbors
+    context = list(set(nodes).union(*neighbors)) if subset else nodes
+    node_to_idx = {node: idx for idx, node in enumerate(context)}
 
     # degrees
-    d_vec = np.array([G.degree(node) for node in nodes], dtype=float)
+    deg_vec = np.array([G.degree(node) for node in context], dtype=float)
+    d_vec = deg_vec[[node_to_idx[node] for node in nodes]] if subset else deg_vec
 
     # clustering coefficient
-    clust_dict = nx.clustering(G)
-    clust_vec = np.array([clust_dict[node] for node in nodes], dtype=float)
-
-    # neighbors
-    neighbors = [list(G.neighbors(node)) for node in nodes]
+    clust_dict = nx.clustering(G, context) if subset else nx.clustering(G)
+    context_clust = np.array([clust_dict[node] for node in context], dtype=float)
+    clust_vec = context_clust[[node_to_idx[node] for node in nodes]] if subset else context_clust
 
     # average degree of neighbors
     neighbor_deg = []
@@ -38,7 +60,7 @@ def get_features(G):
         neighbor_nodes = neighbors[i]
         if neighbor_nodes:
             neighbor_indices = [node_to_idx[neighbor] for neighbor in neighbor_nodes]
-            deg_sum = d_vec[neighbor_indices].sum()
+            deg_sum = deg_vec[neighbor_indices].sum()
             avg_deg = deg_sum / len(neighbor_nodes)
         else:
             avg_deg = 0
@@ -50,7 +72,7 @@ def get_features(G):
         neighbor_nodes = neighbors[i]
         if neighbor_nodes:
             neighbor_indices = [node_to_idx[neighbor] for neighbor in neighbor_nodes]
-            clust_sum = clust_vec[neighbor_indices].sum()
+            clust_sum = context_clust[neighbor_indices].sum()
             avg_clust = clust_sum / len(neighbor_nodes)
         else:
             avg_clust = 0
@@ -100,6 +122,121 @@ def get_features(G):
     return feature_mat
 
 
+# Columns of get_directed_features, in order. The layout is the same for every
+# directed graph flavor, so their aggregates can be stored and compared.
+DIRECTED_FEATURES = [
+    "in_degree",
+    "out_degree",
+    "clustering",
+    "fanin_avg_in_degree",
+    "fanout_avg_out_degree",
+    "neighbor_avg_clustering",
+    "fanin_ego_edges",
+    "fanout_ego_edges",
+    "fanin_ego_neighbors",
+    "fanout_ego_neighbors",
+    "fanin_ego_boundary",
+    "fanout_ego_boundary",
+]
+
+
+def _row_sums(M):
+    return np.asarray(M.sum(axis=1), dtype=float).ravel()
+
+
+def _safe_divide(a, b):
+    return np.divide(a, b, out=np.zeros_like(a), where=b > 0)
+
+
+def _ego_features(M, A):
+    """Edges inside, distinct neighbors outside, and boundary edges of the
+    egonets given by the rows of the binary membership matrix M, following the
+    edges of A."""
+    reached = (M @ A).tocsr()
+    inside = _row_sums(reached.multiply(M))
+    boundary = _row_sums(reached) - inside
+    reached.data[:] = 1
+    outside = np.diff(reached.indptr) - np.diff(reached.multiply(M).tocsr().indptr)
+    return inside, outside, boundary
+
+
+def get_directed_features(A, rows=None):
+    """Extract directed NetSimile features from a sparse adjacency matrix.
+
+    All features are computed in one vectorized pass over the CSR matrix
+    (successors) and the CSR matrix of its transpose (predecessors, i.e. the
+    CSC layout of A), without networkx.
+
+    Parameters
+    ----------
+    A : scipy sparse matrix
+        Binary adjacency matrix of a directed graph without self loops, with
+        A[u, v] = 1 for an edge u -> v.
+
+    rows : NumPy array, optional (default=None)
+        Nodes whose features are extracted, in row order. Features still
+        depend on the whole graph. All nodes if None.
+
+    Returns
+    -------
+    feature_mat : NumPy array
+        One row per node, with the columns of DIRECTED_FEATURES: in and out
+        degree, directed clustering coefficient, average in-degree of the
+        fanins and out-degree of the fanouts, average clustering of the
+        neighbors, and for the fanin egonet (node and predecessors) and fanout
+        egonet (node and successors): the edges inside the egonet, the
+        distinct nodes adjacent to it, and the edges entering (fanin) or
+        leaving (fanout) it.
+    """
+    A = sps.csr_matrix(A, dtype=float)
+    n = A.shape[0]
+    rows = np.arange(n) if rows is None else np.asarray(rows)
+    if len(rows) == 0:
+        return np.empty((0, len(DIRECTED_FEATURES)))
+
+    AT = A.T.tocsr()
+    S = (A + AT).tocsr()
+    in_deg = _row_sums(AT)
+    out_deg = _row_sums(A)
+    A_rows, AT_rows, S_rows = A[rows], AT[rows], S[rows]
+
+    # Clustering of the rows and of all their neighbors
+    neighbors = S_rows.copy()
+    neighbors.data[:] = 1
+    context = np.union1d(rows, neighbors.indices)
+    S_context, A_context = S[context], A[context]
+    triangles = _row_sums((S_context @ S).multiply(S_context))
+    total_degree = _row_sums(S_context)
+    reciprocal = _row_sums(A_context.multiply(AT[context]))
+    clustering = np.zeros(n)
+    clustering[context] = _safe_divide(triangles, 2 * (total_degree * (total_degree - 1) - 2 * reciprocal))
+
+    # Egonets as binary membership matrices: the node itself and its fanins or fanouts
+    identity = sps.csr_matrix((np.ones(len(rows)), (np.arange(len(rows)), rows)), shape=(len(rows), n))
+    fanin_ego = (identity + AT_rows).tocsr()
+    fanout_ego = (identity + A_rows).tocsr()
+    # Following the transposed edges, the fanin boundary counts the edges entering the egonet
+    fanin_inside, fanin_outside, fanin_boundary = _ego_features(fanin_ego, AT)
+    fanout_inside, fanout_outside, fanout_boundary = _ego_features(fanout_ego, A)
+
+    feature_mat = np.array([
+        in_deg[rows],
+        out_deg[rows],
+        clustering[rows],
+        _safe_divide(AT_rows @ in_deg, in_deg[rows]),
+        _safe_divide(A_rows @ out_deg, out_deg[rows]),
+        _safe_divide(neighbors @ clustering, np.diff(neighbors.indptr).astype(float)),
+        fanin_inside,
+        fanout_inside,
+        fanin_outside,
+        fanout_outside,
+        fanin_boundary,
+        fanout_boundary,
+    ], dtype=float).T
+
+    return feature_mat
+
+
 def aggregate_features(feature_mat, row_var=False, as_matrix=False):
     """Returns column-wise descriptive statistics of a feature matrix.
 
@@ -172,3 +309,129 @@ def aggregate_features(feature_mat, row_var=False, as_matrix=False):
     if not as_matrix:
         description = description.flatten()
     return description
+
+
+def aggregate_sampled_features(G, sample_size, method="uniform", seed=0,
+                               batch_size=1024, z=1.96):
+    """Approximate aggregate_features(get_features(G)) from a sample of nodes.
+
+    Features are extracted for batches of sampled nodes and folded into
+    streaming moment estimators and a quantile sketch, so time and memory are
+    bounded by the sample size rather than the graph size.
+
+    Parameters
+    ----------
+    G : networkx graph
+
+    sample_size : int
+        Number of sampled nodes, see sampling.sample_nodes.
+
+    method : str, optional (default="uniform")
+        "uniform" or "degree" (degree-stratified) sampling.
+
+    seed : int, optional (default=0)
+        Seed of the node sample.
+
+    batch_size : int, optional (default=1024)
+        Number of nodes whose features are held in memory at a time.
+
+    z : float, optional (default=1.96)
+        Normal quantile of the error bounds (1.96 for 95% confidence).
+
+    Returns
+    -------
+    description : NumPy array
+        Mean, median, std, skewness and kurtosis of each feature, flattened
+        as in aggregate_features.
+
+    error : NumPy array
+        Error bound of each statistic of description, with the finite
+        population correction: grouped jackknife standard errors for the
+        moments, and a distribution-free rank interval widened by the sketch
+        rank error for the median. All zero if every node is used.
+    """
+    nodes, weights = sample_nodes(G, sample_size, method, seed)
+    return _aggregate_sampled(lambda batch: get_features(G, batch), nodes, weights,
+                              G.number_of_nodes(), 7, batch_size, z)
+
+
+def aggregate_sampled_directed_features(A, sample_size, method="uniform", seed=0,
+                                        batch_size=1024, z=1.96):
+    """Approximate aggregate_features(get_directed_features(A)) from a sample
+    of nodes, see aggregate_sampled_features.
+
+    Parameters
+    ----------
+    A : scipy sparse matrix
+        Binary adjacency matrix of a directed graph, see get_directed_features.
+
+    sample_size, method, seed, batch_size, z
+        As in aggregate_sampled_features. Degree-stratified sampling uses the
+        total (in + out) degree.
+
+    Returns
+    -------
+    description, error : NumPy array
+        As in aggregate_sampled_features.
+    """
+    A = sps.csr_matrix(A)
+    degrees = np.diff(A.indptr) + np.bincount(A.indices, minlength=A.shape[0]) if method == "degree" else None
+    index, weights = sample_indices(A.shape[0], sample_size, method, seed, degrees)
+    return _aggregate_sampled(lambda batch: get_directed_features(A, batch), index, weights,
+                              A.shape[0], len(DIRECTED_FEATURES), batch_size, z)
+
+
+def _aggregate_sampled(extract, nodes, weights, num_nodes, num_features, batch_size, z):
+    """Streaming aggregates and error bounds of the features returned by
+    extract for batches of sampled nodes, see aggregate_sampled_features."""
+    # Sampled nodes are dealt round-robin into groups for the jackknife error
+    groups = [StreamingMoments(num_features) for _ in range(_jackknife_groups)]
+    sketches = [QuantileSketch() for _ in range(num_features)]
+    for start in range(0, len(nodes), batch_size):
+        features = extract(nodes[start:start + batch_size])
+        batch_weights = weights[start:start + batch_size]
+        for g, group in enumerate(groups):
+            offset = (g - start) % _jackknife_groups
+            group.update(features[offset::_jackknife_groups], batch_weights[offset::_jackknife_groups])
+        for j, sketch in enumerate(sketches):
+            sketch.update(features[:, j], batch_weights)
+
+    moments = _merged(groups)
+    if moments.count == 0:
+        return aggregate_features(np.empty((0, num_features))), np.zeros(5 * num_features)
+
+    median = np.array([sketch.quantile(0.5) for sketch in sketches])
+    description = np.vstack([_moment_statistics(moments)[:1], median,
+                             _moment_statistics(moments)[1:]])
+
+    # Delete-one-group jackknife standard errors of the moment statistics
+    fpc = np.sqrt(max(num_nodes - moments.count, 0) / max(num_nodes - 1, 1))
+    replicates = np.array([_moment_statistics(_merged(groups[:g] + groups[g + 1:]))
+                           for g, group in enumerate(groups) if group.count])
+    k = len(replicates)
+    with np.errstate(invalid="ignore"):
+        moment_se = np.sqrt((k - 1) / k * ((replicates - replicates.mean(axis=0)) ** 2).sum(axis=0))
+    moment_error = np.nan_to_num(z * fpc * moment_se) if k > 1 else np.zeros((4, num_features))
+
+    # Distribution-free interval of the median from the ranks of the sketch
+    rank_eps = z * fpc * 0.5 / np.sqrt(moments.effective_count)
+    median_error = np.array([sketch.rank_error(0.5, rank_eps) for sketch in sketches])
+
+    error = np.vstack([moment_error[:1], median_error, moment_error[1:]])
+    return description.flatten(), error.flatten()
+
+
+# Number of node groups of the jackknife error of aggregate_sampled_features
+_jackknife_groups = 20
+
+
+def _merged(groups):
+    moments = StreamingMoments(len(groups[0].mean))
+    for group in groups:
+        moments.merge(group)
+    return moments
+
+
+def _moment_statistics(moments):
+    """Mean, std, skewness and kurtosis, as computed by aggregate_features."""
+    return np.array([moments.mean, moments.std(), moments.skewness(), moments.kurtosis()])
@@ -1,6 +1,8 @@
 import numpy as np
 
-from .features import get_features, aggregate_features
+from .features import get_features, aggregate_features, aggregate_sampled_features, \
+    get_directed_features, aggregate_sampled_directed_features
+from . import features
 from .matrices import _flat
 
 
@@ -21,18 +23,50 @@ def _canberra_dist(v1, v2):
         d_can += d_update
     return d_can
 
-def netsimile(G1, G2):
+def _canberra_bound(v1, v2, e1, e2):
+    """First-order bound on the change of the Canberra distance between v1 and
+    v2 when they are off by at most e1 and e2. Each dimension contributes at
+    most 1, and its derivative is bounded by 2 / (|u| + |w|)."""
+    eps = 1e-15
+    denom = np.abs(v1) + np.abs(v2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        bound = np.where(denom < eps, 0.0, np.minimum(1.0, 2 * (e1 + e2) / denom))
+    return float(np.nansum(bound))
+
+
+def netsimile(G1, G2, sample_size=None, sampling="uniform", seed=0,
+              return_error=False):
     """NetSimile distance between two graphs.
 
     Parameters
     ----------
     G1, G2 : networkx graph
 
+    sample_size : int, optional (default=None)
+        If given, the features of a graph with more nodes are aggregated over
+        a sample of this many nodes instead of all nodes, which bounds the cost
+        regardless of the graph size. See features.aggregate_sampled_features.
+
+    sampling : str, optional (default="uniform")
+        "uniform" or "degree" (degree-stratified) node sampling.
+
+    seed : int, optional (default=0)
+        Seed of the node samples.
+
+    return_error : bool, optional (default=False)
+        If True, also return a bound on the error of the distance due to
+        sampling.
+
     Returns
     -------
     d_can : Float
         The distance between the two graphs.
 
+    error : Float
+        Only if return_error is True. Conservative first-order bound on the
+        sampling error of d_can from the approximate 95% error bounds of the
+        aggregates, 0 without sampling.
+
     Notes
     -----
     NetSimile works on graphs without node correspondence. Graphs to not need to
@@ -44,8 +78,62 @@ def netsimile(G1, G2):
     References
     ----------
     """
-    feat_G1, feat_G2 = [get_features(G) for G in [G1, G2]]
-    agg_A1, agg_A2 = [aggregate_features(feat) for feat in [feat_G1, feat_G2]]
+    aggregates = [netsimile_aggregate(G, sample_size, sampling, seed) for G in [G1, G2]]
+    return netsimile_distance(*aggregates, return_error=return_error)
+
+
+def netsimile_aggregate(G, sample_size=None, sampling="uniform", seed=0):
+    """Aggregated NetSimile features of a single graph, see netsimile.
+
+    Returns
+    -------
+    aggregate : (NumPy array, NumPy array)
+        The aggregate vector and its sampling error bounds.
+    """
+    if sample_size is None or G.number_of_nodes() <= sample_size:
+        return aggregate_features(get_features(G)), np.zeros(35)
+    return aggregate_sampled_features(G, sample_size, sampling, seed)
+
+
+def netsimile_distance(aggregate1, aggregate2, return_error=False):
+    """NetSimile distance between two graphs from their aggregates, as
+    returned by netsimile_aggregate or directed_netsimile_aggregate."""
+    (agg_A1, err_A1), (agg_A2, err_A2) = aggregate1, aggregate2
     # calculate Canberra distance between two aggregate vectors
     d_can = _canberra_dist(agg_A1, agg_A2)
+    if return_error:
+        return d_can, _canberra_bound(agg_A1, agg_A2, err_A1, err_A2)
     return d_can
+
+
+def directed_netsimile(A1, A2, sample_size=None, sampling="uniform", seed=0,
+                       return_error=False):
+    """NetSimile distance between two directed graphs, from the directed
+    features of features.get_directed_features.
+
+    Parameters
+    ----------
+    A1, A2 : scipy sparse matrix
+        Binary adjacency matrices of the graphs.
+
+    sample_size, sampling, seed, return_error
+        As in netsimile.
+
+    Returns
+    -------
+    d_can : Float
+        The distance between the two graphs.
+
+    error : Float
+        Only if return_error is True, as in netsimile.
+    """
+    aggregates = [directed_netsimile_aggregate(A, sample_size, sampling, seed) for A in [A1, A2]]
+    return netsimile_distance(*aggregates, return_error=return_error)
+
+
+def directed_netsimile_aggregate(A, sample_size=None, sampling="uniform", seed=0):
+    """Aggregated directed NetSimile features of a single graph, see
+    directed_netsimile and netsimile_aggregate."""
+    if sample_size is None or A.shape[0] <= sample_size:
+        return aggregate_features(get_directed_features(A)), np.zeros(5 * len(features.DIRECTED_FEATURES))
+    return aggregate_sampled_directed_features(A, sample_size, sampling, seed)
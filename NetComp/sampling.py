@@ -0,0 +1,238 @@
+"""
+********
+Sampling
+********
+
+Node sampling and streaming statistics for approximate NetSimile on large
+graphs.
+"""
+
+import numpy as np
+
+# Number of degree strata of degree-stratified sampling (log2 degree buckets)
+_num_strata = 16
+
+
+def sample_nodes(G, sample_size, method="uniform", seed=0):
+    """Draw a seeded sample of nodes without replacement.
+
+    Parameters
+    ----------
+    G : networkx graph
+
+    sample_size : int
+        Number of sampled nodes, approximate for degree-stratified sampling.
+        All nodes are returned if the graph is not larger.
+
+    method : str, optional (default="uniform")
+        "uniform" samples every node with the same probability. "degree"
+        samples each log2 degree bucket proportionally to its size, with at
+        least one node per bucket, so that rare high-degree nodes are covered.
+
+    seed : int, optional (default=0)
+        Seed of the random generator.
+
+    Returns
+    -------
+    nodes : list
+        The sampled nodes, in graph order.
+
+    weights : NumPy array
+        Number of graph nodes represented by each sampled node (inverse
+        inclusion probability).
+    """
+    nodes = list(G.nodes())
+    degrees = np.array([d for _, d in G.degree(nodes)], dtype=float) if method == "degree" else None
+    index, weights = sample_indices(len(nodes), sample_size, method, seed, degrees)
+    return [nodes[i] for i in index], weights
+
+
+def sample_indices(n, sample_size, method="uniform", seed=0, degrees=None):
+    """Draw a seeded sample of node indices without replacement, see
+    sample_nodes.
+
+    Parameters
+    ----------
+    n : int
+        Number of nodes.
+
+    sample_size, method, seed
+        As in sample_nodes.
+
+    degrees : NumPy array, optional (default=None)
+        Degree of every node, required for degree-stratified sampling.
+
+    Returns
+    -------
+    index : NumPy array
+        The sorted sampled indices.
+
+    weights : NumPy array
+        Number of nodes represented by each sampled index.
+    """
+    if sample_size >= n:
+        return np.arange(n), np.ones(n)
+
+    rng = np.random.default_rng(seed)
+    if method == "uniform":
+        index = np.sort(rng.choice(n, size=sample_size, replace=False))
+        return index, np.full(sample_size, n / sample_size)
+    if method != "degree":
+        raise ValueError(f"Unknown sampling method '{method}', expected 'uniform' or 'degree'.")
+
+    strata = np.minimum(np.log2(np.asarray(degrees) + 1).astype(int), _num_strata - 1)
+    sizes = np.bincount(strata, minlength=_num_strata)
+
+    # Proportional allocation, rounded down, at least one node per non-empty stratum
+    allocation = np.minimum(sizes, np.maximum(sizes * sample_size // n, sizes > 0))
+    index, weights = [], []
+    for stratum in np.flatnonzero(allocation):
+        members = np.flatnonzero(strata == stratum)
+        index.append(rng.choice(members, size=allocation[stratum], replace=False))
+        weights.append(np.full(allocation[stratum], sizes[stratum] / allocation[stratum]))
+
+    index, weights = np.concatenate(index), np.concatenate(weights)
+    order = np.argsort(index)
+    return index[order], weights[order]
+
+
+class StreamingMoments:
+    """Weighted mean, variance, skewness and kurtosis of the columns of a
+    stream of observation batches.
+
+    Batches are merged with the pairwise update formulas of Pebay (2008), so
+    memory does not depend on the number of observations.
+    """
+
+    def __init__(self, num_columns):
+        self.count = 0
+        self.weight = 0.0
+        self.weight_sq = 0.0
+        self.mean = np.zeros(num_columns)
+        self.m2 = np.zeros(num_columns)
+        self.m3 = np.zeros(num_columns)
+        self.m4 = np.zeros(num_columns)
+        self.min = np.full(num_columns, np.inf)
+        self.max = np.full(num_columns, -np.inf)
+
+    def update(self, values, weights):
+        """Add a batch of observations (rows of values) with their weights."""
+        if len(values) == 0:
+            return
+        batch = StreamingMoments(values.shape[1])
+        w = np.asarray(weights, dtype=float)[:, None]
+        batch.count = len(values)
+        batch.weight = w.sum()
+        batch.weight_sq = (w ** 2).sum()
+        batch.mean = (w * values).sum(axis=0) / batch.weight
+        centered = values - batch.mean
+        batch.m2 = (w * centered ** 2).sum(axis=0)
+        batch.m3 = (w * centered ** 3).sum(axis=0)
+        batch.m4 = (w * centered ** 4).sum(axis=0)
+        batch.min = values.min(axis=0)
+        batch.max = values.max(axis=0)
+        self.merge(batch)
+
+    def merge(self, other):
+        """Add the observations summarized by another StreamingMoments."""
+        if other.count == 0:
+            return
+        na, nb = self.weight, other.weight
+        n = na + nb
+        delta = other.mean - self.mean
+        m2_a, m3_a, m4_a = self.m2, self.m3, self.m4
+        m2_b, m3_b, m4_b = other.m2, other.m3, other.m4
+        self.m4 = (m4_a + m4_b + delta ** 4 * na * nb * (na ** 2 - na * nb + nb ** 2) / n ** 3
+                   + 6 * delta ** 2 * (na ** 2 * m2_b + nb ** 2 * m2_a) / n ** 2
+                   + 4 * delta * (na * m3_b - nb * m3_a) / n)
+        self.m3 = (m3_a + m3_b + delta ** 3 * na * nb * (na - nb) / n ** 2
+                   + 3 * delta * (na * m2_b - nb * m2_a) / n)
+        self.m2 = m2_a + m2_b + delta ** 2 * na * nb / n
+        self.mean = self.mean + delta * nb / n
+
+        self.count += other.count
+        self.weight = n
+        self.weight_sq += other.weight_sq
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+
+    @property
+    def effective_count(self):
+        """Kish effective sample size of the weighted observations."""
+        return self.weight ** 2 / self.weight_sq if self.weight_sq else 0.0
+
+    def std(self):
+        return np.sqrt(self.m2 / self.weight)
+
+    def skewness(self, delta=1e-8):
+        """Bias-corrected skewness, as scipy.stats.skew(bias=False), 0 for
+        (nearly) constant columns."""
+        n = self.count
+        with np.errstate(divide="ignore", invalid="ignore"):
+            g1 = np.sqrt(self.weight) * self.m3 / self.m2 ** 1.5
+            if n > 2:
+                g1 = np.sqrt(n * (n - 1)) / (n - 2) * g1
+        return np.where(self.max - self.min < delta, 0.0, g1)
+
+    def kurtosis(self, delta=1e-8):
+        """Bias-corrected excess kurtosis, as scipy.stats.kurtosis(bias=False),
+        0 for (nearly) constant columns."""
+        n = self.count
+        with np.errstate(divide="ignore", invalid="ignore"):
+            g2 = self.weight * self.m4 / self.m2 ** 2 - 3
+            if n > 3:
+                g2 = ((n + 1) * g2 + 6) * (n - 1) / ((n - 2) * (n - 3))
+        return np.where(self.max - self.min < delta, 0.0, g2)
+
+
+class QuantileSketch:
+    """Mergeable weighted quantile sketch of a stream of values.
+
+    Values are kept exactly until there are more than 2 * capacity of them,
+    then compressed into capacity centroids of equal weight. The rank error of
+    a quantile is then at most about 1 / capacity of the total weight.
+    """
+
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+        self.values = np.empty(0)
+        self.weights = np.empty(0)
+        self.compressed = False
+
+    def update(self, values, weights):
+        """Add values with their weights."""
+        self.values = np.concatenate([self.values, values])
+        self.weights = np.concatenate([self.weights, weights])
+        if len(self.values) > 2 * self.capacity:
+            self._compress()
+
+    def _compress(self):
+        order = np.argsort(self.values, kind="stable")
+        values, weights = self.values[order], self.weights[order]
+        start = np.cumsum(weights) - weights
+        bins = np.minimum((start / weights.sum() * self.capacity).astype(int), self.capacity - 1)
+
+        bin_weights = np.bincount(bins, weights=weights, minlength=self.capacity)
+        bin_sums = np.bincount(bins, weights=weights * values, minlength=self.capacity)
+        kept = bin_weights > 0
+        self.values = bin_sums[kept] / bin_weights[kept]
+        self.weights = bin_weights[kept]
+        self.compressed = True
+
+    def quantile(self, q):
+        """Weighted quantile q in [0, 1], interpolated between the midpoints of
+        the sorted values (the median equals np.median for unit weights and
+        uncompressed data)."""
+        if len(self.values) == 0:
+            return np.nan
+        order = np.argsort(self.values, kind="stable")
+        values, weights = self.values[order], self.weights[order]
+        positions = np.cumsum(weights) - weights / 2
+        return float(np.interp(q * weights.sum(), positions, values))
+
+    def rank_error(self, q, rank_eps=0.0):
+        """Half the spread of the values whose rank is within rank_eps (as a
+        fraction of the total weight) of quantile q, widened by the rank error
+        of the sketch once it is compressed."""
+        eps = rank_eps + (1 / self.capacity if self.compressed else 0.0)
+        return (self.quantile(min(q + eps, 1)) - self.quantile(max(q - eps, 0))) / 2
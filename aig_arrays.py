@@ -0,0 +1,184 @@
+import hashlib
+from typing import NamedTuple
+
+import numpy as np
+from aigverse import Aig, to_index_list
+
+
+class AigArrays(NamedTuple):
+    """
+    Flat array view of an AIG.
+
+    Nodes are numbered as in the AIGER format: node 0 is the constant, nodes 1..num_pis are the primary inputs and
+    the following num_gates nodes are the AND gates in topological order. Signals are stored as literals
+    (2 * node + complement).
+
+    Fields:
+    -------
+    num_pis : int
+        Number of primary inputs.
+    fanin0, fanin1 : np.ndarray (int32, shape (num_gates,))
+        Fanin literals of every AND gate.
+    pos : np.ndarray (int32, shape (num_pos,))
+        Literals driving the primary outputs.
+    levels : np.ndarray (int32, shape (num_nodes,))
+        Logic level of every node (0 for the constant and the primary inputs).
+    """
+    num_pis: int
+    fanin0: np.ndarray
+    fanin1: np.ndarray
+    pos: np.ndarray
+    levels: np.ndarray
+
+    @property
+    def num_gates(self) -> int:
+        return len(self.fanin0)
+
+    @property
+    def num_pos(self) -> int:
+        return len(self.pos)
+
+    @property
+    def num_nodes(self) -> int:
+        return 1 + self.num_pis + self.num_gates
+
+
+def compute_levels(num_pis: int, fanin0: np.ndarray, fanin1: np.ndarray) -> np.ndarray:
+    """
+    Compute the logic level of every node from the fanin literals of the gates.
+
+    Parameters:
+    -----------
+    num_pis : int
+        Number of primary inputs.
+    fanin0, fanin1 : np.ndarray
+        Fanin literals of the gates, in topological order.
+
+    Returns:
+    --------
+    levels : np.ndarray (int32)
+        Level of every node, indexed by node number.
+    """
+    levels = [0] * (1 + num_pis + len(fanin0))
+    first_gate = 1 + num_pis
+
+    # Gates are topologically ordered, so a single forward pass is enough
+    for i, (lit0, lit1) in enumerate(zip((fanin0 >> 1).tolist(), (fanin1 >> 1).tolist())):
+        levels[first_gate + i] = 1 + max(levels[lit0], levels[lit1])
+
+    return np.asarray(levels, dtype=np.int32)
+
+
+def to_aig_arrays(aig: Aig) -> AigArrays:
+    """
+    Convert an AIG into its flat array representation.
+
+    Parameters:
+    aig (Aig): The input AIG. AigArrays are returned unchanged.
+
+    Returns:
+    AigArrays: The fanin, output and level arrays of the AIG.
+    """
+    if isinstance(aig, AigArrays):
+        return aig
+
+    # The index list is laid out as [num_pis, num_pos, num_gates, fanin literals..., output literals...]
+    raw = np.asarray(to_index_list(aig).raw(), dtype=np.int32)
+    num_pis, num_pos, num_gates = (int(x) for x in raw[:3])
+
+    gate_lits = raw[3:3 + 2 * num_gates]
+    fanin0 = gate_lits[0::2].copy()
+    fanin1 = gate_lits[1::2].copy()
+    pos = raw[3 + 2 * num_gates:3 + 2 * num_gates + num_pos].copy()
+
+    return AigArrays(num_pis, fanin0, fanin1, pos, compute_levels(num_pis, fanin0, fanin1))
+
+
+def aig_digest(aig: Aig) -> str:
+    """
+    Compute a digest of the content of an AIG, equal for AIGs with the same inputs, gates and outputs in the same
+    order, e.g. to cache results per AIG.
+
+    Parameters:
+    aig (Aig): The input AIG, or its AigArrays.
+
+    Returns:
+    str: The hexadecimal SHA-1 digest of the interface and the fanin and output literals.
+    """
+    arrays = to_aig_arrays(aig)
+    digest = hashlib.sha1(np.array([arrays.num_pis, arrays.num_gates, arrays.num_pos], dtype=np.int64).tobytes())
+    for lits in [arrays.fanin0, arrays.fanin1, arrays.pos]:
+        digest.update(np.ascontiguousarray(lits, dtype=np.int32).tobytes())
+    return digest.hexdigest()
+
+
+def _mix(x: np.ndarray) -> np.ndarray:
+    # splitmix64 finalizer, spreads every input bit over the whole 64-bit hash
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def structural_digest(aig: Aig) -> str:
+    """
+    Compute a canonical digest of the structure of an AIG, equal for AIGs that only differ in the numbering of their
+    gates and the order of the fanins of each gate. Inputs and outputs keep their order, since they define the
+    interface of the AIG. AIGER comments and symbol tables are not part of the parsed AIG to begin with.
+
+    Every node is hashed from the hashes of its fanins, level by level, so the digest does not depend on node numbers.
+
+    Parameters:
+    aig (Aig): The input AIG, or its AigArrays.
+
+    Returns:
+    str: The hexadecimal SHA-1 digest of the interface, the sorted gate hashes and the output hashes.
+    """
+    arrays = to_aig_arrays(aig)
+    first_gate = 1 + arrays.num_pis
+    complement_key = np.uint64(0x9E3779B97F4A7C15)
+
+    node_hashes = np.empty(arrays.num_nodes, dtype=np.uint64)
+    node_hashes[:first_gate] = _mix(np.arange(first_gate, dtype=np.uint64))
+
+    def lit_hashes(lits):
+        return node_hashes[lits >> 1] ^ (lits & 1).astype(np.uint64) * complement_key
+
+    # Fanins of a gate are on lower levels, so a pass per level sees all of them hashed
+    gate_levels = arrays.levels[first_gate:]
+    order = np.argsort(gate_levels, kind="stable")
+    bounds = np.searchsorted(gate_levels[order], np.arange(1, gate_levels.max(initial=0) + 2))
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        gates = order[start:end]
+        hash0, hash1 = lit_hashes(arrays.fanin0[gates]), lit_hashes(arrays.fanin1[gates])
+        node_hashes[first_gate + gates] = _mix(np.minimum(hash0, hash1) + _mix(np.maximum(hash0, hash1)))
+
+    digest = hashlib.sha1(np.array([arrays.num_pis, arrays.num_gates, arrays.num_pos], dtype=np.int64).tobytes())
+    digest.update(np.sort(node_hashes[first_gate:]).tobytes())
+    digest.update(lit_hashes(arrays.pos).tobytes())
+    return digest.hexdigest()
+
+
+def arrays_to_aig(arrays: AigArrays) -> Aig:
+    """
+    Rebuild an aigverse AIG from its flat array representation, e.g. to run aigverse optimizations on a cached AIG.
+
+    Parameters:
+    arrays (AigArrays): The fanin, output and level arrays of the AIG.
+
+    Returns:
+    Aig: The rebuilt AIG, with the same node numbering as the arrays.
+    """
+    aig = Aig()
+    signals = [aig.get_constant(False)]
+    signals.extend(aig.create_pi() for _ in range(arrays.num_pis))
+
+    def signal(lit):
+        return ~signals[lit >> 1] if lit & 1 else signals[lit >> 1]
+
+    for lit0, lit1 in zip(arrays.fanin0.tolist(), arrays.fanin1.tolist()):
+        signals.append(aig.create_and(signal(lit0), signal(lit1)))
+
+    for lit in arrays.pos.tolist():
+        aig.create_po(signal(lit))
+
+    return aig
@@ -0,0 +1,162 @@
+import argparse
+import os
+
+import numpy as np
+from aigverse import read_aiger_into_aig
+
+from aig_arrays import AigArrays, to_aig_arrays
+
+# Number of header entries in a cache file: [num_pis, num_pos, num_gates]
+_HEADER_SIZE = 3
+
+
+def folder_flow(folder_path: str) -> str:
+    """Flow of an AIG folder, the name of the folder, e.g. aigs for data/aigs/ or optimized for data/optimized/."""
+    return os.path.basename(os.path.normpath(folder_path))
+
+
+def cache_file_path(cache_path: str, flow: str, aig_type: str, filename: str) -> str:
+    """
+    Path of the binary cache file of an AIG: <cache_path>/<flow>/<type>/<id>.npy, mirroring the <type>/<id>.aig
+    layout of the AIGER folder of the flow (see folder_flow).
+    """
+    return os.path.join(cache_path, flow, aig_type, filename + ".npy")
+
+
+def save_aig_arrays(arrays: AigArrays, path: str):
+    """
+    Save the array representation of an AIG as a single int32 .npy file.
+
+    The file is laid out as [num_pis, num_pos, num_gates, fanin0..., fanin1..., pos..., levels...] so that every
+    field is a contiguous slice when the file is memory-mapped.
+
+    Parameters:
+    -----------
+    arrays : AigArrays
+        The AIG to save.
+    path : str
+        Path of the .npy file.
+    """
+    data = arrays_to_buffer(arrays)
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    # Write to a temporary file first, so that concurrent readers never see a partially written cache file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as file:
+        np.save(file, data)
+    os.replace(tmp_path, path)
+
+
+def load_aig_arrays(path: str) -> AigArrays:
+    """
+    Load the array representation of an AIG from its cache file without copying.
+
+    Parameters:
+    -----------
+    path : str
+        Path of the .npy file written by save_aig_arrays.
+
+    Returns:
+    --------
+    arrays : AigArrays
+        Read-only views into the memory-mapped cache file.
+    """
+    data = np.load(path, mmap_mode="r")
+    return arrays_from_buffer(data)
+
+
+def arrays_to_buffer(arrays: AigArrays) -> np.ndarray:
+    """Concatenate AigArrays into a flat int32 array in the cache file layout."""
+    header = np.array([arrays.num_pis, arrays.num_pos, arrays.num_gates], dtype=np.int32)
+    return np.concatenate([header, arrays.fanin0, arrays.fanin1, arrays.pos, arrays.levels]).astype(np.int32)
+
+
+def arrays_from_buffer(data: np.ndarray) -> AigArrays:
+    """Split a flat int32 array in the cache file layout into AigArrays views."""
+    num_pis, num_pos, num_gates = (int(x) for x in data[:_HEADER_SIZE])
+
+    offset = _HEADER_SIZE
+    fanin0 = data[offset:offset + num_gates]
+    fanin1 = data[offset + num_gates:offset + 2 * num_gates]
+    offset += 2 * num_gates
+    pos = data[offset:offset + num_pos]
+    offset += num_pos
+    levels = data[offset:offset + 1 + num_pis + num_gates]
+
+    return AigArrays(num_pis, fanin0, fanin1, pos, levels)
+
+
+def load_cached_aig_arrays(aig_path: str, cache_file: str) -> AigArrays:
+    """
+    Load the array representation of an AIGER file, (re)building its cache file if it is missing or outdated.
+
+    Parameters:
+    -----------
+    aig_path : str
+        Path of the AIGER file.
+    cache_file : str
+        Path of the corresponding cache file.
+
+    Returns:
+    --------
+    arrays : AigArrays
+    """
+    if not os.path.exists(cache_file) or os.path.getmtime(cache_file) < os.path.getmtime(aig_path):
+        save_aig_arrays(to_aig_arrays(read_aiger_into_aig(aig_path)), cache_file)
+
+    return load_aig_arrays(cache_file)
+
+
+def build_cache(folder_path: str, cache_path: str) -> int:
+    """
+    Convert every AIGER file in the <type>/<id>.aig layout of folder_path into a cache file under cache_path, at the
+    path read by main.py (see cache_file_path).
+
+    Parameters:
+    -----------
+    folder_path : str
+        Folder containing one sub-folder of AIGER files per AIG type.
+    cache_path : str
+        Folder of the cache, the files of folder_path are written in its sub-folder of the flow.
+
+    Returns:
+    --------
+    num_files : int
+        Number of AIGER files that are cached.
+    """
+    flow = folder_flow(folder_path)
+    num_files = 0
+    for aig_type in sorted(os.listdir(folder_path)):
+        type_path = os.path.join(folder_path, aig_type)
+        if not os.path.isdir(type_path):
+            continue
+
+        for aig_file in sorted(os.listdir(type_path)):
+            if not aig_file.endswith(".aig"):
+                continue
+            filename = aig_file[:-len(".aig")]
+            load_cached_aig_arrays(os.path.join(type_path, aig_file),
+                                   cache_file_path(cache_path, flow, aig_type, filename))
+            num_files += 1
+
+    return num_files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert AIGER files into memory-mappable binary cache files.")
+    parser.add_argument("--folder_path", type=str, nargs="+", help="Folders containing the AIG files",
+                        default=["data/aigs/", "data/optimized/"])
+    parser.add_argument("--cache_path", type=str, help="Folder in which the cache is written",
+                        default="data/cache/")
+    args = parser.parse_args()
+
+    for folder_path in args.folder_path:
+        # Each AIG folder gets its own sub-folder in the cache, e.g. data/cache/aigs/<type>/<id>.npy
+        num_files = build_cache(folder_path, args.cache_path)
+        cache_path = os.path.join(args.cache_path, folder_flow(folder_path))
+        print(f"Cached {num_files} AIGs from {folder_path} in {cache_path}")
+
+
+if __name__ == "__main__":
+    main()
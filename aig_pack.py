@@ -0,0 +1,203 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+from aigverse import read_aiger_into_aig
+
+from aig_arrays import AigArrays, to_aig_arrays, arrays_to_aig
+from aig_cache import arrays_to_buffer, arrays_from_buffer
+from aig_simulation import load_truth_table
+
+PACK_MAGIC = b"AIGPACK1"
+PACK_VERSION = 3
+
+# Header: magic, offset of the JSON index, length of the JSON index
+_HEADER = struct.Struct("<8sQQ")
+
+# Every blob starts on a 64-byte boundary, so its arrays can be viewed in place
+_ALIGNMENT = 64
+
+
+def aig_key(benchmark: str, flavor: str, flow: str = "aigs") -> str:
+    """Key of an AIG in the pack, flow is the name of its data folder (aigs, optimized, optimized_dc2, ...)."""
+    return f"aig/{flow}/{flavor}/{benchmark}"
+
+
+def truth_key(benchmark: str) -> str:
+    """Key of the truth table of a benchmark in the pack."""
+    return f"truth/{benchmark}"
+
+
+def _source_stat(path: str) -> dict:
+    # Modification times are compared in whole seconds, which copies to other filesystems keep
+    status = os.stat(path)
+    return {"source_size": status.st_size, "source_mtime": int(status.st_mtime)}
+
+
+def _write_blob(file, index: dict, key: str, data: np.ndarray, **attributes):
+    padding = (-file.tell()) % _ALIGNMENT
+    file.write(b"\0" * padding)
+
+    index[key] = {"offset": file.tell(), "dtype": data.dtype.str, "shape": list(data.shape), **attributes}
+    file.write(np.ascontiguousarray(data).tobytes())
+
+
+def build_pack(data_path: str, pack_path: str) -> int:
+    """
+    Bundle all AIG flows and truth tables of the dataset into a single indexed pack file.
+
+    The data folder is expected in the repository layout: one folder per flow (aigs, optimized, optimized_dc2, ...)
+    containing <flavor>/<benchmark>.aig files, and a truths folder with <benchmark>.truth files. AIGs are stored in
+    the aig_cache array layout and truth tables as packed 64-bit words. Entries are keyed by their path relative to
+    the data folder, and record the size and modification time of their source file, so that a copy of the pack or
+    of the dataset at another path can be used, and a stale entry is not (see AigPack.has_aig).
+
+    Parameters:
+    -----------
+    data_path : str
+        Root of the dataset, e.g. data/.
+    pack_path : str
+        Path of the pack file to write.
+
+    Returns:
+    --------
+    num_entries : int
+        Number of AIGs and truth tables in the pack.
+    """
+    index = {}
+    tmp_path = f"{pack_path}.{os.getpid()}.tmp"
+
+    with open(tmp_path, "wb") as file:
+        file.write(b"\0" * _HEADER.size)
+
+        for flow in sorted(os.listdir(data_path)):
+            flow_path = os.path.join(data_path, flow)
+            if (flow != "aigs" and not flow.startswith("optimized")) or not os.path.isdir(flow_path):
+                continue
+
+            for flavor in sorted(os.listdir(flow_path)):
+                flavor_path = os.path.join(flow_path, flavor)
+                if not os.path.isdir(flavor_path):
+                    continue
+
+                for aig_file in sorted(os.listdir(flavor_path)):
+                    if not aig_file.endswith(".aig"):
+                        continue
+                    aig_path = os.path.join(flavor_path, aig_file)
+                    arrays = to_aig_arrays(read_aiger_into_aig(aig_path))
+                    _write_blob(file, index, aig_key(aig_file[:-len(".aig")], flavor, flow), arrays_to_buffer(arrays),
+                                **_source_stat(aig_path))
+
+        truth_path = os.path.join(data_path, "truths")
+        if os.path.isdir(truth_path):
+            for truth_file in sorted(os.listdir(truth_path)):
+                if not truth_file.endswith(".truth"):
+                    continue
+                words, num_vars = load_truth_table(os.path.join(truth_path, truth_file))
+                _write_blob(file, index, truth_key(truth_file[:-len(".truth")]), words, num_vars=num_vars,
+                            **_source_stat(os.path.join(truth_path, truth_file)))
+
+        # The index goes after the blobs, the header at the start of the file points to it
+        index_bytes = json.dumps({"version": PACK_VERSION, "entries": index}).encode()
+        index_offset = file.tell()
+        file.write(index_bytes)
+        file.seek(0)
+        file.write(_HEADER.pack(PACK_MAGIC, index_offset, len(index_bytes)))
+
+    os.replace(tmp_path, pack_path)
+    return len(index)
+
+
+class AigPack:
+    """
+    Read-only view of a pack file written by build_pack.
+
+    The whole file is memory-mapped once, AIG arrays and truth tables are served as zero-copy NumPy views into it.
+    """
+
+    def __init__(self, pack_path: str):
+        self.pack_path = pack_path
+        self._warned = False
+        with open(pack_path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._mmap) < _HEADER.size or self._mmap[:len(PACK_MAGIC)] != PACK_MAGIC:
+            raise ValueError(f"{pack_path} is not an AIG pack file.")
+
+        _, index_offset, index_length = _HEADER.unpack_from(self._mmap, 0)
+
+        index = json.loads(self._mmap[index_offset:index_offset + index_length])
+        if index["version"] != PACK_VERSION:
+            raise ValueError(f"{pack_path} has pack version {index['version']}, expected {PACK_VERSION}.")
+        self._entries = index["entries"]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def keys(self):
+        return self._entries.keys()
+
+    def _array(self, key: str) -> np.ndarray:
+        entry = self._entries[key]
+        dtype = np.dtype(entry["dtype"])
+        count = int(np.prod(entry["shape"]))
+        data = np.frombuffer(self._mmap, dtype=dtype, count=count, offset=entry["offset"])
+        return data.reshape(entry["shape"])
+
+    def _is_current(self, key: str, path: str) -> bool:
+        # An entry is stale once its source file is rewritten, e.g. when the AIGs are regenerated
+        entry = self._entries[key]
+        try:
+            current = _source_stat(path)
+        except FileNotFoundError:
+            return True
+        if current == {name: entry[name] for name in current}:
+            return True
+        if not self._warned:
+            self._warned = True
+            print(f"{self.pack_path} is older than {path} and other files, they are read instead, rebuild the pack "
+                  f"with aig_pack.py")
+        return False
+
+    def has_aig(self, benchmark: str, flavor: str, flow: str = "aigs", path: str = None) -> bool:
+        """
+        Whether the pack holds an AIG. Given the path of its AIGER file, e.g. in a copy of the dataset, only if the
+        entry was packed from the file as it is now, or the file does not exist.
+        """
+        key = aig_key(benchmark, flavor, flow)
+        return key in self._entries and (path is None or self._is_current(key, path))
+
+    def aig_arrays(self, benchmark: str, flavor: str, flow: str = "aigs") -> AigArrays:
+        """Array representation of an AIG, as views into the pack file."""
+        return arrays_from_buffer(self._array(aig_key(benchmark, flavor, flow)))
+
+    def aig(self, benchmark: str, flavor: str, flow: str = "aigs"):
+        """An aigverse Aig rebuilt from the pack, for metrics that need aigverse algorithms."""
+        return arrays_to_aig(self.aig_arrays(benchmark, flavor, flow))
+
+    def has_truth_table(self, benchmark: str, path: str = None) -> bool:
+        """Whether the pack holds the truth table of a benchmark, given the path of its file only if current."""
+        key = truth_key(benchmark)
+        return key in self._entries and (path is None or self._is_current(key, path))
+
+    def truth_table(self, benchmark: str) -> (np.ndarray, int):
+        """Packed truth tables of a benchmark, in the format of aig_simulation.load_truth_table."""
+        key = truth_key(benchmark)
+        return self._array(key), self._entries[key]["num_vars"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bundle the AIG dataset into a single memory-mappable pack file.")
+    parser.add_argument("--data_path", type=str, help="Root folder of the dataset", default="data/")
+    parser.add_argument("--pack_path", type=str, help="Path of the pack file to write", default="data/dataset.pack")
+    args = parser.parse_args()
+
+    num_entries = build_pack(args.data_path, args.pack_path)
+    print(f"Packed {num_entries} AIGs and truth tables from {args.data_path} into {args.pack_path}")
+
+
+if __name__ == "__main__":
+    main()
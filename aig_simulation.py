@@ -0,0 +1,217 @@
+from functools import lru_cache
+
+import numpy as np
+
+from aig_arrays import AigArrays
+
+WORD_BITS = 64
+ALL_ONES = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+# Simulation words of the first six variables, all other variables are constant within a word
+_VAR_WORDS = np.array([0xAAAAAAAAAAAAAAAA, 0xCCCCCCCCCCCCCCCC, 0xF0F0F0F0F0F0F0F0,
+                       0xFF00FF00FF00FF00, 0xFFFF0000FFFF0000, 0xFFFFFFFF00000000], dtype=np.uint64)
+
+
+def num_words_for_vars(num_vars: int) -> int:
+    """Number of 64-bit words needed to hold a truth table over num_vars variables."""
+    return max(1, (1 << num_vars) // WORD_BITS)
+
+
+def popcount(words: np.ndarray) -> int:
+    """Total number of set bits in an array of 64-bit words."""
+    if hasattr(np, "bitwise_count"):
+        return int(np.bitwise_count(words).sum())
+    return int(np.unpackbits(np.ascontiguousarray(words).view(np.uint8)).sum())
+
+
+def complement_masks(lits: np.ndarray) -> np.ndarray:
+    """All-ones words for complemented literals, all-zeros words for regular ones."""
+    return (lits & 1).astype(np.uint64) * ALL_ONES
+
+
+def exhaustive_patterns(num_vars: int, start: int = 0, stop: int = None) -> np.ndarray:
+    """
+    Packed input patterns enumerating all minterms over num_vars variables.
+
+    Bit b of word w holds the value of each variable in minterm 64 * w + b, so the patterns of words [start, stop)
+    can be generated independently to simulate large input spaces block by block.
+
+    Parameters:
+    -----------
+    num_vars : int
+        Number of input variables.
+    start, stop : int
+        Range of words to generate. Defaults to all words.
+
+    Returns:
+    --------
+    patterns : np.ndarray (uint64, shape (num_vars, stop - start))
+    """
+    if stop is None:
+        stop = num_words_for_vars(num_vars)
+
+    word_ids = np.arange(start, stop, dtype=np.uint64)
+    patterns = np.empty((num_vars, stop - start), dtype=np.uint64)
+
+    for var in range(num_vars):
+        if var < 6:
+            patterns[var] = _VAR_WORDS[var]
+        else:
+            patterns[var] = ((word_ids >> np.uint64(var - 6)) & np.uint64(1)) * ALL_ONES
+
+    return patterns
+
+
+def random_patterns(num_vars: int, num_words: int, seed: int = 0) -> np.ndarray:
+    """
+    Packed uniformly random input patterns.
+
+    Parameters:
+    -----------
+    num_vars : int
+        Number of input variables.
+    num_words : int
+        Number of 64-bit words per variable, i.e. 64 * num_words patterns.
+    seed : int
+        Seed of the random generator, the same seed always yields the same patterns.
+
+    Returns:
+    --------
+    patterns : np.ndarray (uint64, shape (num_vars, num_words))
+    """
+    rng = np.random.default_rng(seed)
+    return np.frombuffer(rng.bytes(8 * num_vars * num_words), dtype=np.uint64).reshape(num_vars, num_words)
+
+
+def simulate_nodes(arrays: AigArrays, pi_words: np.ndarray) -> np.ndarray:
+    """
+    Bit-parallel simulation of every node of an AIG.
+
+    Gates are evaluated one level at a time, so each level is a single vectorized operation over all of its gates
+    and all pattern words.
+
+    Parameters:
+    -----------
+    arrays : AigArrays
+        The AIG to simulate.
+    pi_words : np.ndarray (uint64, shape (num_pis, num_words))
+        Packed input patterns.
+
+    Returns:
+    --------
+    values : np.ndarray (uint64, shape (num_nodes, num_words))
+        Packed simulation values of every node.
+    """
+    if pi_words.shape[0] != arrays.num_pis:
+        raise ValueError("Number of input patterns does not match the number of primary inputs.")
+
+    first_gate = 1 + arrays.num_pis
+    values = np.zeros((arrays.num_nodes, pi_words.shape[1]), dtype=np.uint64)
+    values[1:first_gate] = pi_words
+
+    if arrays.num_gates == 0:
+        return values
+
+    # Group gates by level so that all fanins of a group are already computed
+    gate_levels = arrays.levels[first_gate:]
+    order = np.argsort(gate_levels, kind="stable")
+    bounds = np.searchsorted(gate_levels[order], np.arange(1, int(gate_levels.max()) + 2))
+
+    masks0 = complement_masks(arrays.fanin0)
+    masks1 = complement_masks(arrays.fanin1)
+
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        gates = order[start:stop]
+        values[first_gate + gates] = ((values[arrays.fanin0[gates] >> 1] ^ masks0[gates, None]) &
+                                      (values[arrays.fanin1[gates] >> 1] ^ masks1[gates, None]))
+
+    return values
+
+
+def simulate_outputs(arrays: AigArrays, pi_words: np.ndarray) -> np.ndarray:
+    """
+    Bit-parallel simulation of the primary outputs of an AIG.
+
+    Parameters:
+    -----------
+    arrays : AigArrays
+        The AIG to simulate.
+    pi_words : np.ndarray (uint64, shape (num_pis, num_words))
+        Packed input patterns.
+
+    Returns:
+    --------
+    outputs : np.ndarray (uint64, shape (num_pos, num_words))
+        Packed simulation values of every primary output.
+    """
+    values = simulate_nodes(arrays, pi_words)
+    return values[arrays.pos >> 1] ^ complement_masks(arrays.pos)[:, None]
+
+
+def node_signatures(arrays: AigArrays, pi_words: np.ndarray) -> np.ndarray:
+    """
+    Phase-canonical simulation signatures of every node of an AIG.
+
+    A node and its complement compute the same function up to an inverter, so signatures are complemented whenever
+    their first pattern bit is set. Two nodes have equal signatures if they are (probably) equivalent up to phase.
+
+    Parameters:
+    -----------
+    arrays : AigArrays
+        The AIG to simulate.
+    pi_words : np.ndarray (uint64, shape (num_pis, num_words))
+        Packed input patterns.
+
+    Returns:
+    --------
+    signatures : np.ndarray (uint64, shape (num_nodes, num_words))
+        Signature of every node, each row can be hashed with row.tobytes().
+    """
+    values = simulate_nodes(arrays, pi_words)
+    values ^= complement_masks(values[:, 0])[:, None]
+    return values
+
+
+@lru_cache(maxsize=16)
+def load_truth_table(path: str) -> (np.ndarray, int):
+    """
+    Load a truth table file and pack it into 64-bit words.
+
+    The file holds one ASCII bitstring per output, most significant minterm first. It is memory-mapped and packed
+    once, later calls with the same path are served from the cache.
+
+    Parameters:
+    -----------
+    path : str
+        Path to the .truth file.
+
+    Returns:
+    --------
+    words : np.ndarray (uint64, shape (num_outputs, num_words))
+        Packed truth tables, bit b of word w holds the output value for minterm 64 * w + b.
+    num_vars : int
+        Number of input variables of the truth tables.
+    """
+    raw = np.memmap(path, dtype=np.uint8, mode="r")
+    if len(raw) == 0:
+        raise ValueError(f"Truth table file {path} is empty.")
+    if raw[-1] != ord("\n"):
+        raw = np.append(raw, np.uint8(ord("\n")))
+
+    num_bits = int(np.argmax(raw == ord("\n")))
+    num_vars = num_bits.bit_length() - 1
+    if num_bits == 0 or (1 << num_vars) != num_bits or len(raw) % (num_bits + 1) != 0:
+        raise ValueError(f"Truth table file {path} does not hold power-of-two length bitstrings.")
+
+    # View the file as one row per output, dropping the newlines and reversing to least significant minterm first
+    rows = raw.reshape(-1, num_bits + 1)[:, num_bits - 1::-1]
+    packed = np.packbits(rows == ord("1"), axis=1, bitorder="little")
+
+    padding = (-packed.shape[1]) % 8
+    if padding:
+        packed = np.pad(packed, ((0, 0), (0, padding)))
+
+    words = np.ascontiguousarray(packed).view("<u8").astype(np.uint64, copy=False)
+    words.flags.writeable = False
+
+    return words, num_vars
@@ -0,0 +1,298 @@
+import math
+from functools import partial
+from typing import Callable, NamedTuple
+
+import numpy as np
+import scipy.sparse as sps
+
+from aig_arrays import to_aig_arrays
+from profiling import phase
+from sim_scores.combined_optimization_metrics import rrr_profile
+from sim_scores.kernel_sim import wl_features
+from sim_scores.level_metrics import level_descriptor
+from sim_scores.netcomp_distances import aig_netsimile_aggregate
+from sim_scores.spectral import aig_spectrum, ranked_eigenvalues
+from sim_scores.veo_minhash import minhash_sketch
+
+# Number of rows and columns of the blocks of the all-pairs matrix computed at a time, a block of a metric with d
+# features takes BLOCK_SIZE * BLOCK_SIZE * d * 8 bytes while it is computed
+BLOCK_SIZE = 256
+
+# Number of eigenvalues of the spectral features
+SPECTRUM_SIZE = 100
+
+
+class Featurizer(NamedTuple):
+    """
+    Per-AIG features of a metric and the distance between them.
+
+    Fields:
+    -------
+    featurize : callable
+        Computes the features of an AIG: a vector of fixed length, or the (labels, counts) of wl_features for "wl".
+    distance : str
+        Distance between two feature vectors: "euclidean", "normalized_euclidean", "cosine", "canberra",
+        "bray_curtis" or "wl", as the sim_scores function of the same name, "minhash" for the VEO estimated from
+        MinHash signatures (uint64 vectors) as in veo_minhash.estimate_veo, or "spectral" for the distance between
+        spectra as in spectral.spectral_distance.
+    """
+    featurize: Callable
+    distance: str
+
+
+# Distances that are similarities, larger values are closer
+SIMILARITIES = {"normalized_euclidean", "cosine", "wl", "minhash"}
+
+
+def _netsimile_features(aig, flavor, sample_size=None, sampling="uniform"):
+    return aig_netsimile_aggregate(aig, flavor, sample_size, sampling)[0]
+
+
+def _spectrum_features(aig, matrix_type, which):
+    # The number of nodes, then the eigenvalues in selection order, so that a pair can keep those of the k of its
+    # smaller graph (see block_distances)
+    n, eigenvalues = aig_spectrum(aig, matrix_type, which)
+    eigenvalues = ranked_eigenvalues(eigenvalues, which)[:min(SPECTRUM_SIZE, n - 1)]
+    return np.concatenate([[n], np.pad(eigenvalues, (0, SPECTRUM_SIZE - len(eigenvalues)))])
+
+
+def _gate_level_features(aig):
+    arrays = to_aig_arrays(aig)
+    return np.array([arrays.num_gates, arrays.levels.max(initial=0)], dtype=np.float64)
+
+
+def _minhash_features(aig, directed=False, weights=(-1, 1)):
+    return minhash_sketch(aig, directed, weights).mins
+
+
+def _rrr_features(aig):
+    with phase("optimize"):
+        return np.array(rrr_profile(aig))
+
+
+# Metrics of utils.FUNCTION_MAP that compare per-AIG feature vectors, by name
+FEATURIZERS = {
+    "netsimile": Featurizer(partial(_netsimile_features, flavor="undirected"), "canberra"),
+    "ns_inv": Featurizer(partial(_netsimile_features, flavor="inverted"), "canberra"),
+    "ns_dir_uninverted": Featurizer(partial(_netsimile_features, flavor="uninverted"), "canberra"),
+    "ns_dir": Featurizer(partial(_netsimile_features, flavor="directed_inverted"), "canberra"),
+    "ns_dir_uninverted_directed": Featurizer(partial(_netsimile_features, flavor="directed_uninverted"), "canberra"),
+
+    "lap_sd": Featurizer(partial(_spectrum_features, matrix_type="laplacian", which="SM"), "spectral"),
+    "adj_sd": Featurizer(partial(_spectrum_features, matrix_type="adjacency", which="LM"), "spectral"),
+
+    "kernel_sim": Featurizer(wl_features, "wl"),
+
+    "veo_minhash": Featurizer(_minhash_features, "minhash"),
+    "veo_dir_minhash": Featurizer(partial(_minhash_features, directed=True), "minhash"),
+    "veo_dir_uninverted_minhash": Featurizer(partial(_minhash_features, directed=True, weights=(1, 1)), "minhash"),
+
+    "gate_level_euclidean": Featurizer(_gate_level_features, "normalized_euclidean"),
+    "gate_level_cosine": Featurizer(_gate_level_features, "cosine"),
+    "level_profile_euclidean": Featurizer(level_descriptor, "euclidean"),
+    "level_profile_cosine": Featurizer(level_descriptor, "cosine"),
+
+    "rel_rrr_euclidean": Featurizer(_rrr_features, "euclidean"),
+    "rel_rrr_cosine": Featurizer(_rrr_features, "cosine"),
+    "rel_rrr_canberra": Featurizer(_rrr_features, "canberra"),
+    "rel_rrr_bray_curtis": Featurizer(_rrr_features, "bray_curtis"),
+}
+
+
+def featurize_all(featurize, aigs):
+    """
+    Compute the features of every AIG, one AIG at a time so that only its features stay in memory.
+
+    Parameters:
+    -----------
+    featurize : callable
+        The featurize function of a Featurizer.
+    aigs : iterable of Aig or AigArrays
+        The AIGs, e.g. a generator reading them one by one. An item may be None for an AIG that could not be read.
+
+    Returns:
+    --------
+    features : list
+        The features of every AIG, None where the AIG could not be read or featurized.
+    """
+    features = []
+    for aig in aigs:
+        if aig is None:
+            features.append(None)
+            continue
+        try:
+            with phase("featurize"):
+                features.append(featurize(aig))
+        except ValueError:
+            # Graph features are undefined for AIGs without edges
+            features.append(None)
+    return features
+
+
+def stack_features(features, distance):
+    """
+    Stack per-AIG features into a matrix with a row per AIG: dense for vectors, sparse over all labels for "wl".
+
+    Returns:
+    --------
+    X : np.ndarray or scipy.sparse.csr_matrix
+        The feature matrix, zero rows for missing features.
+    valid : np.ndarray (bool)
+        Whether each AIG has features.
+    """
+    valid = np.array([feature is not None for feature in features], dtype=bool)
+    present = [feature for feature in features if feature is not None]
+
+    if distance == "wl":
+        labels = np.concatenate([feature[0] for feature in present]) if present else np.empty(0, dtype=np.uint64)
+        columns = np.unique(labels, return_inverse=True)[1]
+        rows = np.repeat(np.flatnonzero(valid), [len(feature[0]) for feature in present])
+        counts = np.concatenate([feature[1] for feature in present]) if present else np.empty(0)
+        X = sps.csr_matrix((counts, (rows, columns)), shape=(len(features), columns.max(initial=-1) + 1))
+        return X, valid
+
+    width = len(present[0]) if present else 0
+    X = np.zeros((len(features), width), dtype=np.uint64 if distance == "minhash" else np.float64)
+    if present:
+        X[valid] = np.vstack(present)
+    return X, valid
+
+
+def block_distances(distance, X, Y):
+    """
+    Compute the distances between every row of X and every row of Y, as the sim_scores metric of the distance does
+    for a pair of feature vectors.
+
+    Parameters:
+    -----------
+    distance : str
+        The distance, see Featurizer.
+    X, Y : np.ndarray or scipy.sparse.csr_matrix
+        Blocks of rows of a feature matrix from stack_features.
+
+    Returns:
+    --------
+    D : np.ndarray (shape (len(X), len(Y)))
+        The distance or similarity of every pair of rows.
+    """
+    if distance in ("cosine", "wl"):
+        # Zero vectors have similarity 0 to everything, as in cosine_similarity_metric and compute_graph_kernel
+        if distance == "wl":
+            dots = (X @ Y.T).toarray()
+            norms_x = np.sqrt(np.asarray(X.multiply(X).sum(axis=1)).ravel())
+            norms_y = np.sqrt(np.asarray(Y.multiply(Y).sum(axis=1)).ravel())
+        else:
+            dots = X @ Y.T
+            norms_x, norms_y = np.linalg.norm(X, axis=1), np.linalg.norm(Y, axis=1)
+        norms = np.outer(norms_x, norms_y)
+        return np.divide(dots, norms, out=np.zeros_like(dots), where=norms > 0)
+
+    if distance == "minhash":
+        # VEO from the Jaccard similarity of the vertex and edge sets, the fraction of equal minimums
+        jaccard = (X[:, None, :] == Y[None, :, :]).mean(axis=2)
+        return 2 * jaccard / (1 + jaccard)
+
+    if distance == "spectral":
+        # A pair compares the first min(SPECTRUM_SIZE, n - 1) eigenvalues of both graphs, n of its smaller graph, as
+        # spectral_distance does. Pairs are grouped by this k, which is SPECTRUM_SIZE unless a graph is small.
+        ks = (np.minimum.outer(X[:, 0], Y[:, 0]) - 1).clip(0, SPECTRUM_SIZE).astype(np.int64)
+        D = np.zeros(ks.shape)
+        for k in np.unique(ks[ks > 0]):
+            rows, columns = np.nonzero(ks == k)
+            x, y = np.sort(X[:, 1:k + 1], axis=1), np.sort(Y[:, 1:k + 1], axis=1)
+            D[rows, columns] = np.sqrt(((x[rows] - y[columns]) ** 2).sum(axis=1))
+        return D
+
+    # Differences are broadcast over the block instead of expanded into norms and dot products, so that distances
+    # between near-duplicates do not lose their precision
+    x, y = X[:, None, :], Y[None, :, :]
+    if distance == "euclidean":
+        return np.sqrt(((x - y) ** 2).sum(axis=2))
+    if distance == "normalized_euclidean":
+        scale = np.maximum(np.maximum(x, y), 1)
+        return 1 - np.sqrt((((x - y) / scale) ** 2).sum(axis=2)) / math.sqrt(X.shape[1])
+    if distance == "canberra":
+        # NaN features and features that are zero in both vectors do not contribute, as in netsimile's Canberra distance
+        denominators = np.abs(x) + np.abs(y)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            terms = np.where(denominators < 1e-15, 0.0, np.abs(x - y) / denominators)
+        return np.nansum(terms, axis=2)
+    if distance == "bray_curtis":
+        numerators = np.abs(x - y).sum(axis=2)
+        denominators = (np.abs(x) + np.abs(y)).sum(axis=2)
+        return np.divide(numerators, denominators, out=np.zeros_like(numerators), where=denominators > 0)
+    raise ValueError(f"Unknown distance '{distance}'.")
+
+
+def _merge_top_k(top_indices, top_values, candidates, candidate_indices, rows, k, similarity):
+    # Best k of the current neighbors and the candidate columns of each row, NaN and unset entries rank last
+    indices = np.concatenate([top_indices, np.broadcast_to(candidate_indices, candidates.shape)], axis=1)
+    values = np.concatenate([top_values, candidates], axis=1)
+    keys = np.where(np.isnan(values) | (indices < 0) | (indices == rows[:, None]), np.inf,
+                    -values if similarity else values)
+
+    order = np.argsort(keys, axis=1, kind="stable")[:, :k]
+    return np.take_along_axis(indices, order, axis=1), np.take_along_axis(values, order, axis=1)
+
+
+def all_pairs(features, distance, out=None, top_k=None, block_size=BLOCK_SIZE):
+    """
+    Compute the all-pairs matrix of per-AIG features in square blocks, so that a block of features stays in cache
+    while it is compared with another one. The matrix is symmetric, so only blocks on and above the diagonal are
+    computed.
+
+    Parameters:
+    -----------
+    features : list
+        Per-AIG features from featurize_all, None for AIGs without features: their rows and columns are NaN.
+    distance : str
+        The distance between features, see Featurizer.
+    out : np.ndarray (float32, shape (N, N)), optional
+        Receives the full matrix, e.g. a memory-mapped array from np.lib.format.open_memmap.
+    top_k : int, optional
+        Also keep the k nearest other AIGs of every AIG, in memory proportional to N * k.
+    block_size : int
+        Number of rows and columns of a block.
+
+    Returns:
+    --------
+    top_indices, top_values : np.ndarray (shape (N, top_k))
+        With top_k, the indices of the nearest other AIGs of every AIG, closest first, and their distances or
+        similarities. Indices are -1 where an AIG has fewer than top_k valid neighbors. None without top_k.
+    """
+    X, valid = stack_features(features, distance)
+    n = len(features)
+    similarity = distance in SIMILARITIES
+
+    if top_k is not None:
+        top_k = min(top_k, max(n - 1, 0))
+        top_indices = np.full((n, top_k), -1, dtype=np.int64)
+        top_values = np.full((n, top_k), np.nan)
+
+    for start1 in range(0, n, block_size):
+        rows = np.arange(start1, min(start1 + block_size, n))
+        for start2 in range(start1, n, block_size):
+            columns = np.arange(start2, min(start2 + block_size, n))
+            with phase("compare"):
+                block = block_distances(distance, X[rows], X[columns])
+            block[~valid[rows]] = np.nan
+            block[:, ~valid[columns]] = np.nan
+
+            if out is not None:
+                out[start1:rows[-1] + 1, start2:columns[-1] + 1] = block
+                if start2 != start1:
+                    out[start2:columns[-1] + 1, start1:rows[-1] + 1] = block.T
+
+            if top_k is not None:
+                top_indices[rows], top_values[rows] = _merge_top_k(
+                    top_indices[rows], top_values[rows], block, columns, rows, top_k, similarity)
+                if start2 != start1:
+                    top_indices[columns], top_values[columns] = _merge_top_k(
+                        top_indices[columns], top_values[columns], block.T, rows, columns, top_k, similarity)
+
+    if top_k is None:
+        return None, None
+
+    # Slots without a valid neighbor are marked as such
+    top_indices[np.isnan(top_values)] = -1
+    return top_indices, top_values
@@ -0,0 +1,338 @@
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import platform
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+from aigverse import Aig, aig_cut_rewriting, read_aiger_into_aig, write_aiger
+
+from aig_arrays import to_aig_arrays
+from aig_simulation import exhaustive_patterns, simulate_outputs, load_truth_table
+from profiling import Profiler, profile, phase, peak_rss_mb
+from utils import FUNCTION_MAP
+
+# Synthetic AIGs share this interface, small enough for exhaustive truth tables
+SYNTHETIC_PIS = 12
+SYNTHETIC_POS = 8
+
+
+def random_aig(num_pis: int, num_gates: int, num_pos: int, seed: int = 0) -> Aig:
+    """
+    Build a random AIG in which every gate ANDs two random, randomly complemented, earlier signals.
+
+    Structural hashing may merge a few gates, so the AIG can end up slightly smaller than num_gates.
+
+    Parameters:
+    -----------
+    num_pis, num_gates, num_pos : int
+        Interface and number of AND gates to create.
+    seed : int
+        Seed of the random generator.
+
+    Returns:
+    --------
+    aig : Aig
+        The random AIG, driving its outputs with the last created gates.
+    """
+    rng = np.random.default_rng(seed)
+    aig = Aig()
+    signals = [aig.create_pi() for _ in range(num_pis)]
+
+    for _ in range(num_gates):
+        i, j = rng.choice(len(signals), size=2, replace=False)
+        a = ~signals[i] if rng.random() < 0.5 else signals[i]
+        b = ~signals[j] if rng.random() < 0.5 else signals[j]
+        signals.append(aig.create_and(a, b))
+
+    for signal in signals[-num_pos:]:
+        aig.create_po(signal)
+
+    return aig
+
+
+def write_truth_file(aig: Aig, path: str):
+    """Write the exhaustive truth tables of an AIG in the format of data/truths (one line per output, MSB first)."""
+    arrays = to_aig_arrays(aig)
+    outputs = simulate_outputs(arrays, exhaustive_patterns(arrays.num_pis))
+
+    with open(path, "w") as file:
+        for words in outputs:
+            bits = np.unpackbits(words.view(np.uint8), bitorder="little")[:1 << arrays.num_pis]
+            file.write("".join("1" if bit else "0" for bit in bits[::-1]) + "\n")
+
+
+def size_bucket(num_gates: int) -> str:
+    """Decade of the gate count used to group benchmarks, e.g. 1e2 for 100 to 999 gates."""
+    return f"1e{int(math.log10(num_gates)) if num_gates > 0 else 0}"
+
+
+def synthetic_cases(sizes, work_path):
+    """Pairs of random AIGs of each size, written to AIGER files so that parsing is measured as well."""
+    cases = []
+    for num_gates in sizes:
+        paths, optimized_paths = [], []
+        for seed in range(2):
+            aig = random_aig(SYNTHETIC_PIS, num_gates, SYNTHETIC_POS, seed=num_gates + seed)
+            paths.append(os.path.join(work_path, f"random_{num_gates}_{seed}.aig"))
+            write_aiger(aig, paths[-1])
+
+            # Rewriting stands in for the optimized flows of the dataset in the size_diff metrics
+            aig_cut_rewriting(aig)
+            optimized_paths.append(os.path.join(work_path, f"random_{num_gates}_{seed}_optimized.aig"))
+            write_aiger(aig, optimized_paths[-1])
+
+        # Both AIGs are compared against the function of the first one
+        truth_path = os.path.join(work_path, f"random_{num_gates}.truth")
+        write_truth_file(read_aiger_into_aig(paths[0]), truth_path)
+
+        cases.append({"source": "synthetic", "case": f"random_{num_gates}", "bucket": size_bucket(num_gates),
+                      "aig_types": ["random", "random"], "paths": paths, "optimized_paths": optimized_paths,
+                      "truth_path": truth_path})
+    return cases
+
+
+def dataset_cases(args):
+    """Pairs of flavors of real benchmarks, picking per_bucket benchmarks from every decade of gate counts."""
+    with open(args.id_path, "r") as file:
+        aig_ids = sorted(line.strip() for line in file if line.strip())
+
+    # Group benchmarks by the size of their first flavor
+    buckets = {}
+    for aig_id in aig_ids:
+        num_gates = read_aiger_into_aig(os.path.join(args.folder_path, args.aig_types[0], aig_id + ".aig")).num_gates()
+        buckets.setdefault(size_bucket(num_gates), []).append(aig_id)
+
+    cases = []
+    for bucket, bucket_ids in sorted(buckets.items()):
+        # Spread the picks over the bucket instead of taking its first benchmarks
+        picks = np.linspace(0, len(bucket_ids) - 1, min(args.per_bucket, len(bucket_ids))).round().astype(int)
+        for aig_id in [bucket_ids[i] for i in sorted(set(picks))]:
+            for i, aig_type1 in enumerate(args.aig_types):
+                for aig_type2 in args.aig_types[i + 1:]:
+                    types = [aig_type1, aig_type2]
+                    cases.append({
+                        "source": "dataset", "case": aig_id, "bucket": bucket, "aig_types": types,
+                        "paths": [os.path.join(args.folder_path, t, aig_id + ".aig") for t in types],
+                        "optimized_paths": [os.path.join(args.optimized_path, t, aig_id + ".aig") for t in types],
+                        "truth_path": os.path.join(args.truth_path, aig_id + ".truth"),
+                    })
+    return cases
+
+
+def run_metric(metric, aigs, optimized_aigs, truth):
+    """Apply a metric to a pair of AIGs the way main.get_results does."""
+    comparison_function = FUNCTION_MAP[metric]
+
+    if metric.endswith("size_diff"):
+        return abs(comparison_function(aigs[0], optimized_aigs[0]) - comparison_function(aigs[1], optimized_aigs[1]))
+    if metric.startswith("truth_"):
+        return comparison_function(aigs[0], aigs[1], truth)
+    return comparison_function(aigs[0], aigs[1])
+
+
+def measure(metric, case, repeat=1):
+    """
+    Time a metric on one case, keeping the fastest of repeat runs.
+
+    Returns:
+    --------
+    result : dict
+        Wall time, per-phase timings, peak RSS and value of the metric, or the error it raised.
+    """
+    profiler = Profiler()
+    result = {"metric": metric, **{key: case[key] for key in ["source", "case", "bucket", "aig_types"]}}
+    rss_before = peak_rss_mb()
+
+    try:
+        for _ in range(repeat):
+            profiler.reset()
+            load_truth_table.cache_clear()
+
+            start = time.perf_counter()
+            with profile(profiler):
+                with phase("parse"):
+                    aigs = [read_aiger_into_aig(path) for path in case["paths"]]
+                    optimized_aigs = None
+                    if metric.endswith("size_diff"):
+                        optimized_aigs = [read_aiger_into_aig(path) for path in case["optimized_paths"]]
+                    truth = load_truth_table(case["truth_path"]) if metric.startswith("truth_") else None
+
+                with phase("compare"):
+                    value = run_metric(metric, aigs, optimized_aigs, truth)
+            wall_time = time.perf_counter() - start
+
+            if "wall_time" not in result or wall_time < result["wall_time"]:
+                result.update(wall_time=wall_time, phases=profiler.summary())
+
+        # Spectral distances of non-symmetric matrices come out as complex numbers with zero imaginary part
+        value = float(np.real(value))
+        result["value"] = value if math.isfinite(value) else None
+        result["num_gates"] = [aig.num_gates() for aig in aigs]
+    except Exception as error:
+        result["error"] = f"{type(error).__name__}: {error}"
+
+    result["peak_rss_mb"] = peak_rss_mb()
+    result["rss_growth_mb"] = result["peak_rss_mb"] - rss_before
+    return result
+
+
+def _measure_child(connection, metric, case, repeat):
+    connection.send(measure(metric, case, repeat))
+    connection.close()
+
+
+def measure_isolated(metric, case, repeat=1, timeout=None):
+    """Run measure in a fresh child process, so that the peak RSS belongs to this metric and case only."""
+    context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_measure_child, args=(sender, metric, case, repeat))
+    process.start()
+    sender.close()
+
+    if receiver.poll(timeout):
+        try:
+            result = receiver.recv()
+        except EOFError:
+            # The child died without reporting, e.g. killed for running out of memory
+            result = None
+        process.join()
+        if result is not None:
+            return result
+        error = f"Exit code {process.exitcode}"
+    else:
+        process.kill()
+        process.join()
+        error = f"Timeout after {timeout} s"
+
+    return {"metric": metric, **{key: case[key] for key in ["source", "case", "bucket", "aig_types"]},
+            "error": error}
+
+
+def git_commit():
+    """Commit of the working tree and whether it has uncommitted changes, None outside of a git repository."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout
+        status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True,
+                                text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit.strip(), bool(status.strip())
+
+
+def result_key(result):
+    return result["metric"], result["source"], result["case"], tuple(result["aig_types"])
+
+
+def compare_reports(report, baseline, tolerance=0.25, min_time=0.05):
+    """
+    Find the measurements of a report that got slower than in a baseline report.
+
+    Parameters:
+    -----------
+    report, baseline : dict
+        Reports written by this script.
+    tolerance : float
+        Allowed relative slowdown.
+    min_time : float
+        Allowed absolute slowdown in seconds, so that noise on fast metrics is not flagged.
+
+    Returns:
+    --------
+    regressions : list of str
+        One description per measurement that is slower than allowed, or that fails while it succeeded before.
+    """
+    baseline_results = {result_key(result): result for result in baseline["results"]}
+    regressions = []
+
+    for result in report["results"]:
+        previous = baseline_results.get(result_key(result))
+        if previous is None or "wall_time" not in previous:
+            continue
+
+        name = f"{result['metric']} on {result['case']} ({','.join(result['aig_types'])})"
+        if "wall_time" not in result:
+            regressions.append(f"{name}: {result.get('error')}")
+        elif result["wall_time"] > previous["wall_time"] * (1 + tolerance) + min_time:
+            regressions.append(f"{name}: {previous['wall_time']:.3f} s -> {result['wall_time']:.3f} s")
+
+    return regressions
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Benchmark the runtime and memory of the similarity metrics.")
+    parser.add_argument("--metrics", type=str, nargs="+", choices=FUNCTION_MAP.keys(),
+                        help="Metrics to benchmark, all by default", default=list(FUNCTION_MAP.keys()))
+    parser.add_argument("--sizes", type=int, nargs="*", help="Gate counts of the synthetic AIGs",
+                        default=[100, 1000, 10000])
+    parser.add_argument("--aig_types", type=str, nargs="*", help="Flavors of the dataset to compare pairwise",
+                        default=["strash", "bdd", "sop"])
+    parser.add_argument("--per_bucket", type=int, help="Benchmarks per decade of gate counts", default=2)
+    parser.add_argument("--folder_path", type=str, help="Path to the folder containing the AIG files",
+                        default="data/aigs/")
+    parser.add_argument("--optimized_path", type=str, help="Path to the folder containing the optimized AIG files",
+                        default="data/optimized/")
+    parser.add_argument("--truth_path", type=str, help="Path to the folder containing the benchmark truth tables",
+                        default="data/truths/")
+    parser.add_argument("--id_path", type=str, help="Path to the txt file with aig_ids to be used",
+                        default="data/aigs/indices.txt")
+    parser.add_argument("--repeat", type=int, help="Runs per measurement, the fastest is kept", default=1)
+    parser.add_argument("--timeout", type=float, help="Seconds after which a measurement is aborted", default=300)
+    parser.add_argument("--output", type=str, help="Path of the JSON report, data/benchmarks/<commit>.json by default",
+                        default=None)
+    parser.add_argument("--baseline", type=str, help="JSON report to check for runtime regressions", default=None)
+    parser.add_argument("--tolerance", type=float, help="Allowed relative slowdown against the baseline",
+                        default=0.25)
+    parser.add_argument("--min_time", type=float, help="Allowed absolute slowdown against the baseline in seconds",
+                        default=0.05)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    commit, dirty = git_commit()
+
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": vars(args),
+        "results": [],
+    }
+
+    with tempfile.TemporaryDirectory() as work_path:
+        cases = synthetic_cases(args.sizes, work_path)
+        if args.per_bucket > 0 and len(args.aig_types) > 1:
+            cases += dataset_cases(args)
+
+        for metric in args.metrics:
+            for case in cases:
+                result = measure_isolated(metric, case, args.repeat, args.timeout)
+                report["results"].append(result)
+
+                outcome = f"{result['wall_time']:.3f} s" if "wall_time" in result else result["error"]
+                print(f"{metric} on {case['case']} ({','.join(case['aig_types'])}): {outcome}")
+
+    output = args.output or os.path.join("data", "benchmarks", f"{(commit or 'report')[:12]}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"Report written to {output}")
+
+    if args.baseline is not None:
+        with open(args.baseline, "r") as file:
+            regressions = compare_reports(report, json.load(file), args.tolerance, args.min_time)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from aig_arrays import aig_digest
+
+# Feature store that cached_feature() reads and writes, None when the store is off
+_active_store = None
+
+# Seconds between two updates of the access time of an entry, so that reads rarely need the write lock
+ACCESS_RESOLUTION = 60
+
+# Types of network filesystems in /proc/mounts, SQLite's WAL mode needs the shared memory of a single host
+NETWORK_FILESYSTEMS = {"nfs", "nfs4", "cifs", "smb3", "smbfs", "lustre", "gpfs", "beegfs", "ceph", "fuse.sshfs"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS features (
+    digest TEXT NOT NULL,
+    feature TEXT NOT NULL,
+    params TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL,
+    PRIMARY KEY (digest, feature, params, version)
+);
+CREATE INDEX IF NOT EXISTS features_accessed ON features (accessed);
+"""
+
+
+def on_network_filesystem(path: str) -> bool:
+    """Whether a path is on a network filesystem, from the longest mount point of /proc/mounts containing it."""
+    try:
+        with open("/proc/mounts", "r") as file:
+            mounts = [line.split()[1:3] for line in file]
+    except OSError:
+        return False
+
+    path = os.path.realpath(path)
+    filesystem, longest = None, -1
+    for mount_point, mount_type in mounts:
+        mount_point = mount_point.replace("\\040", " ")
+        if os.path.commonpath([path, mount_point]) == mount_point and len(mount_point) > longest:
+            filesystem, longest = mount_type, len(mount_point)
+    return filesystem in NETWORK_FILESYSTEMS
+
+
+class FeatureStore:
+    """
+    On-disk store of per-AIG features, keyed by (AIG content digest, feature name, parameters, code version).
+
+    Features are kept in a single SQLite database in WAL mode, so any number of processes can read while one of them
+    writes, and concurrent writers wait for each other instead of failing. Each process and thread opens its own
+    connection, the connection of a parent process is not reused after a fork. With max_bytes, the least recently
+    used features are evicted once the stored values exceed the limit.
+
+    WAL mode only works for processes of a single host. A store on a network filesystem uses a rollback journal
+    instead, which relies on the file locks of the filesystem and makes writers wait for readers. Workers on several
+    hosts should rather use a store per host, as main.py --queue does.
+    """
+
+    def __init__(self, path: str, max_bytes: int = None, journal_mode: str = None):
+        """
+        Parameters:
+        -----------
+        path : str
+            Path of the SQLite database, created if needed.
+        max_bytes : int
+            Size limit of the stored values, None for no limit.
+        journal_mode : str
+            SQLite journal mode, "WAL" or "DELETE", by default DELETE on a network filesystem and WAL otherwise.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if journal_mode is None:
+            journal_mode = "DELETE" if on_network_filesystem(os.path.dirname(path) or ".") else "WAL"
+        self.journal_mode = journal_mode
+        with self._connect() as connection:
+            connection.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        if getattr(self._local, "connection", None) is None or self._local.pid != os.getpid():
+            self._local.connection = sqlite3.connect(self.path, timeout=60)
+            self._local.connection.execute(f"PRAGMA journal_mode={self.journal_mode}")
+            self._local.connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.pid = os.getpid()
+        return self._local.connection
+
+    @staticmethod
+    def _key(digest: str, feature: str, params: dict, version: int) -> tuple:
+        return digest, feature, json.dumps(params, sort_keys=True, default=str), version
+
+    def get(self, digest: str, feature: str, params: dict = None, version: int = 1):
+        """Return the stored value of a feature, or None if it is not stored."""
+        key = self._key(digest, feature, params or {}, version)
+        connection = self._connect()
+        row = connection.execute("SELECT value, accessed FROM features WHERE digest=? AND feature=? AND params=? "
+                                 "AND version=?", key).fetchone()
+        if row is None:
+            return None
+
+        now = time.time()
+        if now - row[1] > ACCESS_RESOLUTION:
+            with connection:
+                connection.execute("UPDATE features SET accessed=? WHERE digest=? AND feature=? AND params=? "
+                                   "AND version=?", (now, *key))
+        return pickle.loads(row[0])
+
+    def put(self, digest: str, feature: str, params: dict, version: int, value):
+        """Store the value of a feature, replacing a previous value, and evict old features beyond max_bytes."""
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        connection = self._connect()
+        with connection:
+            connection.execute("INSERT OR REPLACE INTO features VALUES (?, ?, ?, ?, ?, ?, ?)",
+                               (*self._key(digest, feature, params or {}, version), blob, len(blob), time.time()))
+            if self.max_bytes is not None:
+                self._evict(connection)
+
+    def _evict(self, connection: sqlite3.Connection):
+        total = connection.execute("SELECT total(size) FROM features").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        # Evict down to 90% of the limit, so that eviction does not run on every following write
+        excess = total - 0.9 * self.max_bytes
+        evicted = 0
+        for rowid, size in connection.execute("SELECT rowid, size FROM features ORDER BY accessed").fetchall():
+            if evicted >= excess:
+                break
+            connection.execute("DELETE FROM features WHERE rowid=?", (rowid,))
+            evicted += size
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT count(*) FROM features").fetchone()[0]
+
+    def close(self):
+        """Close the connection of the calling thread."""
+        if getattr(self._local, "connection", None) is not None and self._local.pid == os.getpid():
+            self._local.connection.close()
+        self._local.connection = None
+
+
+class MemoryFeatureStore:
+    """
+    In-memory LRU store of per-AIG features with the interface of FeatureStore, e.g. for a long-running process. With a
+    backing FeatureStore, features missing from memory are read from it, and new features are written to both.
+    """
+
+    def __init__(self, max_items: int = 65536, backing: FeatureStore = None):
+        self.max_items = max_items
+        self.backing = backing
+        self.hits = 0
+        self.misses = 0
+        self._features = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest: str, feature: str, params: dict = None, version: int = 1):
+        """Return the stored value of a feature, or None if it is not stored."""
+        key = FeatureStore._key(digest, feature, params or {}, version)
+        with self._lock:
+            value = self._features.get(key)
+            if value is not None:
+                self._features.move_to_end(key)
+                self.hits += 1
+                return value
+
+        value = self.backing.get(digest, feature, params, version) if self.backing is not None else None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._store(key, value)
+        return value
+
+    def put(self, digest: str, feature: str, params: dict, version: int, value):
+        """Store the value of a feature, evicting the least recently used features beyond max_items."""
+        with self._lock:
+            self._store(FeatureStore._key(digest, feature, params or {}, version), value)
+        if self.backing is not None:
+            self.backing.put(digest, feature, params, version, value)
+
+    def _store(self, key, value):
+        self._features[key] = value
+        self._features.move_to_end(key)
+        while len(self._features) > self.max_items:
+            self._features.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._features)
+
+    def close(self):
+        if self.backing is not None:
+            self.backing.close()
+
+
+@contextmanager
+def use_feature_store(store):
+    """Activate a feature store for the duration of the block, restoring the previously active one afterwards."""
+    global _active_store
+    previous = _active_store
+    _active_store = store
+    try:
+        yield store
+    finally:
+        _active_store = previous
+
+
+def active_feature_store():
+    """The active feature store, None when the store is off."""
+    return _active_store
+
+
+def cached_feature(feature: str, aig, params: dict, compute, version: int = 1):
+    """
+    Return a per-AIG feature from the active feature store, computing and storing it if it is missing. Without an
+    active store, the feature is simply computed.
+
+    Parameters:
+    -----------
+    feature : str
+        Name of the feature.
+    aig : Aig or AigArrays
+        The AIG the feature belongs to, identified by its content digest.
+    params : dict
+        Parameters the feature depends on, JSON-serializable.
+    compute : callable
+        Computes the feature of the AIG when called without arguments.
+    version : int
+        Version of the code computing the feature, to be increased whenever the feature changes.
+
+    Returns:
+    --------
+    value
+        The feature value.
+    """
+    store = _active_store
+    if store is None:
+        return compute()
+
+    digest = aig_digest(aig)
+    value = store.get(digest, feature, params, version)
+    if value is None:
+        value = compute()
+        store.put(digest, feature, params, version, value)
+    return value
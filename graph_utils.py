@@ -1,6 +1,11 @@
 import networkx as nx
+import numpy as np
+from scipy import sparse as sps
 from aigverse import to_edge_list
 
+from aig_arrays import AigArrays
+from profiling import phase
+
 
 def transform_edge_list(edges):
     """
@@ -31,40 +36,151 @@ def transform_edge_list(edges):
     return transformed_edges
 
 
+def arrays_to_edge_list(arrays, inverted_weight=1, regular_weight=0):
+    """
+    Build the same edge list as aigverse.to_edge_list from the array representation of an AIG.
+
+    Parameters:
+    -----------
+    arrays : AigArrays
+        The fanin and output arrays of the AIG.
+    inverted_weight, regular_weight : int
+        Weights of complemented and regular edges.
+
+    Returns:
+    --------
+    edges : list of tuples (u, v, weight)
+        One edge per gate fanin, followed by one edge per primary output to a virtual output node.
+    """
+    first_gate = 1 + arrays.num_pis
+    gates = np.arange(first_gate, arrays.num_nodes)
+
+    # Both fanin edges of a gate are listed together, in fanin order
+    fanins = np.stack([arrays.fanin0, arrays.fanin1], axis=1).ravel()
+    targets = np.repeat(gates, 2)
+
+    # Primary outputs point to virtual nodes numbered after the last gate, outputs driven by the same literal share
+    # the virtual node of the first of them (as in aigverse)
+    _, first_po, po_class = np.unique(arrays.pos, return_index=True, return_inverse=True)
+    lits = np.concatenate([fanins, arrays.pos])
+    targets = np.concatenate([targets, arrays.num_nodes + first_po[po_class.ravel()]])
+    weights = np.where(lits & 1, inverted_weight, regular_weight)
+
+    return list(zip((lits >> 1).tolist(), targets.tolist(), weights.tolist()))
+
+
+def get_edge_list(aig, weights=(-1, 1)):
+    """
+    Return the weighted edge list of an AIG, given either as an aigverse Aig or as AigArrays.
+
+    Parameters:
+    -----------
+    aig : Aig or AigArrays
+        The input AIG.
+    weights : tuple (inverted_weight, regular_weight)
+        Weights of complemented and regular edges.
+
+    Returns:
+    --------
+    edges : list of tuples (u, v, weight)
+    """
+    if isinstance(aig, AigArrays):
+        return arrays_to_edge_list(aig, inverted_weight=weights[0], regular_weight=weights[1])
+
+    edges = to_edge_list(aig, inverted_weight=weights[0], regular_weight=weights[1])
+    return [(e.source, e.target, e.weight) for e in edges]
+
+
 def get_graph(aig1, aig2, directed=False, weighted=False, weights=(-1,1)):
-    # Convert AIG to edge list with weight information
-    edges1 = to_edge_list(aig1, inverted_weight=weights[0], regular_weight=weights[1])
-    edges2 = to_edge_list(aig2, inverted_weight=weights[0], regular_weight=weights[1])
+    with phase("graph_build"):
+        return _build_graphs(aig1, aig2, directed, weighted, weights)
+
 
+def build_graph(aig, directed=False, weighted=False, weights=(-1,1)):
+    """
+    Build the graph of a single AIG, as get_graph does for each AIG of a pair, e.g. to compute per-AIG features.
+    """
+    with phase("graph_build"):
+        G = _build_graph(aig, directed, weighted, weights)
+
+    # Check if the graph is empty (handled separately)
+    if G.number_of_nodes() == 0:
+        raise ValueError("Resistance distance is undefined for empty graphs.")
+    return G
+
+
+def _build_graph(aig, directed, weighted, weights):
+    # Convert AIG to edge list with weight information
+    edges = get_edge_list(aig, weights=weights)
 
     # If unweighted, strip the weights, if also undirected as no inversion
     if not weighted and not directed:
-        edges1 = [(e.source, e.target) for e in edges1]
-        edges2 = [(e.source, e.target) for e in edges2]
-    else:
-        edges1 = [(e.source, e.target, e.weight) for e in edges1]
-        edges2 = [(e.source, e.target, e.weight) for e in edges2]
-
-    if directed:
-        G1 = nx.DiGraph()
-        G2 = nx.DiGraph()
-    else:
-        G1 = nx.Graph()
-        G2 = nx.Graph()
+        edges = [(u, v) for u, v, _ in edges]
+
+    G = nx.DiGraph() if directed else nx.Graph()
 
     # Create graphs based on the directed and weighted options
     if weighted:
-        G1.add_weighted_edges_from(edges1)
-        G2.add_weighted_edges_from(edges2)
+        G.add_weighted_edges_from(edges)
     elif directed and not weighted: #invert negative edges to keep inversion direction
-        G1.add_edges_from(transform_edge_list(edges1))
-        G2.add_edges_from(transform_edge_list(edges2))
+        G.add_edges_from(transform_edge_list(edges))
     else:  # Undirected and unweighted
-        G1.add_edges_from(edges1)
-        G2.add_edges_from(edges2)
+        G.add_edges_from(edges)
+
+    return G
+
+
+def _build_graphs(aig1, aig2, directed, weighted, weights):
+    G1 = _build_graph(aig1, directed, weighted, weights)
+    G2 = _build_graph(aig2, directed, weighted, weights)
 
     # Check if either graph is empty (handled separately)
     if G1.number_of_nodes() == 0 or G2.number_of_nodes() == 0:
         raise ValueError("Resistance distance is undefined for empty graphs.")
 
     return G1, G2
+
+
+def get_adjacency(aig1, aig2, weights=(-1, 1)):
+    with phase("graph_build"):
+        return _build_adjacency(aig1, weights), _build_adjacency(aig2, weights)
+
+
+def build_adjacency(aig, weights=(-1, 1)):
+    """Build the adjacency matrix of a single AIG, as get_adjacency does for each AIG of a pair."""
+    with phase("graph_build"):
+        return _build_adjacency(aig, weights)
+
+
+def _build_adjacency(aig, weights):
+    """
+    Build the binary CSR adjacency matrix of the directed graph get_graph(directed=True) builds for an AIG: edges
+    with weight -1 are reversed, and nodes are numbered in sorted order of the nodes with at least one edge.
+
+    Parameters:
+    -----------
+    aig : Aig or AigArrays
+        The input AIG.
+    weights : tuple (inverted_weight, regular_weight)
+        Weights of complemented and regular edges, complemented edges are reversed with an inverted weight of -1.
+
+    Returns:
+    --------
+    A : scipy.sparse.csr_matrix
+        Adjacency matrix with A[u, v] = 1 for an edge u -> v.
+    """
+    edges = np.array(get_edge_list(aig, weights=weights), dtype=np.int64).reshape(-1, 3)
+    if len(edges) == 0:
+        raise ValueError("Resistance distance is undefined for empty graphs.")
+
+    inverted = edges[:, 2] == -1
+    sources = np.where(inverted, edges[:, 1], edges[:, 0])
+    targets = np.where(inverted, edges[:, 0], edges[:, 1])
+
+    nodes, index = np.unique(np.concatenate([sources, targets]), return_inverse=True)
+    n = len(nodes)
+    A = sps.csr_matrix((np.ones(len(edges)), (index[:len(edges)], index[len(edges):])), shape=(n, n))
+
+    # Parallel edges collapse into one, as in a networkx DiGraph
+    A.data[:] = 1
+    return A
@@ -1,12 +1,43 @@
 import argparse
+import csv
+import hashlib
+import heapq
+import json
+import math
 import os
-import pandas as pd
+import socket
+from contextlib import ExitStack, nullcontext
+from functools import partial
+import numpy as np
 from aigverse import read_aiger_into_aig
-from utils import FUNCTION_MAP
+from aig_arrays import AigArrays, aig_digest, structural_digest, to_aig_arrays
+from aig_cache import arrays_from_buffer, arrays_to_buffer, cache_file_path, folder_flow, load_cached_aig_arrays
+from aig_pack import AigPack
+from aig_simulation import load_truth_table
+from feature_store import FeatureStore, use_feature_store
+from profiling import Profiler, TIMING_COLUMNS, profile, phase, collect
+from scheduler import Task, run_tasks, OK
+from shared_arrays import SharedArrays, attach
+from sim_scores import optimizers
+from sim_scores.optimizers import parse_script
+from utils import FUNCTION_MAP, ARRAY_METRICS, FEATURIZABLE_METRICS, METRIC_GROUPS, NETSIMILE_METRICS, \
+    ORDER_INVARIANT_METRICS
+from work_queue import STALE_AFTER, WorkQueue
 
 AIG_TYPES = ['bdd', 'collapse', 'dsd', 'espresso', 'lut_bidec', 'sop', 'strash', 'default']
 
 
+def parse_shard(value: str) -> (int, int):
+    """Parse a shard "i/N" into (i, N), shards are numbered from 0 to N - 1 like SLURM array task ids."""
+    try:
+        shard, num_shards = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid shard '{value}', expected i/N")
+    if not 0 <= shard < num_shards:
+        raise argparse.ArgumentTypeError(f"invalid shard '{value}', expected 0 <= i < N")
+    return shard, num_shards
+
+
 # Argument parser
 def parse_arguments():
     parser = argparse.ArgumentParser(description="Process two AIG types, a folder path, and a function.")
@@ -24,86 +55,738 @@ def parse_arguments():
                         nargs="?", default="data/aigs/")
     parser.add_argument("--optimized_path", type=str, help="Path to the folder containing the optimized AIG files",
                         nargs="?", default="data/optimized/")
+    parser.add_argument("--truth_path", type=str, help="Path to the folder containing the benchmark truth tables",
+                        nargs="?", default="data/truths/")
+    parser.add_argument("--cache_path", type=str,
+                        help="Path to the binary cache of the AIG files (see aig_cache.py), used by graph metrics",
+                        nargs="?", default=None)
+    parser.add_argument("--pack_path", type=str,
+                        help="Path to a dataset pack file (see aig_pack.py), the folders are used for missing and "
+                             "outdated entries",
+                        nargs="?", default=None)
     parser.add_argument("--save_path", type=str, help="Path to the folder where results should be saved",
                         nargs="?", default="data/results/")
     parser.add_argument("--id_path", type=str, help="Path to the txt file with aig_ids to be used",
                         nargs="?", default="data/aigs/indices.txt")
+    parser.add_argument("--fingerprint_script", type=str, default=None,
+                        help="Optimization script of opt_fingerprint, e.g. 'balance; rewrite; refactor*2; resub'")
+    parser.add_argument("--netsimile_sample", type=int, default=None,
+                        help="Approximate the NetSimile metrics of graphs with more nodes from a sample of this size")
+    parser.add_argument("--netsimile_sampling", type=str, choices=["uniform", "degree"], default="uniform",
+                        help="Node sampling of --netsimile_sample: uniform or degree-stratified")
+    parser.add_argument("--feature_store", type=str, default=None,
+                        help="Path to a feature store database (see feature_store.py) keeping per-AIG features across "
+                             "runs and processes, with --queue <path>.<hostname> so that each host has its own")
+    parser.add_argument("--feature_store_limit", type=float, default=None,
+                        help="Size limit of the feature store in MiB, least recently used features are evicted")
+    parser.add_argument("--all_pairs", action="store_true",
+                        help="Compare every AIG of every benchmark and type with every other one into an N x N matrix "
+                             "<metric>_all_pairs.npy, for the metrics of all_pairs.FEATURIZERS")
+    parser.add_argument("--top_k", type=int, default=None,
+                        help="With --all_pairs, only write the k nearest AIGs of every AIG to <metric>_top<k>.csv")
+    parser.add_argument("--jobs", type=int, help="Number of benchmark pairs computed in parallel", default=1)
+    parser.add_argument("--optimizer_workers", type=int, default=None,
+                        help="Number of optimizations run in parallel per job by the optimization metrics, the cores "
+                             "left per job by default")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="Wall-clock budget in seconds per benchmark pair, exceeding it records NaN")
+    parser.add_argument("--memory_limit", type=float, default=None,
+                        help="Memory budget in MiB per benchmark pair, exceeding it records NaN")
+    parser.add_argument("--profile", action="store_true",
+                        help="Record the time spent in each phase per benchmark and pair in <metric>_timings.csv")
+    parser.add_argument("--trace_memory", action="store_true",
+                        help="With --profile, also record the peak Python allocations of each phase (slower)")
+    parser.add_argument("--shard", type=parse_shard, default=None,
+                        help="Only run shard i/N of the benchmarks (0 <= i < N), balanced by the size of their files, "
+                             "into <metric>_scores.shard<i>of<N>.csv, merged with merge_shards.py")
+    parser.add_argument("--queue", action="store_true",
+                        help="Share the benchmarks with the workers running the same command on other hosts through "
+                             "claim files in <save_path>/queue, see work_queue.py")
+    parser.add_argument("--stale_after", type=float, default=STALE_AFTER,
+                        help="With --queue, seconds without a heartbeat after which a claimed benchmark is claimed "
+                             "again")
     parser.add_argument("metric", type=str, choices=FUNCTION_MAP.keys(), help="Metric to apply")
-    return parser.parse_args()
+    args = parser.parse_args()
 
+    # An invalid script would otherwise fail every pair
+    if args.fingerprint_script is not None:
+        try:
+            parse_script(args.fingerprint_script)
+        except ValueError as error:
+            parser.error(str(error))
+    return args
 
-def get_results(args, aig_ids):
-    if args.aig_types == 'default':
-        args.aig_types = AIG_TYPES[:-1]
-    # Dictionary to store results for each AIG type comparison
-    results_dict = {f"{aig_type1},{aig_type2}": []
-                    for i, aig_type1 in enumerate(args.aig_types)
-                    for aig_type2 in args.aig_types[i + 1:]}
 
-    # Retrieve the comparison function based on the metric provided by the user
-    comparison_function = FUNCTION_MAP[args.metric]
+def read_aig(args, folder_path, aig_type, filename, pack=None):
+    aig_path = os.path.join(folder_path, aig_type, filename + ".aig")
+    flow = folder_flow(folder_path)
+    needs_aig = args.metric not in ARRAY_METRICS
+
+    # Serve the AIG from the dataset pack if it holds it, rebuilding the Aig only for metrics that need aigverse
+    if pack is not None and pack.has_aig(filename, aig_type, flow, aig_path):
+        return pack.aig(filename, aig_type, flow) if needs_aig else pack.aig_arrays(filename, aig_type, flow)
+
+    # Metrics that work on arrays read the memory-mapped cache instead of parsing the AIGER file
+    if args.cache_path is not None and not needs_aig:
+        return load_cached_aig_arrays(aig_path, cache_file_path(args.cache_path, flow, aig_type, filename))
 
+    return read_aiger_into_aig(aig_path)
+
+
+def read_truth_table(args, filename, pack=None):
+    truth_path = os.path.join(args.truth_path, filename + ".truth")
+    if pack is not None and pack.has_truth_table(filename, truth_path):
+        return pack.truth_table(filename)
+
+    # Truth tables are packed once per benchmark and cached by load_truth_table
+    return load_truth_table(truth_path)
+
+
+def load_benchmarks(args, aig_ids, pack=None):
+    """Pipeline stage: read every AIG type of one benchmark at a time, together with its optimized AIGs and truth
+    table if the metric needs them."""
     for filename in aig_ids:
-        # Get paths to each AIG file for the given filename across different types
-        aig_files = {aig_type: os.path.join(args.folder_path, aig_type, filename + ".aig")
-                     for aig_type in args.aig_types}
+        # Read AIGER files (or their binary cache) into AIG networks, once per benchmark
+        aigs = {}
+        optimized_aigs = {} if args.metric.endswith("size_diff") else None
+        for aig_type in args.aig_types:
+            with phase("parse"):
+                aigs[aig_type] = read_aig(args, args.folder_path, aig_type, filename, pack)
+                if optimized_aigs is not None:
+                    optimized_aigs[aig_type] = read_aig(args, args.optimized_path, aig_type, filename, pack)
+            collect(aig_ids=filename, aig_types=aig_type)
+
+        truth = None
+        if args.metric.startswith("truth_"):
+            with phase("parse"):
+                truth = read_truth_table(args, filename, pack)
+            collect(aig_ids=filename, aig_types="truth")
+
+        yield filename, aigs, optimized_aigs, truth
+        # Drop the benchmark before reading the next one
+        del aigs, optimized_aigs, truth
+
+
+def get_comparison_function(args):
+    comparison_function = FUNCTION_MAP[args.metric]
+
+    # Metrics with user-declared parameters
+    if args.metric == "opt_fingerprint" and args.fingerprint_script is not None:
+        comparison_function = partial(comparison_function, script=parse_script(args.fingerprint_script))
+    if args.metric in NETSIMILE_METRICS and args.netsimile_sample is not None:
+        comparison_function = partial(comparison_function, sample_size=args.netsimile_sample,
+                                      sampling=args.netsimile_sampling)
+
+    return comparison_function
+
+
+def featurize_benchmarks(args, benchmarks):
+    """Pipeline stage: replace AIGs by per-AIG features for metrics that compare features of single AIGs."""
+    comparison_function = get_comparison_function(args)
+
+    for filename, aigs, optimized_aigs, truth in benchmarks:
+        if optimized_aigs is not None:
+            # Size differences only depend on one AIG type, compute them once instead of once per pair
+            features = {}
+            for aig_type in args.aig_types:
+                with phase("featurize"):
+                    features[aig_type] = comparison_function(aigs[aig_type], optimized_aigs[aig_type])
+                collect(aig_ids=filename, aig_types=aig_type)
+            del aigs, optimized_aigs
+            yield filename, features, truth
+        else:
+            yield filename, aigs, truth
+            del aigs
+        del truth
+
+
+def benchmark_classes(args, aigs):
+    """
+    Group the AIG types of a benchmark into classes of identical AIGs, so that a metric is computed once per pair of
+    classes and the other pairs copy its result.
+
+    Metrics that only see the graph structure use the canonical structural digest, which ignores the numbering of the
+    gates. Metrics that depend on the numbering (node correspondences, optimization heuristics) use the exact content
+    digest, and so do the NetSimile metrics with --netsimile_sample, whose node samples are drawn by node index.
+
+    Returns:
+    --------
+    classes : dict
+        The class key of every AIG type.
+    """
+    # Size differences are compared as features of single AIGs, there is nothing to share
+    if args.metric.endswith("size_diff"):
+        return {aig_type: aig_type for aig_type in aigs}
+
+    sampled = args.metric in NETSIMILE_METRICS and args.netsimile_sample is not None
+    digest = structural_digest if args.metric in ORDER_INVARIANT_METRICS and not sampled else aig_digest
+    with phase("hash"):
+        return {aig_type: digest(aig) for aig_type, aig in aigs.items()}
+
+
+def compare_benchmarks(args, benchmarks):
+    """Pipeline stage: compare each pair of AIG types of a benchmark and emit one result row per benchmark."""
+    # Retrieve the comparison function based on the metric provided by the user
+    comparison_function = get_comparison_function(args)
+
+    for filename, aigs, truth in benchmarks:
+        row = {"aig_ids": filename}
+        classes = benchmark_classes(args, aigs)
+        class_results = {}
 
         # Compare each pair of AIG types
         for i, aig_type1 in enumerate(args.aig_types):
             for aig_type2 in args.aig_types[i + 1:]:
-                # Read AIGER files into AIG networks
-                aig1 = read_aiger_into_aig(aig_files[aig_type1])
-                aig2 = read_aiger_into_aig(aig_files[aig_type2])
+                # Pairs of identical AIGs share the result of the first of them
+                class_pair = (classes[aig_type1], classes[aig_type2])
+                if class_pair in class_results:
+                    row[f"{aig_type1},{aig_type2}"] = class_results[class_pair]
+                    continue
+
+                with phase("compare"):
+                    if args.metric.endswith("size_diff"):
+                        comparison_result = abs(aigs[aig_type1] - aigs[aig_type2])
+                    elif args.metric.startswith("truth_"):
+                        comparison_result = comparison_function(aigs[aig_type1], aigs[aig_type2], truth)
+                    else:
+                        comparison_result = comparison_function(aigs[aig_type1], aigs[aig_type2])
+                collect(aig_ids=filename, aig_types=f"{aig_type1},{aig_type2}")
+                class_results[class_pair] = comparison_result
+
+                # Save the comparison result in the row
+                row[f"{aig_type1},{aig_type2}"] = comparison_result
+
+        del aigs, truth
+        yield row
+
+
+def open_pack(args):
+    # A single memory-mapped pack serves all AIGs and truth tables it holds
+    if args.pack_path is None:
+        return None
+    if not os.path.exists(args.pack_path):
+        raise FileNotFoundError(f"Pack file {args.pack_path} does not exist, build it with aig_pack.py")
+    return AigPack(args.pack_path)
+
+
+def get_results(args, aig_ids):
+    """
+    Build the streaming comparison pipeline (load -> featurize -> compare) over the given benchmarks.
+
+    Each stage is a generator handing one benchmark at a time downstream, so only a single benchmark's AIGs are alive
+    at any time and peak memory does not grow with the number of benchmarks.
+
+    Returns:
+    --------
+    rows : generator of dict
+        One row per benchmark, mapping "aig_ids" and every "type1,type2" pair to its result.
+    """
+    if args.aig_types == 'default':
+        args.aig_types = AIG_TYPES[:-1]
+
+    pack = open_pack(args)
+
+    benchmarks = load_benchmarks(args, aig_ids, pack)
+    benchmarks = featurize_benchmarks(args, benchmarks)
+    return compare_benchmarks(args, benchmarks)
+
+
+def share_benchmark(shared, aigs, truth=None):
+    """
+    Place the AigArrays of the AIGs of a benchmark, and its truth table, in shared memory blocks, so that pair
+    processes map them instead of reading the AIGs again.
+
+    Returns:
+    --------
+    handles : dict
+        The SharedArray of every AIG type under "aigs", and the SharedArray and number of variables of the truth
+        table under "truth" (None without truth table).
+    """
+    handles = {"aigs": {}, "truth": None}
+    for aig_type, aig in aigs.items():
+        arrays = aig if isinstance(aig, AigArrays) else to_aig_arrays(aig)
+        handles["aigs"][aig_type] = shared.share(arrays_to_buffer(arrays))
+    if truth is not None:
+        words, num_vars = truth
+        handles["truth"] = (shared.share(words), num_vars)
+    return handles
+
+
+def attach_benchmark(handles, aig_types):
+    """Map the AigArrays and truth table of a benchmark shared by share_benchmark, without copying."""
+    aigs = {aig_type: arrays_from_buffer(attach(handles["aigs"][aig_type])) for aig_type in aig_types}
+    truth = None
+    if handles["truth"] is not None:
+        handle, num_vars = handles["truth"]
+        truth = (attach(handle), num_vars)
+    return aigs, truth
+
+
+def compare_pair(args, filename, aig_type1, aig_type2, handles=None):
+    """
+    Scheduler task: run the pipeline on one pair of AIG types of one benchmark, on the AIGs shared by
+    share_benchmark if handles are given.
+
+    Returns:
+    --------
+    result : (value, timing_rows)
+        The comparison result and the timing rows collected for the pair if profiling is on.
+    """
+    pair_args = argparse.Namespace(**{**vars(args), "aig_types": [aig_type1, aig_type2]})
+    profiler = Profiler(trace_memory=args.trace_memory) if args.profile else None
+
+    with profile(profiler) if profiler is not None else nullcontext():
+        if handles is None:
+            row = next(get_results(pair_args, [filename]))
+        else:
+            aigs, truth = attach_benchmark(handles, pair_args.aig_types)
+            benchmarks = featurize_benchmarks(pair_args, iter([(filename, aigs, None, truth)]))
+            row = next(compare_benchmarks(pair_args, benchmarks))
+
+    return row[f"{aig_type1},{aig_type2}"], profiler.rows if profiler is not None else []
+
+
+def pair_cost(args, filename, aig_type1, aig_type2):
+    """Estimated cost of comparing a pair of AIG types, the size of their AIGER files."""
+    cost = 0
+    for aig_type in [aig_type1, aig_type2]:
+        try:
+            cost += os.path.getsize(os.path.join(args.folder_path, aig_type, filename + ".aig"))
+        except OSError:
+            pass
+    return cost
+
+
+def get_scheduled_results(args, aig_ids, failures, timing_rows):
+    """
+    Compare every pair of AIG types of every benchmark as a separate task with its own time and memory budget.
+
+    Pairs are run largest-first over all benchmarks. A pair that fails or exceeds its budget gets NaN in its row and
+    is described in failures. A benchmark row is emitted once all of its pairs are done.
+
+    For metrics on AigArrays, the AigArrays and truth table of a benchmark are read once and placed in shared memory,
+    the pair processes map them from their handles and build their graphs from them. At most --jobs benchmarks are in
+    shared memory at a time: benchmarks are shared largest-first, the blocks of a benchmark are removed once its
+    pairs are done, and the next benchmark is then shared and its pairs run with the pending ones.
+
+    Returns:
+    --------
+    rows : generator of dict
+        One row per benchmark, in order of completion.
+    """
+    if args.aig_types == 'default':
+        args.aig_types = AIG_TYPES[:-1]
+
+    pairs = [(aig_type1, aig_type2) for i, aig_type1 in enumerate(args.aig_types)
+             for aig_type2 in args.aig_types[i + 1:]]
+    if not pairs:
+        yield from ({"aig_ids": filename} for filename in aig_ids)
+        return
+
+    if args.metric not in ARRAY_METRICS:
+        yield from _run_scheduled(args, aig_ids, pairs, None, len(aig_ids), failures, timing_rows)
+        return
+
+    with SharedArrays() as shared:
+        yield from _run_scheduled(args, aig_ids, pairs, shared, max(args.jobs, 1), failures, timing_rows)
+
 
-                if args.metric.endswith("size_diff"):
-                    optimized_aig1 = read_aiger_into_aig(
-                        os.path.join(args.optimized_path, aig_type1, filename + ".aig"))
-                    optimized_aig2 = read_aiger_into_aig(
-                        os.path.join(args.optimized_path, aig_type2, filename + ".aig"))
+def _run_scheduled(args, aig_ids, pairs, shared, window, failures, timing_rows):
+    # Benchmarks are read largest-first, at most window of them have pairs pending or running at a time
+    waiting = iter(sorted(aig_ids, key=lambda filename: (-benchmark_cost(args, filename), filename)))
+    pack = open_pack(args)
+    copies, handles, values = {}, {}, {}
 
-                    size_diff1 = comparison_function(aig1, optimized_aig1)
-                    size_diff2 = comparison_function(aig2, optimized_aig2)
+    def admit():
+        tasks = []
+        while len(values) < window:
+            filename = next(waiting, None)
+            if filename is None:
+                break
+            aigs = {aig_type: read_aig(args, args.folder_path, aig_type, filename, pack)
+                    for aig_type in args.aig_types}
+            classes = benchmark_classes(args, aigs)
+            if shared is not None:
+                truth = read_truth_table(args, filename, pack) if args.metric.startswith("truth_") else None
+                handles[filename] = share_benchmark(shared, aigs, truth)
+            del aigs
+            # Only the first pair of each pair of classes of identical AIGs is run, the others copy its result
+            representatives = {}
+            for pair in pairs:
+                representative = representatives.setdefault((classes[pair[0]], classes[pair[1]]), pair)
+                copies.setdefault((filename, representative), []).append(pair)
+            values[filename] = {}
+            tasks.extend(Task((filename, pair), pair_cost(args, filename, *pair), compare_pair,
+                              (args, filename, *pair, handles.get(filename)))
+                         for pair in representatives.values())
+        return tasks
 
-                    comparison_result = abs(size_diff1 - size_diff2)
-                else:
-                    comparison_result = comparison_function(aig1, aig2)
+    memory_limit = int(args.memory_limit * 1024 * 1024) if args.memory_limit is not None else None
 
-                # Save the comparison result in the dictionary
-                comparison_key = f"{aig_type1},{aig_type2}"
-                results_dict[comparison_key].append(comparison_result)
-        print(f"AIG benchmark {filename} comparisons complete")
+    for result in run_tasks([], args.jobs, args.timeout, memory_limit, feed=admit):
+        filename, (aig_type1, aig_type2) = result.key
+        if result.status == OK:
+            value, rows = result.value
+            timing_rows.extend(rows)
+        else:
+            # Sentinel for pairs that could not be computed within budget
+            value = math.nan
+            failures.append({"aig_ids": filename, "aig_types": f"{aig_type1},{aig_type2}", "status": result.status,
+                             "seconds": result.seconds, "detail": result.value})
+            print(f"AIG benchmark {filename} {aig_type1},{aig_type2}: {result.status} ({result.value})")
 
-    return results_dict
+        for t1, t2 in copies.pop(result.key):
+            values[filename][f"{t1},{t2}"] = value
+        if len(values[filename]) == len(pairs):
+            benchmark_values = values.pop(filename)
+            if filename in handles:
+                # The pair processes are done with the shared AIGs of the benchmark
+                benchmark_handles = handles.pop(filename)
+                blocks = list(benchmark_handles["aigs"].values())
+                if benchmark_handles["truth"] is not None:
+                    blocks.append(benchmark_handles["truth"][0])
+                shared.release(blocks)
+            yield {"aig_ids": filename, **{f"{t1},{t2}": benchmark_values[f"{t1},{t2}"] for t1, t2 in pairs}}
+
+
+def benchmark_cost(args, filename):
+    """Estimated cost of a benchmark, the size of its AIGER files and of its truth table if the metric needs it."""
+    paths = [os.path.join(args.folder_path, aig_type, filename + ".aig") for aig_type in args.aig_types]
+    if args.metric.endswith("size_diff"):
+        paths += [os.path.join(args.optimized_path, aig_type, filename + ".aig") for aig_type in args.aig_types]
+    if args.metric.startswith("truth_"):
+        paths.append(os.path.join(args.truth_path, filename + ".truth"))
+
+    cost = 0
+    for path in paths:
+        try:
+            cost += os.path.getsize(path)
+        except OSError:
+            pass
+    return cost
+
+
+def shard_benchmarks(aig_ids, costs, shard, num_shards):
+    """
+    Split the benchmarks into num_shards shards of about equal total cost and return those of one shard.
+
+    Benchmarks are assigned largest-first to the shard with the lowest total cost so far (ties to the lowest shard),
+    so every run with the same benchmarks and files computes the same shards.
+
+    Parameters:
+    -----------
+    aig_ids : list of str
+        All benchmarks.
+    costs : dict
+        The estimated cost of every benchmark, see benchmark_cost.
+    shard, num_shards : int
+        The shard to return, from 0 to num_shards - 1, and the number of shards.
+
+    Returns:
+    --------
+    aig_ids : list of str
+        The sorted benchmarks of the shard.
+    """
+    loads = [(0, i) for i in range(num_shards)]
+    shards = [[] for _ in range(num_shards)]
+    for filename in sorted(aig_ids, key=lambda filename: (-costs[filename], filename)):
+        load, i = heapq.heappop(loads)
+        shards[i].append(filename)
+        heapq.heappush(loads, (load + costs[filename], i))
+    return sorted(shards[shard])
+
+
+def shard_suffix(shard):
+    """Suffix of the result files of a shard, empty without shards."""
+    return f".shard{shard[0]}of{shard[1]}" if shard is not None else ""
+
+
+def log_progress(rows):
+    for row in rows:
+        print(f"AIG benchmark {row['aig_ids']} comparisons complete")
+        yield row
+
+
+def write_rows(rows, csv_path, fieldnames=None):
+    """Pipeline sink: append each result row to a CSV file as soon as it is computed."""
+    with open(csv_path, "w", newline="") as file:
+        writer = None
+        if fieldnames is not None:
+            writer = csv.DictWriter(file, fieldnames=fieldnames)
+            writer.writeheader()
+        for row in rows:
+            if writer is None:
+                writer = csv.DictWriter(file, fieldnames=list(row.keys()))
+                writer.writeheader()
+            writer.writerow(row)
+            file.flush()
+
+
+def write_result_rows(rows, csv_paths, fieldnames=None):
+    """
+    Pipeline sink for the results: write each row to the CSV file of its metric as soon as it is computed.
+
+    Rows of a metric group map each pair to a dict with a value per member metric, they are split into one CSV file
+    per member. Values that are not dicts, like the NaN sentinel of failed pairs, are written to every member. With
+    fieldnames, the header is written up front, so that a run without rows still writes a valid CSV file.
+    """
+    with ExitStack() as stack:
+        files = {metric: stack.enter_context(open(path, "w", newline="")) for metric, path in csv_paths.items()}
+        writers = {}
+        if fieldnames is not None:
+            for metric, file in files.items():
+                writers[metric] = csv.DictWriter(file, fieldnames=fieldnames)
+                writers[metric].writeheader()
+                file.flush()
+        for row in rows:
+            for metric, file in files.items():
+                metric_row = {key: value[metric] if isinstance(value, dict) else value for key, value in row.items()}
+                if metric not in writers:
+                    writers[metric] = csv.DictWriter(file, fieldnames=list(metric_row.keys()))
+                    writers[metric].writeheader()
+                writers[metric].writerow(metric_row)
+                file.flush()
+
+
+def merge_results(result_csv_path, partial_csv_path):
+    """Add the columns of a partial results CSV to the results CSV, replacing columns that already exist."""
+    # pandas is only needed once all results are in, importing it lazily keeps the startup fast
+    import pandas as pd
+
+    # A run without benchmarks leaves the results as they are
+    if os.path.getsize(partial_csv_path) == 0:
+        os.remove(partial_csv_path)
+        return
+
+    read_options = {"dtype": {"aig_ids": str}, "float_precision": "round_trip"}
+    partial_df = pd.read_csv(partial_csv_path, **read_options).set_index("aig_ids")
+    if partial_df.empty and os.path.exists(result_csv_path):
+        os.remove(partial_csv_path)
+        return
+
+    if os.path.exists(result_csv_path):
+        # Reading a CSV file into a DataFrame
+        results_df = pd.read_csv(result_csv_path, **read_options).set_index("aig_ids")
+        results_df = results_df.reindex(results_df.index.union(partial_df.index, sort=False))
+    else:
+        results_df = pd.DataFrame(index=partial_df.index)
+
+    # Add the results to the DataFrame, keeping existing results of benchmarks that were not rerun
+    for key in partial_df.columns:
+        results_df.loc[partial_df.index, key] = partial_df[key]
+
+    # Save the updated DataFrame to CSV
+    results_df.reset_index().to_csv(result_csv_path, index=False)
+    os.remove(partial_csv_path)
+
+
+def write_results(args, rows, failures=None, timing_rows=None):
+    """
+    Pipeline sink of a run: stream the rows into a partial CSV per metric and merge them into the results CSVs once
+    all benchmarks are done, a metric group writes the results of each of its member metrics. A shard writes its own
+    results CSVs instead. The failures and timings are written once the rows are, they are collected meanwhile.
+    """
+    suffix = shard_suffix(args.shard)
+    result_csv_paths = {metric: os.path.join(args.save_path, f'{metric}_scores{suffix}.csv')
+                        for metric in METRIC_GROUPS.get(args.metric, [args.metric])}
+    partial_csv_paths = {metric: f"{path}.partial" for metric, path in result_csv_paths.items()}
+
+    if args.aig_types == 'default':
+        args.aig_types = AIG_TYPES[:-1]
+    pair_columns = [f"{aig_type1},{aig_type2}" for i, aig_type1 in enumerate(args.aig_types)
+                    for aig_type2 in args.aig_types[i + 1:]]
+    write_result_rows(rows, partial_csv_paths, fieldnames=["aig_ids"] + pair_columns)
+
+    if failures is not None:
+        write_rows(failures, os.path.join(args.save_path, f'{args.metric}_failures{suffix}.csv'),
+                   fieldnames=["aig_ids", "aig_types", "status", "seconds", "detail"])
+    if args.profile:
+        write_rows(timing_rows, os.path.join(args.save_path, f'{args.metric}_timings{suffix}.csv'),
+                   fieldnames=["aig_ids", "aig_types"] + TIMING_COLUMNS)
+
+    for metric, result_csv_path in result_csv_paths.items():
+        if args.shard is not None:
+            os.replace(partial_csv_paths[metric], result_csv_path)
+        else:
+            merge_results(result_csv_path, partial_csv_paths[metric])
+
+
+def configure_optimizers(args):
+    """Share the cores between the --jobs pair processes and the optimizer workers of each of them."""
+    if args.optimizer_workers is not None:
+        optimizers.OPTIMIZER_WORKERS = args.optimizer_workers
+    else:
+        optimizers.OPTIMIZER_WORKERS = max(1, (os.cpu_count() or 1) // max(args.jobs, 1))
+
+
+def is_scheduled(args):
+    """Whether each pair runs in its own process, see get_scheduled_results."""
+    return args.jobs > 1 or args.timeout is not None or args.memory_limit is not None
+
+
+def run_digest(args, *extra):
+    """Digest of the arguments that determine the results of a benchmark: metric, AIG types, inputs and parameters."""
+    def path(value):
+        return os.path.abspath(value) if value is not None else None
+
+    config = {"metric": args.metric, "aig_types": list(args.aig_types), "folder_path": path(args.folder_path),
+              "optimized_path": path(args.optimized_path), "truth_path": path(args.truth_path),
+              "pack_path": path(args.pack_path), "fingerprint_script": args.fingerprint_script,
+              "netsimile_sample": args.netsimile_sample, "netsimile_sampling": args.netsimile_sampling,
+              "timeout": args.timeout, "memory_limit": args.memory_limit, "extra": list(extra)}
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def run_queue(args, aig_ids):
+    """
+    Compute the benchmarks as tasks of a work queue in <save_path>/queue/<metric>-<digest>, shared with the workers
+    running the same command on other hosts, see work_queue.WorkQueue. The digest covers the arguments that determine
+    the results (see run_digest), so runs with other arguments never share tasks. Each worker claims the largest free
+    benchmark until none is left. Once all are done, a single worker writes the results as a run over all benchmarks
+    would. Benchmarks already done by an earlier run with the same arguments are not rerun, removing their files from
+    the queue folder reruns them.
+    """
+    if args.aig_types == 'default':
+        args.aig_types = AIG_TYPES[:-1]
+
+    queue_path = os.path.join(args.save_path, "queue", f"{args.metric}-{run_digest(args)}")
+    benchmarks = {f"{args.metric}.{filename}": filename for filename in aig_ids}
+    costs = {key: benchmark_cost(args, filename) for key, filename in benchmarks.items()}
+    queue = WorkQueue(queue_path, list(benchmarks), costs, args.stale_after)
+
+    def compute(key):
+        failures, timing_rows = [], []
+        if is_scheduled(args):
+            row = next(get_scheduled_results(args, [benchmarks[key]], failures, timing_rows))
+        else:
+            profiler = Profiler(trace_memory=args.trace_memory) if args.profile else None
+            with profile(profiler) if profiler is not None else nullcontext():
+                row = next(get_results(args, [benchmarks[key]]))
+            timing_rows = profiler.rows if profiler is not None else []
+        print(f"AIG benchmark {row['aig_ids']} comparisons complete")
+        return {"row": row, "failures": failures, "timings": timing_rows}
+
+    def write(_):
+        results = [queue.result(key) for key in benchmarks]
+        write_results(args, (result["row"] for result in results),
+                      [failure for result in results for failure in result["failures"]] if is_scheduled(args) else None,
+                      [row for result in results for row in result["timings"]])
+
+    queue.run(compute)
+    # Writing the results is a task of its own, so that a single worker does it and a crashed writer is replaced. It is
+    # a task of this set of benchmarks, a run over other benchmarks writes its results again.
+    results_key = f"{args.metric}.results-{run_digest(args, sorted(aig_ids))}"
+    WorkQueue(queue_path, [results_key], stale_after=args.stale_after).run(write)
+
+
+def open_feature_store(args):
+    if args.feature_store is None:
+        return None
+    max_bytes = int(args.feature_store_limit * 2 ** 20) if args.feature_store_limit is not None else None
+    # Workers of a queue may run on several hosts, SQLite databases are not safely shared between hosts
+    path = f"{args.feature_store}.{socket.gethostname()}" if args.queue else args.feature_store
+    return FeatureStore(path, max_bytes=max_bytes)
+
+
+def write_all_pairs(args, aig_ids):
+    """
+    Compare every AIG of every benchmark and type with every other one. Each AIG is read and featurized once, then
+    the matrix is computed in blocks, see all_pairs.all_pairs. Without --top_k, the matrix is written to a float32
+    <metric>_all_pairs.npy memory map (np.load(..., mmap_mode="r") reads it back), with its rows listed in
+    <metric>_all_pairs_ids.csv. With --top_k, only the nearest AIGs of every AIG are written to <metric>_top<k>.csv.
+    """
+    if args.metric not in FEATURIZABLE_METRICS:
+        raise ValueError(f"Metric '{args.metric}' has no per-AIG features, --all_pairs supports: "
+                         f"{', '.join(sorted(FEATURIZABLE_METRICS))}")
+    # The featurizers import the modules of all featurizable metrics
+    import pandas as pd
+    from all_pairs import FEATURIZERS, all_pairs, featurize_all
+
+    if args.aig_types == 'default':
+        args.aig_types = AIG_TYPES[:-1]
+
+    featurize = FEATURIZERS[args.metric].featurize
+    if args.metric in NETSIMILE_METRICS and args.netsimile_sample is not None:
+        featurize = partial(featurize, sample_size=args.netsimile_sample, sampling=args.netsimile_sampling)
+
+    items = [(filename, aig_type) for filename in aig_ids for aig_type in args.aig_types]
+    pack = open_pack(args)
+
+    def read_aigs():
+        for filename, aig_type in items:
+            with phase("parse"):
+                aig = read_aig(args, args.folder_path, aig_type, filename, pack)
+            yield aig
+            print(f"AIG {filename} {aig_type} featurized")
+
+    features = featurize_all(featurize, read_aigs())
+
+    ids = pd.DataFrame(items, columns=["aig_ids", "aig_types"])
+    distance = FEATURIZERS[args.metric].distance
+    if args.top_k is None:
+        ids.to_csv(os.path.join(args.save_path, f"{args.metric}_all_pairs_ids.csv"), index_label="index")
+        matrix = np.lib.format.open_memmap(os.path.join(args.save_path, f"{args.metric}_all_pairs.npy"), mode="w+",
+                                           dtype=np.float32, shape=(len(items), len(items)))
+        all_pairs(features, distance, out=matrix)
+        matrix.flush()
+        del matrix
+        return
+
+    top_indices, top_values = all_pairs(features, distance, top_k=args.top_k)
+    rows = []
+    for index, (filename, aig_type) in enumerate(items):
+        for rank, (neighbor, value) in enumerate(zip(top_indices[index], top_values[index]), start=1):
+            if neighbor >= 0:
+                rows.append({"aig_ids": filename, "aig_types": aig_type, "rank": rank,
+                             "neighbor_aig_ids": items[neighbor][0], "neighbor_aig_types": items[neighbor][1],
+                             "value": value})
+    write_rows(rows, os.path.join(args.save_path, f"{args.metric}_top{args.top_k}.csv"),
+               fieldnames=["aig_ids", "aig_types", "rank", "neighbor_aig_ids", "neighbor_aig_types", "value"])
 
 
 def main():
     # Parse the arguments
     args = parse_arguments()
+    configure_optimizers(args)
     # Open the file and read all lines into a list
     with open(args.id_path, 'r') as file:
         lines = file.readlines()
     # Remove newline characters if necessary
     aig_ids = sorted([line.strip() for line in lines])
 
-    # check if results csv file already exists
-    result_csv_path = os.path.join(args.save_path, f'{args.metric}_scores.csv')
-    # Check if the file exists
-    if os.path.exists(result_csv_path):
-        # Reading a CSV file into a DataFrame
-        results_df = pd.read_csv(result_csv_path)
-    else:
-        id_data = {"aig_ids": aig_ids}
-        results_df = pd.DataFrame(id_data)
-
-    aig_results = get_results(args, aig_ids)
+    if args.shard is not None:
+        if args.all_pairs or args.queue:
+            raise ValueError("--all_pairs and --queue cannot be sharded")
+        if args.aig_types == 'default':
+            args.aig_types = AIG_TYPES[:-1]
+        aig_ids = shard_benchmarks(aig_ids, {filename: benchmark_cost(args, filename) for filename in aig_ids},
+                                   *args.shard)
 
-    # Add the results to the DataFrame
-    for key, results in aig_results.items():
-        results_df[key] = results
-
-    # Save the updated DataFrame to CSV
-    results_df.to_csv(result_csv_path, index=False)
+    if args.all_pairs:
+        with use_feature_store(open_feature_store(args)) as feature_store:
+            write_all_pairs(args, aig_ids)
+        if feature_store is not None:
+            feature_store.close()
+        return
 
+    # Per-AIG features are shared through the feature store by all pairs, metrics, runs and forked pair processes
+    with use_feature_store(open_feature_store(args)) as feature_store:
+        if args.queue:
+            # Workers on any number of hosts share the benchmarks through claim files in the results folder
+            run_queue(args, aig_ids)
+        elif is_scheduled(args):
+            # Each pair runs in its own process within its budget, failures are recorded next to the results
+            failures, timing_rows = [], []
+            write_results(args, log_progress(get_scheduled_results(args, aig_ids, failures, timing_rows)), failures,
+                          timing_rows)
+        else:
+            # Timings are collected per benchmark and pair while the pipeline runs
+            profiler = Profiler(trace_memory=args.trace_memory) if args.profile else None
+            with profile(profiler) if profiler is not None else nullcontext():
+                rows = log_progress(get_results(args, aig_ids))
+                write_results(args, rows, timing_rows=profiler.rows if profiler is not None else None)
+    if feature_store is not None:
+        feature_store.close()
 
 if __name__ == "__main__":
     main()
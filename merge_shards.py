@@ -0,0 +1,174 @@
+import argparse
+import os
+import re
+
+import pandas as pd
+
+from main import merge_results
+from utils import METRIC_GROUPS
+
+# Result files of main.py --shard i/N: <name>.shard<i>of<N>.csv
+SHARD_PATTERN = re.compile(r"^(?P<name>.+)\.shard(?P<shard>\d+)of(?P<num_shards>\d+)\.csv$")
+
+_READ_OPTIONS = {"dtype": {"aig_ids": str}, "float_precision": "round_trip"}
+
+
+def find_shards(save_path: str, name: str) -> dict:
+    """
+    Find the shard files of a result file, e.g. name "veo_scores" for veo_scores.shard3of16.csv.
+
+    Returns:
+    --------
+    shards : dict
+        The path of every shard file by (shard, number of shards).
+    """
+    shards = {}
+    for filename in sorted(os.listdir(save_path)):
+        match = SHARD_PATTERN.match(filename)
+        if match is not None and match["name"] == name:
+            shards[int(match["shard"]), int(match["num_shards"])] = os.path.join(save_path, filename)
+    return shards
+
+
+def _read_shard(path: str) -> pd.DataFrame:
+    # Shards without benchmarks of older runs are empty files
+    if os.path.getsize(path) == 0:
+        return None
+    return pd.read_csv(path, **_READ_OPTIONS).set_index("aig_ids")
+
+
+def load_shards(save_path: str, metric: str, aig_ids: list = None) -> (pd.DataFrame, list):
+    """
+    Combine the shard results of a metric into one table and validate them: all shards of a single split are present,
+    they have the same columns, no benchmark is in two shards, and if aig_ids is given, they cover exactly these
+    benchmarks.
+
+    Parameters:
+    -----------
+    save_path : str
+        The folder of the shard files.
+    metric : str
+        The metric, or a member metric of a metric group.
+    aig_ids : list of str
+        The benchmarks the shards should cover, e.g. the lines of the --id_path file of the runs.
+
+    Returns:
+    --------
+    results : pd.DataFrame
+        The results of all shards indexed by aig_ids, sorted by benchmark.
+    paths : list of str
+        The shard files.
+    """
+    shards = find_shards(save_path, f"{metric}_scores")
+    if not shards:
+        raise ValueError(f"No shard results of '{metric}' in {save_path}.")
+    splits = {num_shards for _, num_shards in shards}
+    if len(splits) > 1:
+        raise ValueError(f"Shard results of '{metric}' from different splits: {sorted(splits)} shards.")
+    num_shards = splits.pop()
+    missing = sorted(set(range(num_shards)) - {shard for shard, _ in shards})
+    if missing:
+        raise ValueError(f"Missing shards of '{metric}': {', '.join(f'{shard}/{num_shards}' for shard in missing)}.")
+
+    paths = [shards[shard, num_shards] for shard in range(num_shards)]
+    frames = {path: frame for path in paths if (frame := _read_shard(path)) is not None}
+    if not frames:
+        raise ValueError(f"All shard results of '{metric}' are empty files.")
+    first_path, first = next(iter(frames.items()))
+    for path, frame in frames.items():
+        if list(frame.columns) != list(first.columns):
+            raise ValueError(f"Columns of {path} differ from those of {first_path}.")
+
+    # Shards without benchmarks are left out, so that they do not change the column types
+    results = pd.concat([frame for frame in frames.values() if len(frame)] or [first])
+    duplicates = results.index[results.index.duplicated()].unique().tolist()
+    if duplicates:
+        raise ValueError(f"Benchmarks in several shards of '{metric}': {', '.join(duplicates)}.")
+    if aig_ids is not None:
+        missing, extra = sorted(set(aig_ids) - set(results.index)), sorted(set(results.index) - set(aig_ids))
+        if missing or extra:
+            raise ValueError(f"Shards of '{metric}' do not cover the benchmarks, missing: {missing}, extra: {extra}.")
+
+    return results.sort_index(), paths
+
+
+def concat_shards(save_path: str, name: str) -> str:
+    """Concatenate the shard files of a per-run table, e.g. veo_failures, into <name>.csv. Returns its path."""
+    shards = find_shards(save_path, name)
+    if not shards:
+        return None
+    path = os.path.join(save_path, f"{name}.csv")
+    pd.concat([pd.read_csv(shards[key], **_READ_OPTIONS) for key in sorted(shards)]).to_csv(path, index=False)
+    return path
+
+
+def merge_shards(save_path: str, metric: str, aig_ids: list = None, remove: bool = False) -> list:
+    """
+    Merge the shard results of main.py --shard into <metric>_scores.csv, for every member of a metric group, after
+    validating them (see load_shards). Results of other benchmarks and columns already in the results CSV are kept, as
+    in main.merge_results. Failures and timings of the shards are concatenated into <metric>_failures.csv and
+    <metric>_timings.csv.
+
+    Parameters:
+    -----------
+    save_path : str
+        The folder of the shard files and results.
+    metric : str
+        The metric of the runs.
+    aig_ids : list of str
+        The benchmarks the shards should cover.
+    remove : bool
+        Whether to remove the shard files once merged.
+
+    Returns:
+    --------
+    paths : list of str
+        The merged results CSVs.
+    """
+    members = METRIC_GROUPS.get(metric, [metric])
+    # Validate all members before writing anything
+    shards = {member: load_shards(save_path, member, aig_ids) for member in members}
+
+    result_csv_paths = []
+    for member, (results, paths) in shards.items():
+        result_csv_path = os.path.join(save_path, f"{member}_scores.csv")
+        results.reset_index().to_csv(f"{result_csv_path}.partial", index=False)
+        merge_results(result_csv_path, f"{result_csv_path}.partial")
+        result_csv_paths.append(result_csv_path)
+
+        missing = int(results.isna().sum().sum())
+        print(f"{member}: merged {len(results)} benchmarks from {len(paths)} shards into {result_csv_path}"
+              + (f", {missing} pairs without result" if missing else ""))
+
+    for name in [f"{metric}_failures", f"{metric}_timings"]:
+        concat_shards(save_path, name)
+
+    if remove:
+        for name in [f"{member}_scores" for member in members] + [f"{metric}_failures", f"{metric}_timings"]:
+            for path in find_shards(save_path, name).values():
+                os.remove(path)
+    return result_csv_paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate and merge the shard results of main.py --shard i/N.")
+    parser.add_argument("metric", type=str, help="Metric of the sharded runs")
+    parser.add_argument("--save_path", type=str, default="data/results/", help="Folder of the shard results")
+    parser.add_argument("--id_path", type=str, default=None,
+                        help="Path to the txt file with the aig_ids of the runs, checked to be covered by the shards")
+    parser.add_argument("--remove", action="store_true", help="Remove the shard files once merged")
+    args = parser.parse_args()
+
+    aig_ids = None
+    if args.id_path is not None:
+        with open(args.id_path, "r") as file:
+            aig_ids = [line.strip() for line in file if line.strip()]
+
+    try:
+        merge_shards(args.save_path, args.metric, aig_ids, args.remove)
+    except ValueError as error:
+        parser.error(str(error))
+
+
+if __name__ == "__main__":
+    main()
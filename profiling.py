@@ -0,0 +1,139 @@
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+
+# Profiler that phase() reports to, None when profiling is off
+_active_profiler = None
+
+# Columns of the rows collected by Profiler.collect, after the labels
+TIMING_COLUMNS = ["phase", "seconds", "calls", "peak_alloc_mb", "rss_mb"]
+
+
+class Profiler:
+    """
+    Collects the wall time spent in named phases (parse, graph_build, feature, eigensolve, optimize, compare, ...).
+
+    Phases may be nested, each phase records its inclusive time. A profiler only records while it is activated with
+    profile(), so the phase() calls spread through the code cost a single global lookup when profiling is off.
+
+    With trace_memory, the peak of the Python allocations (tracemalloc) above the level at the start of each phase is
+    recorded as well. This includes NumPy and SciPy arrays, but not memory allocated inside aigverse.
+    """
+
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.timings = defaultdict(float)
+        self.counts = defaultdict(int)
+        self.peaks = defaultdict(int)
+        self.rows = []
+
+        # [allocated at phase start, highest allocation seen in finished nested phases] of each open phase
+        self._memory_stack = []
+
+    def add(self, name: str, seconds: float, peak_bytes: int = 0):
+        self.timings[name] += seconds
+        self.counts[name] += 1
+        self.peaks[name] = max(self.peaks[name], peak_bytes)
+
+    def reset(self):
+        self.timings.clear()
+        self.counts.clear()
+        self.peaks.clear()
+
+    def summary(self) -> dict:
+        """Total seconds per phase."""
+        return dict(self.timings)
+
+    def collect(self, **labels):
+        """Store the phases recorded since the last collect as rows of the timing table, tagged with labels."""
+        rss = current_rss_mb()
+        for name, seconds in self.timings.items():
+            self.rows.append({
+                **labels,
+                "phase": name,
+                "seconds": seconds,
+                "calls": self.counts[name],
+                "peak_alloc_mb": self.peaks[name] / (1024 * 1024) if self.trace_memory else None,
+                "rss_mb": rss,
+            })
+        self.reset()
+
+    def _start_memory(self):
+        current, peak = tracemalloc.get_traced_memory()
+        if self._memory_stack:
+            # The peak is reset for the nested phase, keep the enclosing phase's peak so far
+            self._memory_stack[-1][1] = max(self._memory_stack[-1][1], peak)
+        tracemalloc.reset_peak()
+        self._memory_stack.append([current, current])
+
+    def _stop_memory(self) -> int:
+        _, peak = tracemalloc.get_traced_memory()
+        start, nested_peak = self._memory_stack.pop()
+        peak = max(peak, nested_peak)
+        if self._memory_stack:
+            self._memory_stack[-1][1] = max(self._memory_stack[-1][1], peak)
+        return peak - start
+
+
+@contextmanager
+def profile(profiler: Profiler):
+    """Activate a profiler for the duration of the block, restoring the previously active one afterwards."""
+    global _active_profiler
+    previous = _active_profiler
+    _active_profiler = profiler
+
+    start_tracing = profiler.trace_memory and not tracemalloc.is_tracing()
+    if start_tracing:
+        tracemalloc.start()
+    try:
+        yield profiler
+    finally:
+        if start_tracing:
+            tracemalloc.stop()
+        _active_profiler = previous
+
+
+@contextmanager
+def phase(name: str):
+    """Time a block as the given phase on the active profiler, a no-op when profiling is off."""
+    profiler = _active_profiler
+    if profiler is None:
+        yield
+        return
+
+    trace_memory = profiler.trace_memory and tracemalloc.is_tracing()
+    if trace_memory:
+        profiler._start_memory()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        profiler.add(name, seconds, profiler._stop_memory() if trace_memory else 0)
+
+
+def collect(**labels):
+    """Collect the phases of the active profiler under the given labels, a no-op when profiling is off."""
+    if _active_profiler is not None:
+        _active_profiler.collect(**labels)
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of the current process in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in KiB on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def current_rss_mb() -> float:
+    """Current resident set size of the process in MiB, falls back to the peak where /proc is not available."""
+    try:
+        with open("/proc/self/statm", "r") as file:
+            resident_pages = int(file.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return peak_rss_mb()
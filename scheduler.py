@@ -0,0 +1,133 @@
+import multiprocessing
+import os
+import resource
+import time
+from multiprocessing.connection import wait
+from typing import Any, Callable, NamedTuple
+
+# Statuses of finished tasks
+OK = "ok"
+TIMEOUT = "timeout"
+OUT_OF_MEMORY = "out_of_memory"
+ERROR = "error"
+
+
+class Task(NamedTuple):
+    """A unit of work for run_tasks: function(*arguments) is run in its own process."""
+    key: Any
+    cost: float
+    function: Callable
+    arguments: tuple
+
+
+class TaskResult(NamedTuple):
+    key: Any
+    status: str
+    value: Any
+    seconds: float
+
+
+def _address_space_bytes() -> int:
+    try:
+        with open("/proc/self/statm", "r") as file:
+            return int(file.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _run_task(connection, task: Task, memory_limit: int):
+    if memory_limit is not None:
+        # The budget comes on top of the address space inherited from the parent process
+        limit = _address_space_bytes() + memory_limit
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    try:
+        result = (OK, task.function(*task.arguments))
+    except MemoryError as error:
+        result = (OUT_OF_MEMORY, f"MemoryError: {error}")
+    except Exception as error:
+        result = (ERROR, f"{type(error).__name__}: {error}")
+
+    connection.send(result)
+    connection.close()
+
+
+def run_tasks(tasks, jobs: int = 1, timeout: float = None, memory_limit: int = None, feed: Callable = None):
+    """
+    Run every task in a separate process, at most jobs at a time, starting with the most expensive tasks so that a
+    parallel run does not end waiting on one long straggler.
+
+    A task that exceeds its wall-clock or memory budget is stopped and reported with the corresponding status, the
+    other tasks keep running.
+
+    Parameters:
+    -----------
+    tasks : iterable of Task
+        The tasks to run, their function and arguments must be picklable where fork is not available.
+    jobs : int
+        Number of tasks running in parallel.
+    timeout : float
+        Wall-clock budget of a task in seconds, None for no limit.
+    memory_limit : int
+        Memory budget of a task in bytes (address space on top of the parent's), None for no limit.
+    feed : callable, optional
+        Called without arguments before tasks are started, i.e. after the caller has consumed the results so far,
+        returns more tasks to run, e.g. those of inputs the caller only prepares once earlier tasks are done. The
+        pending tasks stay ordered largest-first.
+
+    Returns:
+    --------
+    results : generator of TaskResult
+        One result per task in order of completion, value is the task's return value if status is OK and an error
+        description otherwise.
+    """
+    context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn")
+    # pop() from the end takes the most expensive task first
+    pending = sorted(tasks, key=lambda task: task.cost)
+    running = {}
+
+    while True:
+        if feed is not None:
+            new_tasks = list(feed())
+            if new_tasks:
+                pending = sorted(pending + new_tasks, key=lambda task: task.cost)
+        if not pending and not running:
+            break
+
+        while pending and len(running) < max(jobs, 1):
+            task = pending.pop()
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(target=_run_task, args=(sender, task, memory_limit), daemon=True)
+            process.start()
+            sender.close()
+            running[receiver] = (task, process, time.monotonic())
+
+        # Wait for a task to finish, or until the earliest deadline of the running tasks
+        wait_time = None
+        if timeout is not None:
+            now = time.monotonic()
+            wait_time = max(0.0, min(start + timeout for _, _, start in running.values()) - now)
+        ready = wait(list(running), wait_time)
+
+        for receiver in ready:
+            task, process, start = running.pop(receiver)
+            try:
+                status, value = receiver.recv()
+                process.join()
+            except EOFError:
+                # The process died without reporting, e.g. aborted by an allocation failure in native code
+                process.join()
+                status = OUT_OF_MEMORY if memory_limit is not None else ERROR
+                value = f"Process exited with code {process.exitcode}"
+            receiver.close()
+            yield TaskResult(task.key, status, value, time.monotonic() - start)
+
+        if timeout is not None:
+            now = time.monotonic()
+            for receiver, (task, process, start) in list(running.items()):
+                if receiver not in ready and now - start >= timeout:
+                    process.kill()
+                    process.join()
+                    receiver.close()
+                    del running[receiver]
+                    yield TaskResult(task.key, TIMEOUT, f"Timeout after {timeout} s", now - start)
@@ -0,0 +1,271 @@
+import argparse
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+
+import numpy as np
+from aigverse import read_aiger_into_aig
+
+from aig_arrays import aig_digest
+from aig_simulation import load_truth_table
+from all_pairs import FEATURIZERS
+from feature_store import FeatureStore, MemoryFeatureStore, use_feature_store
+from similarity_index import SimilarityIndex
+from sim_scores.optimizers import parse_script
+from utils import FUNCTION_MAP, NETSIMILE_METRICS
+
+
+class _LRUCache:
+    """Thread-safe LRU mapping with hit and miss counts."""
+
+    def __init__(self, max_items: int):
+        self.max_items = max_items
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {"items": len(self._items), "hits": self.hits, "misses": self.misses}
+
+
+class SimilarityService:
+    """
+    Long-running similarity service: parsed AIGs, per-AIG features, pair results and similarity indexes stay in memory
+    between requests, each in an LRU cache, so a request only pays for what no earlier request computed.
+
+    Requests are JSON objects with an "op" and its arguments, AIGs are given by the path of their AIGER file:
+    - {"op": "compare", "metric": ..., "aig1": path, "aig2": path, "params": {...}} -> {"value": ...}
+    - {"op": "featurize", "metric": ..., "aig": path, "params": {...}} -> {"features": [...]}
+    - {"op": "query", "index": name, "aig": path, "k": 10} -> {"neighbors": [[key, value], ...]}
+    - {"op": "batch", "requests": [...]} -> {"results": [...]}, one result per request
+    - {"op": "stats"} -> cache sizes and hit counts
+    Parameters are those of main.py: sample_size and sampling for the NetSimile metrics, script for opt_fingerprint,
+    and truth (path of the truth table) for the truth_ metrics.
+
+    Index files are pickles, so queries only load indexes by their file name in the index directory given at startup,
+    never from a path sent by a client.
+    """
+
+    def __init__(self, aig_cache_size: int = 1024, feature_cache_size: int = 65536, result_cache_size: int = 65536,
+                 feature_store: FeatureStore = None, index_dir: str = None):
+        self.aigs = _LRUCache(aig_cache_size)
+        self.results = _LRUCache(result_cache_size)
+        self.features = MemoryFeatureStore(feature_cache_size, backing=feature_store)
+        self.indexes = _LRUCache(16)
+        self.index_dir = os.path.realpath(index_dir) if index_dir is not None else None
+        self.started = time.time()
+
+    def read_aig(self, path: str):
+        """Parse an AIGER file, served from memory while the file is unchanged."""
+        status = os.stat(path)
+        key = (os.path.abspath(path), status.st_mtime_ns, status.st_size)
+        aig = self.aigs.get(key)
+        if aig is None:
+            aig = read_aiger_into_aig(path)
+            self.aigs.put(key, aig)
+        return aig
+
+    @staticmethod
+    def _metric_function(metric: str, params: dict, table: dict):
+        if metric not in table:
+            raise ValueError(f"Unknown metric '{metric}'.")
+        function = table[metric]
+        params = dict(params)
+        if metric == "opt_fingerprint" and "script" in params:
+            params["script"] = parse_script(params["script"])
+        if metric.startswith("truth_"):
+            params.pop("truth", None)
+        if params and metric not in NETSIMILE_METRICS and metric != "opt_fingerprint":
+            raise ValueError(f"Metric '{metric}' takes no parameters.")
+        return partial(function, **params) if params else function
+
+    def compare(self, metric: str, aig1: str, aig2: str, params: dict = None) -> dict:
+        params = params or {}
+        function = self._metric_function(metric, params, FUNCTION_MAP)
+        aig1, aig2 = self.read_aig(aig1), self.read_aig(aig2)
+
+        key = (metric, aig_digest(aig1), aig_digest(aig2), json.dumps(params, sort_keys=True))
+        value = self.results.get(key)
+        if value is None:
+            if metric.startswith("truth_"):
+                value = function(aig1, aig2, load_truth_table(params["truth"]))
+            else:
+                value = function(aig1, aig2)
+            self.results.put(key, value)
+        return {"value": value}
+
+    def featurize(self, metric: str, aig: str, params: dict = None) -> dict:
+        featurizers = {name: featurizer.featurize for name, featurizer in FEATURIZERS.items()}
+        features = self._metric_function(metric, params or {}, featurizers)(self.read_aig(aig))
+        if isinstance(features, tuple):
+            # Weisfeiler-Lehman labels and counts
+            return {"features": [np.asarray(part).tolist() for part in features]}
+        return {"features": np.asarray(features).tolist()}
+
+    def index_path(self, index: str) -> str:
+        """Path of an index file given by its name in the index directory."""
+        if self.index_dir is None:
+            raise ValueError("Queries need an index directory, see --index_dir.")
+        path = os.path.realpath(os.path.join(self.index_dir, index))
+        if index != os.path.basename(index) or os.path.dirname(path) != self.index_dir:
+            raise ValueError(f"Index '{index}' is not a file name in the index directory.")
+        return path
+
+    def query(self, index: str, aig: str, k: int = 10) -> dict:
+        path = self.index_path(index)
+        status = os.stat(path)
+        key = (path, status.st_mtime_ns)
+        similarity_index = self.indexes.get(key)
+        if similarity_index is None:
+            similarity_index = SimilarityIndex.load(path)
+            self.indexes.put(key, similarity_index)
+        return {"neighbors": [[key, value] for key, value in similarity_index.query(self.read_aig(aig), k)]}
+
+    def stats(self) -> dict:
+        return {"uptime": time.time() - self.started, "aigs": self.aigs.stats(), "results": self.results.stats(),
+                "features": {"items": len(self.features), "hits": self.features.hits,
+                             "misses": self.features.misses},
+                "indexes": self.indexes.stats()}
+
+    def handle(self, request: dict) -> dict:
+        """Answer a request, errors are answered with {"error": message}."""
+        try:
+            operation = request.get("op")
+            arguments = {key: value for key, value in request.items() if key != "op"}
+            if operation == "batch":
+                return {"results": [self.handle(item) for item in request["requests"]]}
+            if operation == "compare":
+                return self.compare(**arguments)
+            if operation == "featurize":
+                return self.featurize(**arguments)
+            if operation == "query":
+                return self.query(**arguments)
+            if operation == "stats":
+                return self.stats()
+            raise ValueError(f"Unknown op '{operation}'.")
+        except Exception as error:
+            return {"error": f"{type(error).__name__}: {error}"}
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    # Keep-alive connections, so that a client can send many requests over one connection
+    protocol_version = "HTTP/1.1"
+
+    def _reply(self, status: int, body: dict):
+        data = json.dumps(body, default=_to_json).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self._reply(200, self.server.service.stats())
+        else:
+            self._reply(404, {"error": "GET serves /stats only, requests are POSTed as JSON"})
+
+    def do_POST(self):
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        except ValueError as error:
+            self._reply(400, {"error": f"Invalid JSON: {error}"})
+            return
+
+        # The path names the op unless the request does, e.g. POST /compare
+        if isinstance(request, dict) and "op" not in request:
+            request["op"] = self.path.strip("/")
+        response = self.server.service.handle(request)
+        self._reply(400 if "error" in response else 200, response)
+
+    def address_string(self):
+        # Clients of a Unix domain socket have no address
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _to_json(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class UnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    """HTTP server on a Unix domain socket, a thread per connection."""
+    daemon_threads = True
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+        UnixStreamServer.server_bind(self)
+        self.server_name, self.server_port = "localhost", 0
+
+
+def make_server(service: SimilarityService, host: str = "127.0.0.1", port: int = 8765, socket_path: str = None):
+    """Create the HTTP server of a service, on a Unix domain socket if socket_path is given."""
+    server = UnixHTTPServer(socket_path, _RequestHandler) if socket_path else \
+        ThreadingHTTPServer((host, port), _RequestHandler)
+    server.service = service
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve compare, featurize and query requests with warm caches over "
+                                                 "localhost HTTP or a Unix domain socket, see SimilarityService.")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    parser.add_argument("--socket", type=str, default=None, help="Listen on this Unix domain socket instead")
+    parser.add_argument("--aig_cache_size", type=int, default=1024, help="Number of parsed AIGs kept in memory")
+    parser.add_argument("--feature_cache_size", type=int, default=65536,
+                        help="Number of per-AIG features kept in memory")
+    parser.add_argument("--result_cache_size", type=int, default=65536, help="Number of pair results kept in memory")
+    parser.add_argument("--feature_store", type=str, default=None,
+                        help="Path to a feature store database backing the in-memory features")
+    parser.add_argument("--index_dir", type=str, default=None,
+                        help="Directory of the similarity indexes that queries name, queries are refused without it")
+    args = parser.parse_args()
+
+    feature_store = FeatureStore(args.feature_store) if args.feature_store is not None else None
+    service = SimilarityService(args.aig_cache_size, args.feature_cache_size, args.result_cache_size, feature_store,
+                                args.index_dir)
+    server = make_server(service, args.host, args.port, args.socket)
+    print(f"Serving on {args.socket or f'http://{args.host}:{args.port}'}")
+
+    with use_feature_store(service.features):
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            service.features.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+from multiprocessing.shared_memory import SharedMemory
+from typing import NamedTuple
+
+import numpy as np
+
+# Blocks attached by this process, by name. A block stays attached while the process lives, so that the arrays viewing
+# it stay valid.
+_attached = {}
+
+
+class SharedArray(NamedTuple):
+    """Handle of a NumPy array in a shared memory block, small enough to pass to worker processes."""
+    name: str
+    dtype: str
+    shape: tuple
+
+
+class SharedArrays:
+    """
+    Owner of the shared memory blocks of a set of arrays. Arrays are copied into a block of their own once, worker
+    processes map the block from its handle without copying (see attach). Blocks are removed by release, or by close
+    for all remaining blocks.
+
+    Use as a context manager, so that the blocks are removed even if the run fails.
+    """
+
+    def __init__(self):
+        self._blocks = {}
+
+    def share(self, array: np.ndarray) -> SharedArray:
+        """Copy an array into a new shared memory block and return its handle."""
+        array = np.ascontiguousarray(array)
+        block = SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+        self._blocks[block.name] = block
+        return SharedArray(block.name, array.dtype.str, array.shape)
+
+    def release(self, handles):
+        """Remove the blocks of the given handles, the processes that attached them keep their mapping."""
+        for handle in handles:
+            block = self._blocks.pop(handle.name, None)
+            if block is not None:
+                block.close()
+                block.unlink()
+
+    def close(self):
+        for block in self._blocks.values():
+            block.close()
+            block.unlink()
+        self._blocks.clear()
+
+    def __len__(self):
+        return len(self._blocks)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def attach(handle: SharedArray) -> np.ndarray:
+    """
+    Map a shared array from its handle without copying.
+
+    Returns:
+    --------
+    array : np.ndarray
+        Read-only view of the shared memory block, valid while this process lives.
+    """
+    block = _attached.get(handle.name)
+    if block is None:
+        block = _attached[handle.name] = SharedMemory(name=handle.name)
+    array = np.ndarray(handle.shape, dtype=np.dtype(handle.dtype), buffer=block.buf)
+    array.flags.writeable = False
+    return array
@@ -1,67 +1,88 @@
-from aigverse import Aig, aig_resubstitution, sop_refactoring, aig_cut_rewriting
+from aigverse import Aig
 
+from profiling import phase
 from sim_scores.euclidean_similarity_metric import euclidean_distance_metric
 from sim_scores.cosine_similarity_metric import cosine_similarity_metric
 from sim_scores.canberra_distance_metric import canberra_distance_metric
 from sim_scores.bray_curtis_dissimilarity_metric import bray_curtis_dissimilarity_metric
+from sim_scores.optimizers import optimized_gate_counts
 
 
-def relative_rrr(aig1: Aig, aig2: Aig) -> (list[float], list[float]):
+# Optimizations of an RRR profile, in profile order
+RRR_OPTIMIZATIONS = ["rewrite", "refactor", "resub"]
+
+
+def rrr_profiles(aigs: list[Aig]) -> list[(float, float, float)]:
     """
-    Compute relative optimizability via rewrite, refactor, and resub for two AIGs.
+    Compute the relative optimizability of AIGs via rewrite, refactor, and resub. The optimized gate counts are cached
+    by AIG content in optimizers.py, so each distinct AIG is optimized only once, and the optimizations of all uncached
+    AIGs run as one parallel batch.
 
     Parameters:
-    aig1, aig2 (Aig): The input AIGs to compare.
+    aigs (list[Aig]): The input AIGs.
 
     Returns:
-    float: The RRR between the two AIGs.
+    list[(float, float, float)]: The relative size improvements after rewriting, refactoring, and resubstitution,
+        for each AIG. An AIG without gates cannot be improved and gets (0, 0, 0), where the relative improvement used
+        to raise a ZeroDivisionError.
     """
-    # Get the original sizes of the AIGs
-    original_size_1 = aig1.num_gates()
-    original_size_2 = aig2.num_gates()
-
-    if original_size_1 == 0 and original_size_2 == 0:
-        return 0.0
+    # AIGs without gates are not optimized
+    runs = [(aig, optimization) for aig in aigs if aig.num_gates() > 0 for optimization in RRR_OPTIMIZATIONS]
+    with phase("optimize"):
+        optimized_sizes = iter(optimized_gate_counts(runs))
+
+    profiles = []
+    for aig in aigs:
+        original_size = aig.num_gates()
+        if original_size == 0:
+            profiles.append((0.0, 0.0, 0.0))
+        else:
+            profiles.append(tuple((original_size - next(optimized_sizes)) / original_size
+                                  for _ in RRR_OPTIMIZATIONS))
+
+    return profiles
+
+def rrr_profile(aig: Aig) -> (float, float, float):
+    """
+    Compute the relative optimizability of an AIG via rewrite, refactor, and resub, see rrr_profiles.
 
-    # Clone the AIGs to avoid modifying the original ones
-    rw_aig1, rf_aig1, rs_aig1 = aig1.clone(), aig1.clone(), aig1.clone()
-    rw_aig2, rf_aig2, rs_aig2 = aig2.clone(), aig2.clone(), aig2.clone()
+    Parameters:
+    aig (Aig): The input AIG.
 
-    # Perform rewriting optimization on both AIGs
-    aig_cut_rewriting(rw_aig1)
-    aig_cut_rewriting(rw_aig2)
+    Returns:
+    (float, float, float): The relative size improvements after rewriting, refactoring, and resubstitution.
+    """
+    return rrr_profiles([aig])[0]
 
-    # Get the optimized sizes of the AIGs
-    rw_size_1 = rw_aig1.num_gates()
-    rw_size_2 = rw_aig2.num_gates()
 
-    rw_improvement_1 = (original_size_1 - rw_size_1) / original_size_1
-    rw_improvement_2 = (original_size_2 - rw_size_2) / original_size_2
+def relative_rrr(aig1: Aig, aig2: Aig) -> (list[float], list[float]):
+    """
+    Compute relative optimizability via rewrite, refactor, and resub for two AIGs.
 
-    # Perform refactoring optimization on both AIGs
-    sop_refactoring(rf_aig1)
-    sop_refactoring(rf_aig2)
+    Parameters:
+    aig1, aig2 (Aig): The input AIGs to compare.
 
-    # Get the optimized sizes of the AIGs
-    rf_size_1 = rf_aig1.num_gates()
-    rf_size_2 = rf_aig2.num_gates()
+    Returns:
+    (list[float], list[float]): The RRR profiles of the two AIGs.
+    """
+    profile1, profile2 = rrr_profiles([aig1, aig2])
+    return list(profile1), list(profile2)
 
-    rf_improvement_1 = (original_size_1 - rf_size_1) / original_size_1
-    rf_improvement_2 = (original_size_2 - rf_size_2) / original_size_2
 
-    # Perform resubstitution optimization on both AIGs
-    aig_resubstitution(rs_aig1)
-    aig_resubstitution(rs_aig2)
+def relative_rrr_metrics(aig1: Aig, aig2: Aig) -> dict[str, float]:
+    """
+    Compute the Euclidean, Cosine, Canberra, and Bray-Curtis metrics for two AIGs at once, from a single RRR profile
+    per AIG.
 
-    # Get the optimized sizes of the AIGs
-    rs_size_1 = rs_aig1.num_gates()
-    rs_size_2 = rs_aig2.num_gates()
+    Parameters:
+    aig1, aig2 (Aig): The input AIGs to compare.
 
-    rs_improvement_1 = (original_size_1 - rs_size_1) / original_size_1
-    rs_improvement_2 = (original_size_2 - rs_size_2) / original_size_2
+    Returns:
+    dict[str, float]: The value of every RRR metric, keyed by its name in utils.FUNCTION_MAP.
+    """
+    rrr = relative_rrr(aig1, aig2)
 
-    return ([rw_improvement_1, rf_improvement_1, rs_improvement_1],
-            [rw_improvement_2, rf_improvement_2, rs_improvement_2])
+    return {name: distance(rrr[0], rrr[1]) for name, distance in RRR_DISTANCES.items()}
 
 
 def relative_rrr_euclidean_metric(aig1: Aig, aig2: Aig) -> float:
@@ -123,3 +144,12 @@ def relative_rrr_bray_curtis_metric(aig1: Aig, aig2: Aig) -> float:
     rrr = relative_rrr(aig1, aig2)
 
     return bray_curtis_dissimilarity_metric(rrr[0], rrr[1])
+
+
+# Distances between RRR profiles, keyed by metric name
+RRR_DISTANCES = {
+    "rel_rrr_euclidean": euclidean_distance_metric,
+    "rel_rrr_cosine": cosine_similarity_metric,
+    "rel_rrr_canberra": canberra_distance_metric,
+    "rel_rrr_bray_curtis": bray_curtis_dissimilarity_metric,
+}
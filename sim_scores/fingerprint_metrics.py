@@ -0,0 +1,108 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from aigverse import Aig
+
+from aig_arrays import aig_digest
+from feature_store import active_feature_store
+from profiling import phase
+from sim_scores.euclidean_similarity_metric import euclidean_distance_metric
+from sim_scores.optimizers import OptimizationStep, parse_script, optimization_trajectories
+
+# A resyn2-like script: a cheap stand-in for the dc2/deepsyn/orchestrate flows of the data directory
+DEFAULT_SCRIPT = parse_script("balance; rewrite; refactor; balance; rewrite; rewrite(allow_zero_gain=True); balance; "
+                              "refactor(allow_zero_gain=True); rewrite(allow_zero_gain=True); balance")
+
+# Number of trajectories kept in memory, so that an AIG runs a script once for all the pairs it takes part in
+TRAJECTORY_CACHE_SIZE = 4096
+
+# Version of the trajectories in the feature store, increased whenever the optimizers or their measures change
+TRAJECTORY_VERSION = 1
+
+_trajectories = OrderedDict()
+# Held while reading or updating _trajectories
+_trajectories_lock = threading.Lock()
+
+
+def trajectories(aigs: list[Aig], script: tuple[OptimizationStep, ...] = DEFAULT_SCRIPT) -> list[np.ndarray]:
+    """
+    Compute the optimization trajectories of AIGs under an optimization script. Trajectories are cached by AIG content
+    and script, also across runs with an active feature store, and the scripts of all uncached AIGs run as one parallel
+    batch.
+
+    Parameters:
+    aigs (list[Aig]): The input AIGs.
+    script (tuple[OptimizationStep, ...]): The optimization script, see optimizers.parse_script.
+
+    Returns:
+    list[np.ndarray]: For each AIG, the (gates, levels) before the script and after every iteration of every step,
+        as an array of shape (num_iterations + 1, 2).
+    """
+    keys = [(aig_digest(aig), script) for aig in aigs]
+    with _trajectories_lock:
+        results = {key: _trajectories[key] for key in keys if key in _trajectories}
+
+    missing = {key: aig for key, aig in zip(keys, aigs) if key not in results}
+
+    # Trajectories of earlier runs are read from the feature store, and new ones written to it
+    store = active_feature_store()
+    params = {"script": repr(script)}
+    if store is not None:
+        for key in list(missing):
+            stored = store.get(key[0], "optimization_trajectory", params, TRAJECTORY_VERSION)
+            if stored is not None:
+                results[key] = stored
+                del missing[key]
+
+    with phase("optimize"):
+        new_trajectories = optimization_trajectories([(aig, script) for aig in missing.values()])
+    results.update((key, np.asarray(trajectory)) for key, trajectory in zip(missing, new_trajectories))
+    if store is not None:
+        for key in missing:
+            store.put(key[0], "optimization_trajectory", params, TRAJECTORY_VERSION, results[key])
+
+    with _trajectories_lock:
+        for key in keys:
+            _trajectories[key] = results[key]
+            _trajectories.move_to_end(key)
+        while len(_trajectories) > TRAJECTORY_CACHE_SIZE:
+            _trajectories.popitem(last=False)
+
+    return [results[key] for key in keys]
+
+
+def optimization_fingerprint(trajectory: np.ndarray) -> np.ndarray:
+    """
+    Compute the optimizability fingerprint of an AIG from its optimization trajectory: the gate count and number of
+    levels after every step, relative to those of the original AIG.
+
+    Parameters:
+    trajectory (np.ndarray): The trajectory of the AIG, as returned by trajectories.
+
+    Returns:
+    np.ndarray: The relative gate counts after every step, followed by the relative numbers of levels.
+    """
+    # Gate counts and levels of an AIG without gates or levels stay at their original value
+    original = np.maximum(trajectory[0], 1)
+    relative = trajectory[1:] / original
+    return np.concatenate([relative[:, 0], relative[:, 1]])
+
+
+def optimization_fingerprint_metric(aig1: Aig, aig2: Aig, script: tuple[OptimizationStep, ...] = DEFAULT_SCRIPT) \
+        -> float:
+    """
+    Compute the optimization fingerprint metric for two AIGs. The optimization fingerprint metric is the Euclidean
+    distance between the relative gate counts and levels of the two AIGs along the same optimization script.
+
+    Parameters:
+    aig1, aig2 (Aig): The input AIGs to compare.
+    script (tuple[OptimizationStep, ...]): The optimization script, see optimizers.parse_script.
+
+    Returns:
+    float: The optimization fingerprint distance between the two AIGs.
+    """
+    trajectory1, trajectory2 = trajectories([aig1, aig2], script)
+
+    return euclidean_distance_metric(optimization_fingerprint(trajectory1).tolist(),
+                                     optimization_fingerprint(trajectory2).tolist())
@@ -0,0 +1,145 @@
+import numpy as np
+from aigverse import Aig
+
+from aig_arrays import AigArrays, to_aig_arrays
+from aig_simulation import WORD_BITS, exhaustive_patterns, node_signatures, popcount, random_patterns, \
+    simulate_outputs
+from profiling import phase
+
+# Number of pattern words simulated at once, bounds memory to num_nodes * BLOCK_WORDS words
+BLOCK_WORDS = 1024
+
+# Number of random pattern words used for node signatures (64 patterns per word)
+SIGNATURE_WORDS = 64
+
+
+def _check_interface(arrays: AigArrays, truth_words: np.ndarray, num_vars: int):
+    if arrays.num_pis != num_vars or arrays.num_pos != truth_words.shape[0]:
+        raise ValueError(f"AIG with {arrays.num_pis} inputs and {arrays.num_pos} outputs does not match the truth "
+                         f"table with {num_vars} inputs and {truth_words.shape[0]} outputs.")
+
+
+def _valid_bits_mask(num_vars: int, num_words: int) -> np.ndarray:
+    # Truth tables over fewer than 6 variables only use the low bits of their single word
+    mask = np.full(num_words, np.uint64(0xFFFFFFFFFFFFFFFF), dtype=np.uint64)
+    if (1 << num_vars) < WORD_BITS:
+        mask[0] = np.uint64((1 << (1 << num_vars)) - 1)
+    return mask
+
+
+def truth_table_agreement(aig: Aig, truth: (np.ndarray, int)) -> float:
+    """
+    Compute the fraction of output bits of an AIG that agree with a reference truth table. The AIG is simulated
+    exhaustively over all input minterms with bit-parallel simulation.
+
+    Parameters:
+    aig (Aig): The input AIG.
+    truth ((np.ndarray, int)): The packed reference truth tables and their number of variables, as returned by
+        aig_simulation.load_truth_table.
+
+    Returns:
+    float: The Hamming agreement between the AIG outputs and the truth table, ranging from 0 to 1.
+    """
+    truth_words, num_vars = truth
+    arrays = to_aig_arrays(aig)
+    _check_interface(arrays, truth_words, num_vars)
+
+    num_words = truth_words.shape[1]
+    mask = _valid_bits_mask(num_vars, num_words)
+    mismatches = 0
+
+    for start in range(0, num_words, BLOCK_WORDS):
+        stop = min(start + BLOCK_WORDS, num_words)
+        outputs = simulate_outputs(arrays, exhaustive_patterns(num_vars, start, stop))
+        mismatches += popcount((outputs ^ truth_words[:, start:stop]) & mask[start:stop])
+
+    return 1 - mismatches / (truth_words.shape[0] * (1 << num_vars))
+
+
+def truth_agreement_metric(aig1: Aig, aig2: Aig, truth: (np.ndarray, int)) -> float:
+    """
+    Compute the functional agreement metric for two AIGs. The functional agreement is the fraction of output bits on
+    which both AIGs agree, over all input minterms of the benchmark truth table. Both AIGs are checked against the
+    interface of the truth table and simulated on the same exhaustive input patterns.
+
+    Parameters:
+    aig1, aig2 (Aig): The input AIGs to compare.
+    truth ((np.ndarray, int)): The packed reference truth tables and their number of variables, as returned by
+        aig_simulation.load_truth_table.
+
+    Returns:
+    float: The Hamming agreement between the outputs of the two AIGs, ranging from 0 to 1.
+    """
+    truth_words, num_vars = truth
+    arrays1 = to_aig_arrays(aig1)
+    arrays2 = to_aig_arrays(aig2)
+    _check_interface(arrays1, truth_words, num_vars)
+    _check_interface(arrays2, truth_words, num_vars)
+
+    num_words = truth_words.shape[1]
+    mask = _valid_bits_mask(num_vars, num_words)
+    mismatches = 0
+
+    with phase("simulate"):
+        for start in range(0, num_words, BLOCK_WORDS):
+            stop = min(start + BLOCK_WORDS, num_words)
+            patterns = exhaustive_patterns(num_vars, start, stop)
+            outputs1 = simulate_outputs(arrays1, patterns)
+            outputs2 = simulate_outputs(arrays2, patterns)
+            mismatches += popcount((outputs1 ^ outputs2) & mask[start:stop])
+
+    return 1 - mismatches / (truth_words.shape[0] * (1 << num_vars))
+
+
+def gate_functions(aig: Aig, num_pis: int = None, num_words: int = SIGNATURE_WORDS, seed: int = 0) -> set[bytes]:
+    """
+    Compute the set of functions implemented by the gates of an AIG, represented by their phase-canonical random
+    simulation signatures.
+
+    Parameters:
+    aig (Aig): The input AIG.
+    num_pis (int): Number of input patterns to generate, defaults to the number of inputs of the AIG. Use the same
+        value for AIGs that are compared, so that input i receives the same patterns in both.
+    num_words (int): Number of 64-bit pattern words per input.
+    seed (int): Seed of the random input patterns.
+
+    Returns:
+    set[bytes]: The hashed signatures of all gates.
+    """
+    arrays = to_aig_arrays(aig)
+    if num_pis is None:
+        num_pis = arrays.num_pis
+
+    patterns = random_patterns(num_pis, num_words, seed)[:arrays.num_pis]
+    signatures = node_signatures(arrays, patterns)
+
+    return {row.tobytes() for row in signatures[1 + arrays.num_pis:]}
+
+
+def shared_function_metric(aig1: Aig, aig2: Aig) -> float:
+    """
+    Compute the shared function metric for two AIGs. The shared function metric is the Jaccard similarity of the sets
+    of functions implemented by the internal nodes of both AIGs, where node functions are identified up to complement
+    by bit-parallel random simulation over the same input patterns.
+
+    Parameters:
+    aig1, aig2 (Aig): The input AIGs to compare.
+
+    Returns:
+    float: The fraction of internal node functions shared between the two AIGs, ranging from 0 to 1.
+    """
+    arrays1 = to_aig_arrays(aig1)
+    arrays2 = to_aig_arrays(aig2)
+
+    num_pis = max(arrays1.num_pis, arrays2.num_pis)
+    with phase("simulate"):
+        functions1 = gate_functions(arrays1, num_pis)
+        functions2 = gate_functions(arrays2, num_pis)
+
+    union = functions1 | functions2
+
+    # Two AIGs without gates have no functions to disagree on
+    if len(union) == 0:
+        return 1.0
+
+    return len(functions1 & functions2) / len(union)
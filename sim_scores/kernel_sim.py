@@ -1,5 +1,16 @@
 import networkx as nx
-from  graph_utils import get_graph
+import numpy as np
+import scipy.sparse as sps
+from  graph_utils import get_graph, get_edge_list
+from aig_arrays import _mix
+from feature_store import cached_feature
+from profiling import phase
+
+# Number of refinements of the Weisfeiler-Lehman kernel, the kernel sums over the initial labels and each refinement
+WL_ITERATIONS = 5
+
+# Version of the stored WL features (see feature_store.cached_feature), increased whenever the labels change
+WL_FEATURES_VERSION = 1
 
 
 def compute_graph_kernel(G1, G2, kernel_type='weisfeiler_lehman'):
@@ -24,12 +35,13 @@ def compute_graph_kernel(G1, G2, kernel_type='weisfeiler_lehman'):
         return 0.0
 
     if kernel_type == 'weisfeiler_lehman':
-        gk = WeisfeilerLehman(n_iter=5)
+        gk = WeisfeilerLehman(n_iter=WL_ITERATIONS)
     else:
         raise ValueError("Unsupported kernel type.")
 
     Gs = [nx_to_grakel(G1), nx_to_grakel(G2)]
-    K = gk.fit_transform(Gs)
+    with phase("feature"):
+        K = gk.fit_transform(Gs)
 
     # Normalize the kernel matrix properly
     K_normalized = K / np.sqrt(np.outer(np.diag(K), np.diag(K)))
@@ -40,3 +52,57 @@ def compute_graph_kernel(G1, G2, kernel_type='weisfeiler_lehman'):
 def get_kernel_sim(aig1, aig2):
     G1, G2 = get_graph(aig1, aig2, directed=False)
     return compute_graph_kernel(G1, G2, kernel_type='weisfeiler_lehman')
+
+
+def wl_features(aig, n_iter=WL_ITERATIONS):
+    """
+    Compute the Weisfeiler-Lehman subtree features of the undirected graph of an AIG, so that the kernel_sim
+    similarity of any two AIGs is the normalized dot product of their features.
+
+    Nodes start with their node id as label, as in compute_graph_kernel, and every refinement relabels a node with a
+    64-bit hash of its label and the multiset of the labels of its neighbors. The hash replaces the relabeling
+    dictionary grakel builds for the graphs it is fitted on, so features of different AIGs are comparable without
+    fitting them together.
+
+    Parameters:
+    aig (Aig): The input AIG, or its AigArrays.
+    n_iter (int): Number of refinements, as the n_iter of grakel's WeisfeilerLehman.
+
+    Returns:
+    (np.ndarray, np.ndarray): The sorted distinct labels (uint64) of the initial and refined labelings and their
+        node counts.
+    """
+    def compute():
+        edges = np.array(get_edge_list(aig), dtype=np.int64).reshape(-1, 3)[:, :2]
+        if len(edges) == 0:
+            return np.empty(0, dtype=np.uint64), np.empty(0)
+
+        nodes, index = np.unique(edges, return_inverse=True)
+        index = index.reshape(-1, 2)
+        n = len(nodes)
+        A = sps.csr_matrix((np.ones(2 * len(index)), (np.concatenate([index[:, 0], index[:, 1]]),
+                                                      np.concatenate([index[:, 1], index[:, 0]]))), shape=(n, n))
+        A.sum_duplicates()
+
+        with phase("feature"):
+            labels = _mix(nodes.astype(np.uint64))
+            label_sets = [labels]
+            for iteration in range(1, n_iter + 1):
+                # Order-independent multiset hash: the wrapping sum of the mixed labels of the neighbors
+                sums = np.concatenate([np.zeros(1, dtype=np.uint64), np.cumsum(_mix(labels)[A.indices], dtype=np.uint64)])
+                neighborhoods = sums[A.indptr[1:]] - sums[A.indptr[:-1]]
+                labels = _mix(_mix(labels + np.uint64(iteration)) ^ neighborhoods)
+                label_sets.append(labels)
+
+            features, counts = np.unique(np.concatenate(label_sets), return_counts=True)
+        return features, counts.astype(np.float64)
+
+    return cached_feature("wl_features", aig, {"n_iter": n_iter}, compute, WL_FEATURES_VERSION)
+
+
+def wl_similarity(features1, features2):
+    """Normalized Weisfeiler-Lehman kernel value of two AIGs from their wl_features, 0 for an empty graph."""
+    (labels1, counts1), (labels2, counts2) = features1, features2
+    _, index1, index2 = np.intersect1d(labels1, labels2, assume_unique=True, return_indices=True)
+    norm = np.sqrt(np.dot(counts1, counts1) * np.dot(counts2, counts2))
+    return float(np.dot(counts1[index1], counts2[index2]) / norm) if norm > 0 else 0.0
@@ -0,0 +1,132 @@
+from typing import NamedTuple
+
+import numpy as np
+from aigverse import Aig
+
+from aig_arrays import to_aig_arrays
+from profiling import phase
+from sim_scores.cosine_similarity_metric import cosine_similarity_metric
+from sim_scores.euclidean_similarity_metric import euclidean_distance_metric
+
+# Number of depth bins of the level descriptor, levels are binned by their depth relative to the AIG depth
+LEVEL_BINS = 16
+
+# Lower bounds of the fanout bins of the level descriptor, the last bin is open-ended
+FANOUT_BINS = [0, 1, 2, 3, 4, 8, 16]
+
+
+class LevelProfile(NamedTuple):
+    """
+    Level-structured features of an AIG.
+
+    Fields:
+    -------
+    gates_per_level : np.ndarray (shape (depth + 1,))
+        Number of gates at every level (level 0 holds the constant and the primary inputs, so it is always 0).
+    complemented_per_level : np.ndarray (shape (depth + 1,))
+        Number of complemented fanin edges of the gates at every level.
+    fanout_histogram : np.ndarray
+        Number of inputs and gates with each fanout, counting the primary outputs they drive.
+    reconvergent_gates : int
+        Number of gates whose fanins reconverge within two levels: one fanin feeds the other, or both share a fanin.
+    """
+    gates_per_level: np.ndarray
+    complemented_per_level: np.ndarray
+    fanout_histogram: np.ndarray
+    reconvergent_gates: int
+
+
+def level_profile(aig: Aig) -> LevelProfile:
+    """
+    Compute the level-structured features of an AIG in a single vectorized pass over its fanin arrays.
+
+    Parameters:
+    aig (Aig): The input AIG, or its AigArrays.
+
+    Returns:
+    LevelProfile: The per-level gate and complemented edge counts, the fanout histogram and the reconvergent gates.
+    """
+    arrays = to_aig_arrays(aig)
+    first_gate = 1 + arrays.num_pis
+    gate_levels = arrays.levels[first_gate:]
+    depth = int(arrays.levels.max(initial=0))
+
+    gates_per_level = np.bincount(gate_levels, minlength=depth + 1)
+    complemented = (arrays.fanin0 & 1) + (arrays.fanin1 & 1)
+    complemented_per_level = np.bincount(gate_levels, weights=complemented, minlength=depth + 1).astype(np.int64)
+
+    # Fanouts of the inputs and gates, the constant node is left out
+    node0, node1 = arrays.fanin0 >> 1, arrays.fanin1 >> 1
+    fanouts = np.bincount(np.concatenate([node0, node1, arrays.pos >> 1]), minlength=arrays.num_nodes)[1:]
+    fanout_histogram = np.bincount(fanouts)
+
+    # Fanin nodes of every node, -1 for the constant and the primary inputs
+    fanin_nodes = np.full((2, arrays.num_nodes), -1, dtype=np.int64)
+    fanin_nodes[0, first_gate:], fanin_nodes[1, first_gate:] = node0, node1
+    a, b = fanin_nodes[:, node0], fanin_nodes[:, node1]
+    feeds = (a[0] == node1) | (a[1] == node1) | (b[0] == node0) | (b[1] == node0)
+    shared = ((a[0] >= 0) & ((a[0] == b[0]) | (a[0] == b[1]))) | ((a[1] >= 0) & ((a[1] == b[0]) | (a[1] == b[1])))
+    reconvergent_gates = int(np.count_nonzero(feeds | shared))
+
+    return LevelProfile(gates_per_level, complemented_per_level, fanout_histogram, reconvergent_gates)
+
+
+def level_descriptor(aig: Aig) -> np.ndarray:
+    """
+    Compute a fixed-length descriptor of an AIG from its level profile, comparable between AIGs of different depths.
+
+    Parameters:
+    aig (Aig): The input AIG, or its AigArrays.
+
+    Returns:
+    np.ndarray: The fraction of gates in each of the LEVEL_BINS relative depth bins, the fraction of complemented
+        fanin edges in each bin, the fraction of inputs and gates in each FANOUT_BINS bin, and the fraction of
+        reconvergent gates.
+    """
+    with phase("feature"):
+        profile = level_profile(aig)
+
+    num_gates = profile.gates_per_level.sum()
+    depth = len(profile.gates_per_level) - 1
+
+    # Levels 1..depth are spread over the depth bins
+    bins = (np.arange(depth) * LEVEL_BINS) // max(depth, 1)
+    gates = np.bincount(bins, weights=profile.gates_per_level[1:], minlength=LEVEL_BINS)
+    complemented = np.bincount(bins, weights=profile.complemented_per_level[1:], minlength=LEVEL_BINS)
+
+    fanout_bins = np.searchsorted(FANOUT_BINS, np.arange(len(profile.fanout_histogram)), side="right") - 1
+    fanouts = np.bincount(fanout_bins, weights=profile.fanout_histogram, minlength=len(FANOUT_BINS))
+
+    return np.concatenate([
+        gates / max(num_gates, 1),
+        np.divide(complemented, 2 * gates, out=np.zeros(LEVEL_BINS), where=gates > 0),
+        fanouts / max(fanouts.sum(), 1),
+        [profile.reconvergent_gates / max(num_gates, 1)],
+    ])
+
+
+def level_profile_euclidean_metric(aig1: Aig, aig2: Aig) -> float:
+    """
+    Compute the level profile Euclidean metric for two AIGs. The level profile Euclidean metric is the Euclidean
+    distance between the level descriptors of the two AIGs, see level_descriptor.
+
+    Parameters:
+    aig1, aig2 (Aig): The input AIGs to compare, or their AigArrays.
+
+    Returns:
+    float: The level profile Euclidean metric between the two AIGs.
+    """
+    return euclidean_distance_metric(level_descriptor(aig1).tolist(), level_descriptor(aig2).tolist())
+
+
+def level_profile_cosine_metric(aig1: Aig, aig2: Aig) -> float:
+    """
+    Compute the level profile cosine similarity for two AIGs, between their level descriptors, see level_descriptor.
+
+    Parameters:
+    aig1, aig2 (Aig): The input AIGs to compare, or their AigArrays.
+
+    Returns:
+    float: The cosine similarity between the level descriptors of the two AIGs.
+    """
+    return cosine_similarity_metric(level_descriptor(aig1).tolist(), level_descriptor(aig2).tolist())
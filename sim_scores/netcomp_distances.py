@@ -1,9 +1,18 @@
 import networkx as nx
 from NetComp.deltacon0 import deltacon0
-from NetComp.netsimile import netsimile
-from  graph_utils import get_graph
+from NetComp.netsimile import netsimile_aggregate, directed_netsimile_aggregate, netsimile_distance
+from  graph_utils import get_graph, build_graph, build_adjacency
+from feature_store import cached_feature
+from profiling import phase
 import numpy as np
 
+# Version of the stored NetSimile aggregates, increased whenever the NetComp features change. 2 since the inverted
+# and uninverted flavors are the networkx features again, the direction-aware ones are the directed_ flavors.
+NETSIMILE_AGGREGATE_VERSION = 2
+
+# Flavors of the directed graphs: the weights of their complemented and regular edges, see get_graph
+_DIRECTED_WEIGHTS = {"inverted": (-1, 1), "uninverted": (1, 1)}
+
 
 def get_sparse_adjacency_matrix(graph, size):
     """w
@@ -33,20 +42,56 @@ def get_deltacon0(aig1, aig2):
     A1 = get_sparse_adjacency_matrix(G1, max_size)
     A2 = get_sparse_adjacency_matrix(G2, max_size)
 
-    return deltacon0(A1, A2, eps=1e-8)
+    with phase("feature"):
+        return deltacon0(A1, A2, eps=1e-8)
 
 
-def get_net_simile(aig1,aig2):
-    G1, G2 = get_graph(aig1, aig2, directed=False)  # resistance distance is not for directed graphs
+def aig_netsimile_aggregate(aig, flavor="undirected", sample_size=None, sampling="uniform"):
+    """
+    NetSimile aggregate of the graph of an AIG and its sampling error, see NetComp.netsimile.netsimile_aggregate.
+    The flavor selects the graph and features: "undirected", the networkx features of the directed graph with
+    complemented edges "inverted" (reversed) or "uninverted", or the direction-aware features of
+    NetComp.features.get_directed_features of these graphs, "directed_inverted" or "directed_uninverted". Aggregates
+    only depend on a single graph, so they are stored per AIG in the active feature store.
+    """
+    params = {"flavor": flavor, "sample_size": sample_size, "sampling": sampling}
 
-    return netsimile(G1, G2)
+    def compute():
+        if flavor == "undirected":
+            G = build_graph(aig, directed=False)  # resistance distance is not for directed graphs
+            with phase("feature"):
+                return netsimile_aggregate(G, sample_size, sampling)
+        if flavor in _DIRECTED_WEIGHTS:
+            G = build_graph(aig, directed=True, weights=_DIRECTED_WEIGHTS[flavor])
+            with phase("feature"):
+                return netsimile_aggregate(G, sample_size, sampling)
+        A = build_adjacency(aig, weights=_DIRECTED_WEIGHTS[flavor[len("directed_"):]])
+        with phase("feature"):
+            return directed_netsimile_aggregate(A, sample_size, sampling)
 
+    return cached_feature("netsimile_aggregate", aig, params, compute, NETSIMILE_AGGREGATE_VERSION)
 
-def get_ns_dir_inverted(aig1, aig2):
-    G1, G2 = get_graph(aig1, aig2, directed=True)
-    return netsimile(G1, G2)
 
-def get_ns_dir_uninverted(aig1, aig2):
-    G1, G2 = get_graph(aig1, aig2, directed=True, weights=(1,1))
-    return netsimile(G1, G2)
+def _netsimile_metric(aig1, aig2, flavor, sample_size, sampling):
+    aggregate1 = aig_netsimile_aggregate(aig1, flavor, sample_size, sampling)
+    aggregate2 = aig_netsimile_aggregate(aig2, flavor, sample_size, sampling)
+    return netsimile_distance(aggregate1, aggregate2)
+
+
+def get_net_simile(aig1, aig2, sample_size=None, sampling="uniform"):
+    return _netsimile_metric(aig1, aig2, "undirected", sample_size, sampling)
+
+
+def get_ns_dir_inverted(aig1, aig2, sample_size=None, sampling="uniform"):
+    return _netsimile_metric(aig1, aig2, "inverted", sample_size, sampling)
+
+def get_ns_dir_uninverted(aig1, aig2, sample_size=None, sampling="uniform"):
+    return _netsimile_metric(aig1, aig2, "uninverted", sample_size, sampling)
+
+
+def get_ns_dir(aig1, aig2, sample_size=None, sampling="uniform"):
+    return _netsimile_metric(aig1, aig2, "directed_inverted", sample_size, sampling)
+
 
+def get_ns_dir_uninverted_directed(aig1, aig2, sample_size=None, sampling="uniform"):
+    return _netsimile_metric(aig1, aig2, "directed_uninverted", sample_size, sampling)
@@ -0,0 +1,288 @@
+import ast
+import inspect
+import multiprocessing
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from typing import NamedTuple
+
+from aigverse import Aig, DepthAig, aig_cut_rewriting, aig_resubstitution, sop_refactoring, balancing
+
+from aig_arrays import to_aig_arrays, arrays_to_aig, aig_digest
+from feature_store import active_feature_store
+
+# Optimizations used by the optimization metrics, by name
+OPTIMIZERS = {
+    "rewrite": aig_cut_rewriting,
+    "refactor": sop_refactoring,
+    "resub": aig_resubstitution,
+    "balance": balancing,
+}
+
+# Number of optimizer runs executed in parallel, 1 runs them one after another in the calling thread. main.py sets it
+# to the cores left per job, see --optimizer_workers.
+OPTIMIZER_WORKERS = os.cpu_count() or 1
+
+# "thread", "process", or None to use threads if the aigverse bindings release the GIL and processes otherwise
+OPTIMIZER_BACKEND = None
+
+# Number of optimization results kept in memory, so that an AIG is copied and optimized once per optimizer for all
+# the pairs and metrics it takes part in
+RESULT_CACHE_SIZE = 16384
+
+# Version of the optimization results in the feature store, increased whenever an optimizer or the result changes
+OPTIMIZATION_VERSION = 2
+
+_results = OrderedDict()
+# Guards _results, the metrics of service.py run in a thread per request
+_results_lock = threading.Lock()
+
+# Pool of the current process, recreated after a fork since the threads or processes of a pool are not inherited
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+class OptimizationResult(NamedTuple):
+    """Size of an AIG after an optimization. Levels are only counted by the trajectories of optimization scripts."""
+    gates: int
+
+
+class OptimizationStep(NamedTuple):
+    """A step of an optimization script: an optimizer of OPTIMIZERS, its keyword parameters and repetitions."""
+    optimizer: str
+    params: tuple = ()
+    iterations: int = 1
+
+
+# A step is written as name, name(key=value, ...), optionally followed by *iterations
+_STEP_PATTERN = re.compile(r"^(?P<name>\w+)\s*(\((?P<params>.*)\))?\s*(\*\s*(?P<iterations>\d+))?$")
+
+
+@lru_cache(maxsize=None)
+def optimizer_parameters(optimizer: str) -> tuple[str, ...]:
+    """Names of the keyword parameters of an optimizer of OPTIMIZERS, without its AIG parameter."""
+    function = OPTIMIZERS[optimizer]
+    try:
+        names = list(inspect.signature(function).parameters)
+    except ValueError:
+        # The aigverse bindings only describe their signature in the first line of their docstring
+        names = re.findall(r"[(,]\s*(\w+)\s*:", (function.__doc__ or "").strip().split("\n")[0])
+    return tuple(names[1:])
+
+
+def parse_script(text: str) -> tuple[OptimizationStep, ...]:
+    """
+    Parse an optimization script such as "balance; rewrite; refactor(allow_zero_gain=True)*2; resub(max_pis=6)".
+
+    Parameters:
+    text (str): Steps separated by semicolons. Parameters must be keyword parameters of the optimizer, and
+        iterations at least 1.
+
+    Returns:
+    tuple[OptimizationStep, ...]: The steps of the script.
+    """
+    steps = []
+    for step_text in filter(None, (part.strip() for part in text.split(";"))):
+        match = _STEP_PATTERN.match(step_text)
+        call = None
+        if match is not None and match["params"]:
+            try:
+                call = ast.parse(f"step({match['params']})", mode="eval").body
+            except SyntaxError:
+                match = None
+
+        if match is None or match["name"] not in OPTIMIZERS or (call is not None and call.args):
+            raise ValueError(f"Invalid optimization step '{step_text}', expected one of {list(OPTIMIZERS)} with "
+                             f"optional (key=value, ...) parameters and *iterations.")
+
+        params = () if call is None else tuple((keyword.arg, ast.literal_eval(keyword.value))
+                                               for keyword in call.keywords)
+        parameters = optimizer_parameters(match["name"])
+        for name, _ in params:
+            if name not in parameters:
+                raise ValueError(f"Invalid parameter '{name}' in optimization step '{step_text}', {match['name']} "
+                                 f"takes {list(parameters)}.")
+        iterations = int(match["iterations"] or 1)
+        if iterations < 1:
+            raise ValueError(f"Invalid optimization step '{step_text}', iterations must be at least 1.")
+        steps.append(OptimizationStep(match["name"], params, iterations))
+
+    return tuple(steps)
+
+
+def _optimize(aig: Aig, optimization: str) -> OptimizationResult:
+    # Clone the AIG to avoid modifying the original one, the copy is dropped as soon as its size is recorded
+    aig = aig.clone()
+    OPTIMIZERS[optimization](aig)
+    return OptimizationResult(aig.num_gates())
+
+
+def _run_script(aig: Aig, script: tuple[OptimizationStep, ...]) -> list[(int, int)]:
+    # All steps run one after another on a single copy of the AIG
+    aig = aig.clone()
+    trajectory = [(aig.num_gates(), DepthAig(aig).num_levels())]
+
+    for step in script:
+        for _ in range(step.iterations):
+            OPTIMIZERS[step.optimizer](aig, **dict(step.params))
+            trajectory.append((aig.num_gates(), DepthAig(aig).num_levels()))
+
+    return trajectory
+
+
+def _on_arrays(function, arrays, argument):
+    # aigverse AIGs cannot be pickled, worker processes receive the AIG as arrays and rebuild it
+    return function(arrays_to_aig(arrays), argument)
+
+
+def _probe_aig() -> Aig:
+    aig = Aig()
+    signals = [aig.create_pi() for _ in range(32)]
+    for i in range(1500):
+        a = signals[(i * 7919) % len(signals)]
+        b = signals[(i * 104729 + 13) % len(signals)]
+        signals.append(aig.create_and(a if i % 2 else ~a, b if i % 3 else ~b))
+    for signal in signals[-8:]:
+        aig.create_po(signal)
+    return aig
+
+
+@lru_cache(maxsize=1)
+def optimizers_release_gil() -> bool:
+    """
+    Check whether the aigverse optimizations release the GIL, by counting how far the calling thread gets while an
+    optimization runs in another thread. If the GIL is held, the calling thread is stalled for the whole run.
+    """
+    def count_for(seconds):
+        count, end = 0, time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            count += 1
+        return count
+
+    probe_seconds = 0.02
+    rate_alone = count_for(probe_seconds) / probe_seconds
+
+    worker = threading.Thread(target=_optimize, args=(_probe_aig(), "rewrite"))
+    count, start = 0, time.perf_counter()
+    worker.start()
+    while worker.is_alive():
+        time.perf_counter()
+        count += 1
+    rate_during = count / (time.perf_counter() - start)
+
+    # Even on a single core the calling thread gets a fair share of the time if the GIL is released
+    return rate_during > 0.1 * rate_alone
+
+
+def _backend() -> str:
+    """The backend of the optimizer pool, None to run the optimizations in the calling thread."""
+    if OPTIMIZER_WORKERS <= 1:
+        return None
+    backend = OPTIMIZER_BACKEND or ("thread" if optimizers_release_gil() else "process")
+    # Daemon processes, such as the pair processes of the scheduler, cannot start worker processes
+    if backend == "process" and multiprocessing.current_process().daemon:
+        return None
+    return backend
+
+
+def _get_pool(backend: str):
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = (ThreadPoolExecutor if backend == "thread" else ProcessPoolExecutor)(max_workers=OPTIMIZER_WORKERS)
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def _parallel_map(function, runs) -> list:
+    backend = _backend() if len(runs) > 1 else None
+    if backend is None:
+        return [function(aig, argument) for aig, argument in runs]
+
+    pool = _get_pool(backend)
+    if isinstance(pool, ThreadPoolExecutor):
+        futures = [pool.submit(function, aig, argument) for aig, argument in runs]
+    else:
+        futures = [pool.submit(_on_arrays, function, to_aig_arrays(aig), argument) for aig, argument in runs]
+
+    return [future.result() for future in futures]
+
+
+def optimization_results(runs) -> list[OptimizationResult]:
+    """
+    Run optimizations on copies of AIGs, in parallel when OPTIMIZER_WORKERS allows it, and return the sizes of the
+    optimized AIGs. Results are cached by AIG content and optimization, so each distinct AIG is copied and optimized
+    once per optimization, and at most one copy per worker is alive at a time. With an active feature store, results
+    are also kept across runs.
+
+    Parameters:
+    runs (list[(Aig, str)]): The AIGs and the names of the optimizations (see OPTIMIZERS) to run on them. The AIGs
+        are not modified.
+
+    Returns:
+    list[OptimizationResult]: The number of gates of each optimized AIG, in the order of the runs.
+    """
+    keys = [(aig_digest(aig), optimization) for aig, optimization in runs]
+    with _results_lock:
+        results = {key: _results[key] for key in keys if key in _results}
+
+    missing = {key: run for key, run in zip(keys, runs) if key not in results}
+
+    # Results of earlier runs are read from the feature store, and new ones written to it
+    store = active_feature_store()
+    if store is not None:
+        for key in list(missing):
+            stored = store.get(key[0], "optimization", {"optimizer": key[1]}, OPTIMIZATION_VERSION)
+            if stored is not None:
+                results[key] = OptimizationResult(*stored)
+                del missing[key]
+
+    computed = _parallel_map(_optimize, list(missing.values()))
+    results.update(zip(missing, computed))
+    if store is not None:
+        for key, result in zip(missing, computed):
+            store.put(key[0], "optimization", {"optimizer": key[1]}, OPTIMIZATION_VERSION, tuple(result))
+
+    with _results_lock:
+        for key in keys:
+            _results[key] = results[key]
+            _results.move_to_end(key)
+        while len(_results) > RESULT_CACHE_SIZE:
+            _results.popitem(last=False)
+
+    return [results[key] for key in keys]
+
+
+def optimized_gate_counts(runs) -> list[int]:
+    """
+    Run optimizations on copies of AIGs and return the gate counts of the optimized AIGs, see optimization_results.
+
+    Parameters:
+    runs (list[(Aig, str)]): The AIGs and the names of the optimizations (see OPTIMIZERS) to run on them. The AIGs
+        are not modified.
+
+    Returns:
+    list[int]: The number of gates of each optimized AIG, in the order of the runs.
+    """
+    return [result.gates for result in optimization_results(runs)]
+
+
+def optimization_trajectories(runs) -> list[list[(int, int)]]:
+    """
+    Run optimization scripts on copies of AIGs, in parallel when OPTIMIZER_WORKERS allows it, and record the gate
+    count and number of levels after every step.
+
+    Parameters:
+    runs (list[(Aig, tuple[OptimizationStep, ...])]): The AIGs and the scripts to run on them. The AIGs are not
+        modified.
+
+    Returns:
+    list[list[(int, int)]]: For each run, the (gates, levels) of the AIG before the script and after every iteration
+        of every step.
+    """
+    return _parallel_map(_run_script, runs)
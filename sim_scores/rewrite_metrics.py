@@ -1,4 +1,7 @@
-from aigverse import Aig, aig_cut_rewriting
+from aigverse import Aig
+
+from profiling import phase
+from sim_scores.optimizers import optimized_gate_counts
 
 
 def absolute_rewrite_metric(aig1: Aig, aig2: Aig) -> int:
@@ -12,21 +15,13 @@ def absolute_rewrite_metric(aig1: Aig, aig2: Aig) -> int:
     Returns:
     int: The absolute rewrite metric between the two AIGs.
     """
-    # Clone the AIGs to avoid modifying the original ones
-    aig1 = aig1.clone()
-    aig2 = aig2.clone()
-
     # Get the original sizes of the AIGs
     original_size_1 = aig1.num_gates()
     original_size_2 = aig2.num_gates()
 
-    # Perform cut rewriting on both AIGs
-    aig_cut_rewriting(aig1)
-    aig_cut_rewriting(aig2)
-
-    # Get the optimized sizes of the AIGs
-    optimized_size_1 = aig1.num_gates()
-    optimized_size_2 = aig2.num_gates()
+    # Perform cut rewriting on copies of both AIGs and get their optimized sizes
+    with phase("optimize"):
+        optimized_size_1, optimized_size_2 = optimized_gate_counts([(aig1, "rewrite"), (aig2, "rewrite")])
 
     # Return the absolute difference between the original and optimized sizes
     return abs((optimized_size_1 - original_size_1) - (optimized_size_2 - original_size_2))
@@ -43,10 +38,6 @@ def relative_rewrite_metric(aig1: Aig, aig2: Aig) -> float:
     Returns:
     float: The relative rewrite metric between the two AIGs.
     """
-    # Clone the AIGs to avoid modifying the original ones
-    aig1 = aig1.clone()
-    aig2 = aig2.clone()
-
     # Get the original sizes of the AIGs
     original_size_1 = aig1.num_gates()
     original_size_2 = aig2.num_gates()
@@ -54,13 +45,9 @@ def relative_rewrite_metric(aig1: Aig, aig2: Aig) -> float:
     if original_size_1 == 0 and original_size_2 == 0:
         return 0.0
 
-    # Perform cut rewriting on both AIGs
-    aig_cut_rewriting(aig1)
-    aig_cut_rewriting(aig2)
-
-    # Get the optimized sizes of the AIGs
-    optimized_size_1 = aig1.num_gates()
-    optimized_size_2 = aig2.num_gates()
+    # Perform cut rewriting on copies of both AIGs and get their optimized sizes
+    with phase("optimize"):
+        optimized_size_1, optimized_size_2 = optimized_gate_counts([(aig1, "rewrite"), (aig2, "rewrite")])
 
     relative_improvement_1 = (original_size_1 - optimized_size_1) / original_size_1
     relative_improvement_2 = (original_size_2 - optimized_size_2) / original_size_2
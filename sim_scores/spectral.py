@@ -1,9 +1,32 @@
-from graph_utils import get_graph
+from feature_store import active_feature_store, cached_feature
+from graph_utils import get_graph, build_graph
+from profiling import phase
 import numpy as np
 import networkx as nx
 from scipy.sparse.linalg import eigsh, eigs
 from scipy.linalg import issymmetric
 
+# Version of the stored spectra, increased whenever the matrices or the eigensolver change
+SPECTRUM_VERSION = 1
+
+
+def _graph_matrix(graph, matrix_type):
+    if matrix_type == 'adjacency':
+        return nx.adjacency_matrix(graph).astype(np.float64)
+    elif matrix_type == 'laplacian':
+        return nx.laplacian_matrix(graph).astype(np.float64)
+    elif matrix_type == 'normalized_laplacian':
+        return nx.normalized_laplacian_matrix(graph).astype(np.float64)
+    else:
+        raise ValueError("matrix_type must be 'adjacency', 'laplacian', or 'normalized_laplacian'")
+
+
+def _compute_eigenvalues(matrix, k, which):
+    if issymmetric(matrix.toarray()):
+        return eigsh(matrix, k=k, which=which, return_eigenvectors=False)
+    else:
+        return eigs(matrix, k=k, which=which, return_eigenvectors=False)
+
 
 def spectral_distance(graph1, graph2, matrix_type='adjacency', k=100, which='LR'):
     """
@@ -24,17 +47,8 @@ def spectral_distance(graph1, graph2, matrix_type='adjacency', k=100, which='LR'
         The spectral distance between the two graphs.
     """
     # Select the matrix type
-    if matrix_type == 'adjacency':
-        matrix1 = nx.adjacency_matrix(graph1).astype(np.float64)
-        matrix2 = nx.adjacency_matrix(graph2).astype(np.float64)
-    elif matrix_type == 'laplacian':
-        matrix1 = nx.laplacian_matrix(graph1).astype(np.float64)
-        matrix2 = nx.laplacian_matrix(graph2).astype(np.float64)
-    elif matrix_type == 'normalized_laplacian':
-        matrix1 = nx.normalized_laplacian_matrix(graph1).astype(np.float64)
-        matrix2 = nx.normalized_laplacian_matrix(graph2).astype(np.float64)
-    else:
-        raise ValueError("matrix_type must be 'adjacency', 'laplacian', or 'normalized_laplacian'")
+    matrix1 = _graph_matrix(graph1, matrix_type)
+    matrix2 = _graph_matrix(graph2, matrix_type)
 
     # Get the sizes of the graphs
     n1 = matrix1.shape[0]
@@ -43,20 +57,19 @@ def spectral_distance(graph1, graph2, matrix_type='adjacency', k=100, which='LR'
     # Use min(k, n-1) of the smallest graph
     k = min(k, min(n1, n2) - 1)
 
-    def compute_eigenvalues(matrix, k, which):
-        if issymmetric(matrix.toarray()):
-            return eigsh(matrix, k=k, which=which, return_eigenvectors=False)
-        else:
-            return eigs(matrix, k=k, which=which, return_eigenvectors=False)
-
-
-
+    # Compute eigenvalues
+    with phase("eigensolve"):
+        eigenvalues1 = _compute_eigenvalues(matrix1, k, which=which)
+        eigenvalues2 = _compute_eigenvalues(matrix2, k, which=which)
 
+    return eigenvalue_distance(eigenvalues1, eigenvalues2)
 
-    # Compute eigenvalues
-    eigenvalues1 = compute_eigenvalues(matrix1, k, which=which)
-    eigenvalues2 = compute_eigenvalues(matrix2, k, which=which)
 
+def eigenvalue_distance(eigenvalues1, eigenvalues2):
+    """
+    Compute the spectral distance between two sets of eigenvalues: the Euclidean distance between the sorted
+    eigenvalues, the shorter set padded with zeros.
+    """
     # Sort the eigenvalues
     eigenvalues1_sorted = np.sort(eigenvalues1)
     eigenvalues2_sorted = np.sort(eigenvalues2)
@@ -74,19 +87,70 @@ def spectral_distance(graph1, graph2, matrix_type='adjacency', k=100, which='LR'
     return spectral_distance_value
 
 
-def get_lap_spectral_dist(aig1, aig2):
-    G1, G2 = get_graph(aig1, aig2, directed=False)
-    return spectral_distance(G1, G2, matrix_type='laplacian', which='SM')
+def graph_spectrum(graph, matrix_type='adjacency', k=100, which='LR'):
+    """
+    Compute the top min(k, n-1) eigenvalues of a single graph, as spectral_distance does for each graph of a pair.
 
+    Returns:
+    (int, np.ndarray)
+        The number of nodes of the graph and its eigenvalues.
+    """
+    matrix = _graph_matrix(graph, matrix_type)
+    with phase("eigensolve"):
+        return matrix.shape[0], _compute_eigenvalues(matrix, min(k, matrix.shape[0] - 1), which)
 
-def get_adj_spectral_dist(aig1, aig2):
-    G1, G2 = get_graph(aig1, aig2, directed=False)
-    return spectral_distance(G1, G2, matrix_type='adjacency', which='LM')
 
-def get_directed_adj_sd(aig1, aig2):
-    G1, G2 = get_graph(aig1, aig2, directed=True,weights=(1,1))
-    return spectral_distance(G1, G2, matrix_type='adjacency', which='LM')
+def top_eigenvalues(eigenvalues, k, which):
+    """Select the k eigenvalues a solve for k eigenvalues returns, from the result of a solve for more of them."""
+    key = np.abs(eigenvalues) if which in ('LM', 'SM') else np.real(eigenvalues)
+    order = np.argsort(key, kind='stable')
+    return eigenvalues[order[:k]] if which.startswith('S') else eigenvalues[order[len(order) - k:]]
 
 
+def ranked_eigenvalues(eigenvalues, which):
+    """Order eigenvalues by selection, the first k of them are those top_eigenvalues(eigenvalues, k, which) selects."""
+    key = np.abs(eigenvalues) if which in ('LM', 'SM') else np.real(eigenvalues)
+    order = np.argsort(key, kind='stable')
+    return eigenvalues[order] if which.startswith('S') else eigenvalues[order[::-1]]
 
 
+def aig_spectrum(aig, matrix_type, which, directed=False, weights=(-1, 1), k=100):
+    """
+    Compute the top min(k, n-1) eigenvalues of the graph of an AIG, see graph_spectrum. Spectra are stored per AIG in
+    the active feature store.
+    """
+    params = {"matrix_type": matrix_type, "which": which, "directed": directed, "weights": list(weights), "k": k}
+    return cached_feature("spectrum", aig, params,
+                          lambda: graph_spectrum(build_graph(aig, directed=directed, weights=weights),
+                                                 matrix_type, k, which),
+                          SPECTRUM_VERSION)
+
+
+def _stored_spectral_distance(aig1, aig2, matrix_type, which, directed, weights, k=100):
+    # Spectra are stored per AIG for the largest k a pair can use, and cut down to the k of the pair
+    n1, eigenvalues1 = aig_spectrum(aig1, matrix_type, which, directed, weights, k)
+    n2, eigenvalues2 = aig_spectrum(aig2, matrix_type, which, directed, weights, k)
+
+    k = min(k, min(n1, n2) - 1)
+    return eigenvalue_distance(top_eigenvalues(eigenvalues1, k, which), top_eigenvalues(eigenvalues2, k, which))
+
+
+def _spectral_metric(aig1, aig2, matrix_type, which, directed=False, weights=(-1, 1)):
+    # With a feature store, spectra are computed once per AIG instead of once per pair. The eigensolver then runs
+    # for the k of the AIG instead of the k of the pair, which changes the eigenvalues by solver round-off only.
+    if active_feature_store() is not None:
+        return _stored_spectral_distance(aig1, aig2, matrix_type, which, directed, weights)
+
+    G1, G2 = get_graph(aig1, aig2, directed=directed, weights=weights)
+    return spectral_distance(G1, G2, matrix_type=matrix_type, which=which)
+
+
+def get_lap_spectral_dist(aig1, aig2):
+    return _spectral_metric(aig1, aig2, matrix_type='laplacian', which='SM')
+
+
+def get_adj_spectral_dist(aig1, aig2):
+    return _spectral_metric(aig1, aig2, matrix_type='adjacency', which='LM')
+
+def get_directed_adj_sd(aig1, aig2):
+    return _spectral_metric(aig1, aig2, matrix_type='adjacency', which='LM', directed=True, weights=(1,1))
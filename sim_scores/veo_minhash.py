@@ -0,0 +1,226 @@
+import math
+from collections import defaultdict
+from itertools import combinations
+from typing import NamedTuple
+
+import numpy as np
+from aigverse import Aig
+
+from aig_arrays import _mix
+from feature_store import cached_feature
+from graph_utils import get_edge_list
+from profiling import phase
+
+# Number of hash functions of a MinHash sketch, the error of the estimates shrinks with 1 / sqrt(NUM_HASHES)
+NUM_HASHES = 256
+
+# Version of the stored sketches, increased whenever the hashing of the vertices and edges changes
+MINHASH_SKETCH_VERSION = 1
+
+# Number of elements hashed at a time, bounds the (chunk, NUM_HASHES) hash matrix to a few MiB
+_CHUNK_SIZE = 4096
+
+# Vertices are tagged with the top bit, edges (u << 32 | v) never have it, so the two sets never share an element
+_VERTEX_TAG = np.uint64(1 << 63)
+
+_SEEDS = _mix(np.arange(NUM_HASHES, dtype=np.uint64) + np.uint64(0x2545F4914F6CDD1D))
+
+
+class MinHashSketch(NamedTuple):
+    """
+    MinHash sketch of the vertex and edge sets of the graph of an AIG.
+
+    Fields:
+    -------
+    num_vertices, num_edges : int
+        Exact sizes of the vertex and edge sets.
+    vertex_mins, edge_mins : np.ndarray (uint64, shape (NUM_HASHES,))
+        Minimum of every hash function over the vertices and over the edges. All sketches use the same hash
+        functions, so the minimums over the union of both sets are np.minimum(vertex_mins, edge_mins).
+    """
+    num_vertices: int
+    num_edges: int
+    vertex_mins: np.ndarray
+    edge_mins: np.ndarray
+
+    @property
+    def mins(self) -> np.ndarray:
+        """Minimums over the union of the vertex and edge sets."""
+        return np.minimum(self.vertex_mins, self.edge_mins)
+
+
+def _min_hashes(elements: np.ndarray) -> np.ndarray:
+    mins = np.full(NUM_HASHES, np.iinfo(np.uint64).max, dtype=np.uint64)
+    for start in range(0, len(elements), _CHUNK_SIZE):
+        chunk = elements[start:start + _CHUNK_SIZE]
+        mins = np.minimum(mins, _mix(chunk[:, None] ^ _SEEDS[None, :]).min(axis=0))
+    return mins
+
+
+def graph_sets(aig: Aig, directed: bool = False, weights=(-1, 1)) -> (np.ndarray, np.ndarray):
+    """
+    Compute the vertex and edge sets of the graph get_graph builds for an AIG, as arrays of node ids and of
+    u << 32 | v edge keys. Undirected edges are stored as (min, max), directed edges with weight -1 are reversed.
+
+    Parameters:
+    aig (Aig): The input AIG, or its AigArrays.
+    directed (bool): Whether the graph is directed.
+    weights (tuple): Weights of complemented and regular edges, as in get_graph.
+
+    Returns:
+    (np.ndarray, np.ndarray): The sorted distinct vertices and edge keys (uint64).
+    """
+    edges = np.array(get_edge_list(aig, weights=weights), dtype=np.int64).reshape(-1, 3)
+    sources, targets = edges[:, 0], edges[:, 1]
+    if directed:
+        inverted = edges[:, 2] == -1
+        sources, targets = np.where(inverted, targets, sources), np.where(inverted, sources, targets)
+    else:
+        sources, targets = np.minimum(sources, targets), np.maximum(sources, targets)
+
+    vertices = np.unique(np.concatenate([sources, targets])).astype(np.uint64)
+    keys = np.unique((sources.astype(np.uint64) << np.uint64(32)) | targets.astype(np.uint64))
+    return vertices, keys
+
+
+def minhash_sketch(aig: Aig, directed: bool = False, weights=(-1, 1)) -> MinHashSketch:
+    """
+    Compute the MinHash sketch of the vertex and edge sets of the graph of an AIG, hashing all vertices and edges
+    with vectorized NumPy operations. Sketches are stored per AIG in the active feature store.
+
+    Parameters:
+    aig (Aig): The input AIG, or its AigArrays.
+    directed (bool): Whether the graph is directed.
+    weights (tuple): Weights of complemented and regular edges, as in get_graph.
+
+    Returns:
+    MinHashSketch: The sizes and minimum hashes of the vertex and edge sets.
+    """
+    def compute():
+        with phase("graph_build"):
+            vertices, keys = graph_sets(aig, directed, weights)
+        with phase("feature"):
+            return MinHashSketch(len(vertices), len(keys), _min_hashes(vertices | _VERTEX_TAG), _min_hashes(keys))
+
+    params = {"directed": directed, "weights": list(weights), "num_hashes": NUM_HASHES}
+    return cached_feature("minhash_sketch", aig, params, compute, MINHASH_SKETCH_VERSION)
+
+
+def minhash_error(confidence: float = 0.95, num_hashes: int = NUM_HASHES) -> float:
+    """
+    Compute the bound on the error of a Jaccard estimate from sketches of num_hashes hashes, that holds with the
+    given probability (Hoeffding bound).
+
+    Parameters:
+    confidence (float): Probability that the error is within the bound.
+    num_hashes (int): Number of hashes of the sketches.
+
+    Returns:
+    float: The maximum absolute error of the estimate.
+    """
+    return math.sqrt(math.log(2 / (1 - confidence)) / (2 * num_hashes))
+
+
+def estimate_jaccard(mins1: np.ndarray, mins2: np.ndarray) -> float:
+    """Estimate the Jaccard similarity of two sets from their minimum hashes, the fraction of equal minimums."""
+    return float(np.mean(mins1 == mins2))
+
+
+def estimate_veo(sketch1: MinHashSketch, sketch2: MinHashSketch, confidence: float = None):
+    """
+    Estimate the Vertex Edge Overlap of two graphs from their MinHash sketches.
+
+    The VEO 2 (|V & V'| + |E & E'|) / (|V| + |V'| + |E| + |E'|) is the Dice coefficient of the disjoint unions
+    S = V + E and S' = V' + E', which is 2 J / (1 + J) for their Jaccard similarity J.
+
+    Parameters:
+    sketch1, sketch2 (MinHashSketch): The sketches of the two graphs.
+    confidence (float): If given, also return the bound on the error of the estimate that holds with this
+        probability.
+
+    Returns:
+    float: The estimated VEO, or (float, float): the estimated VEO and its error bound.
+    """
+    if sketch1.num_vertices + sketch1.num_edges + sketch2.num_vertices + sketch2.num_edges == 0:
+        veo = 1.0  # Both graphs are empty, as in vertex_edge_overlap
+        return (veo, 0.0) if confidence is not None else veo
+
+    jaccard = estimate_jaccard(sketch1.mins, sketch2.mins)
+    veo = 2 * jaccard / (1 + jaccard)
+    if confidence is None:
+        return veo
+
+    # The VEO increases with J, so the bounds of J map to bounds of the VEO
+    error = minhash_error(confidence)
+    low, high = max(jaccard - error, 0), min(jaccard + error, 1)
+    return veo, max(veo - 2 * low / (1 + low), 2 * high / (1 + high) - veo)
+
+
+class MinHashLSH:
+    """
+    LSH banding index of MinHash sketches: the minimums over the vertex and edge sets are split into bands of rows,
+    and AIGs whose sketches agree on all rows of any band share a bucket. Two sets with Jaccard similarity J become
+    candidates with probability 1 - (1 - J^rows)^bands, so similar pairs are found without comparing all pairs.
+    """
+
+    def __init__(self, bands: int = 32, rows: int = 4):
+        if bands * rows > NUM_HASHES:
+            raise ValueError(f"bands * rows must be at most NUM_HASHES ({NUM_HASHES}).")
+        self.bands = bands
+        self.rows = rows
+        self.keys = []
+        self._buckets = [defaultdict(list) for _ in range(bands)]
+
+    def threshold(self) -> float:
+        """Jaccard similarity at which a pair becomes a candidate with probability about 1/2."""
+        return (1 / self.bands) ** (1 / self.rows)
+
+    def _band_hashes(self, sketch: MinHashSketch) -> list:
+        bands = sketch.mins[:self.bands * self.rows].reshape(self.bands, self.rows)
+        return [band.tobytes() for band in bands]
+
+    def insert(self, key, sketch: MinHashSketch):
+        """Add the sketch of an AIG under a key."""
+        position = len(self.keys)
+        self.keys.append(key)
+        for buckets, band in zip(self._buckets, self._band_hashes(sketch)):
+            buckets[band].append(position)
+
+    def candidates(self, sketch: MinHashSketch) -> list:
+        """Keys of the AIGs sharing a bucket with a sketch."""
+        positions = set()
+        for buckets, band in zip(self._buckets, self._band_hashes(sketch)):
+            positions.update(buckets.get(band, ()))
+        return [self.keys[position] for position in sorted(positions)]
+
+    def candidate_pairs(self) -> set:
+        """All pairs of keys of AIGs that share a bucket, as (key1, key2) in insertion order."""
+        pairs = set()
+        for buckets in self._buckets:
+            for positions in buckets.values():
+                pairs.update(combinations(positions, 2))
+        return {(self.keys[i], self.keys[j]) for i, j in sorted(pairs)}
+
+
+def get_veo_minhash(aig1: Aig, aig2: Aig) -> float:
+    """
+    Estimate the VEO of the undirected graphs of two AIGs from their MinHash sketches, see estimate_veo.
+
+    Parameters:
+    aig1, aig2 (Aig): The input AIGs to compare, or their AigArrays.
+
+    Returns:
+    float: The estimated VEO, within minhash_error() * 2 of the exact VEO with probability 0.95.
+    """
+    return estimate_veo(minhash_sketch(aig1), minhash_sketch(aig2))
+
+
+def get_directed_veo_minhash(aig1: Aig, aig2: Aig) -> float:
+    """Estimate the VEO of the directed graphs of two AIGs, complemented edges reversed, see get_veo_minhash."""
+    return estimate_veo(minhash_sketch(aig1, directed=True), minhash_sketch(aig2, directed=True))
+
+
+def get_directed_uninverted_veo_minhash(aig1: Aig, aig2: Aig) -> float:
+    """Estimate the VEO of the directed graphs of two AIGs, edges kept as they are, see get_veo_minhash."""
+    return estimate_veo(minhash_sketch(aig1, directed=True, weights=(1, 1)),
+                        minhash_sketch(aig2, directed=True, weights=(1, 1)))
@@ -0,0 +1,303 @@
+import argparse
+import os
+import pickle
+from functools import partial
+
+import numpy as np
+import scipy.sparse as sps
+from aigverse import read_aiger_into_aig
+
+from aig_arrays import _mix
+from all_pairs import FEATURIZERS, SIMILARITIES, block_distances
+
+# Version of the saved indexes, 2 since spectral features start with the number of nodes
+INDEX_VERSION = 2
+
+# Number of AIGs from which an index answers queries approximately, unless told otherwise
+APPROXIMATE_SIZE = 4096
+
+# Number of rows of the bands of MinHash signatures, an index hashes num_tables bands
+MINHASH_ROWS = 4
+
+
+class SimilarityIndex:
+    """
+    Library of per-AIG features of one metric of all_pairs.FEATURIZERS, answering k-nearest-neighbor queries.
+
+    Small libraries are searched exactly by brute force. Large ones first gather candidates with random hyperplane
+    LSH: every AIG is hashed into num_tables tables by the signs of num_bits random projections of its features, and a
+    query looks up its own bucket and the buckets one bit away in every table. MinHash signatures are banded instead,
+    num_tables bands of MINHASH_ROWS rows. The candidates are then ranked with the
+    exact metric, so approximation only affects which AIGs are considered, never their values. AIGs can be added at
+    any time, also after the hash tables are built.
+    """
+
+    def __init__(self, metric: str, approximate: bool = None, num_tables: int = 8, num_bits: int = 12, seed: int = 0,
+                 **featurize_params):
+        """
+        Parameters:
+        -----------
+        metric : str
+            Name of the metric, a key of all_pairs.FEATURIZERS.
+        approximate : bool, optional
+            Whether queries use LSH candidates, by default from APPROXIMATE_SIZE AIGs on.
+        num_tables, num_bits : int
+            Number of hash tables, and of hyperplanes per table.
+        seed : int
+            Seed of the random hyperplanes.
+        featurize_params
+            Parameters of the featurize function, e.g. sample_size for the NetSimile metrics.
+        """
+        if metric not in FEATURIZERS:
+            raise ValueError(f"Metric '{metric}' has no per-AIG features, expected one of: {', '.join(FEATURIZERS)}")
+        self.metric = metric
+        self.approximate = approximate
+        self.num_tables = num_tables
+        self.num_bits = num_bits
+        self.seed = seed
+        self.featurize_params = featurize_params
+
+        self.keys = []
+        self._positions = {}
+        self._features = []
+        self._dense = None
+        self._sparse = None
+        self._tables = None
+        self._center = None
+        self._planes = None
+
+    @property
+    def distance(self) -> str:
+        return FEATURIZERS[self.metric].distance
+
+    @property
+    def _dtype(self):
+        # MinHash signatures are compared for equality, they keep their exact 64-bit hashes
+        return np.uint64 if self.distance == "minhash" else np.float64
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, key) -> bool:
+        return key in self._positions
+
+    def featurize(self, aig):
+        """Compute the features of an AIG for this index."""
+        return partial(FEATURIZERS[self.metric].featurize, **self.featurize_params)(aig)
+
+    def add(self, key, aig):
+        """Add an AIG to the library under a unique key, e.g. its (benchmark, flavor)."""
+        self.add_features(key, self.featurize(aig))
+
+    def add_features(self, key, features):
+        """Add the features of an AIG, as computed by featurize, to the library under a unique key."""
+        if key in self._positions:
+            raise ValueError(f"Key {key!r} is already in the index.")
+
+        position = len(self.keys)
+        self.keys.append(key)
+        self._positions[key] = position
+        self._features.append(features)
+
+        if self.distance == "wl":
+            self._sparse = None
+        else:
+            vector = np.asarray(features, dtype=self._dtype)
+            if self._dense is None:
+                self._dense = np.empty((16, len(vector)), dtype=self._dtype)
+            elif position == len(self._dense):
+                # Capacity doubles, so that insertion takes amortized constant time
+                self._dense = np.concatenate([self._dense, np.empty_like(self._dense)])
+            self._dense[position] = vector
+
+        if self._tables is not None:
+            self._insert(position, self._codes(features))
+
+    def query(self, aig, k: int = 10, exact: bool = None) -> list:
+        """
+        Find the k AIGs of the library closest to an AIG.
+
+        Parameters:
+        -----------
+        aig : Aig or AigArrays
+            The query AIG.
+        k : int
+            Number of neighbors.
+        exact : bool, optional
+            Force brute-force search, or LSH candidates, instead of choosing by library size.
+
+        Returns:
+        --------
+        neighbors : list of (key, float)
+            The keys of the nearest AIGs and their distances (or similarities), closest first.
+        """
+        return self.query_features(self.featurize(aig), k, exact)
+
+    def query_features(self, features, k: int = 10, exact: bool = None) -> list:
+        """Find the k AIGs of the library closest to the features of an AIG, see query."""
+        if exact is None:
+            approximate = self.approximate if self.approximate is not None else len(self) >= APPROXIMATE_SIZE
+            exact = not approximate
+
+        candidates = np.arange(len(self))
+        if not exact:
+            lsh_candidates = self._candidates(features)
+            # Too few candidates would return fewer than k neighbors
+            if len(lsh_candidates) >= k:
+                candidates = lsh_candidates
+
+        values = self._values(features, candidates)
+        keys = np.where(np.isnan(values), np.inf, -values if self.distance in SIMILARITIES else values)
+        order = np.argsort(keys, kind="stable")[:k]
+        return [(self.keys[candidates[i]], float(values[i])) for i in order]
+
+    def _values(self, features, candidates):
+        if len(candidates) == 0:
+            return np.empty(0)
+        if self.distance != "wl":
+            query = np.asarray(features, dtype=self._dtype)[None, :]
+            return block_distances(self.distance, query, self._dense[candidates])[0]
+
+        # Labels of the query missing from the library only add to the norm of the query
+        X, vocabulary, norms = self._sparse_matrix()
+        labels, counts = features
+        positions = np.minimum(np.searchsorted(vocabulary, labels), max(len(vocabulary) - 1, 0))
+        known = (vocabulary[positions] == labels) if len(vocabulary) else np.zeros(len(labels), dtype=bool)
+        query = np.zeros(X.shape[1])
+        query[positions[known]] = counts[known]
+
+        dots = X[candidates] @ query
+        denominators = norms[candidates] * np.sqrt(np.dot(counts, counts))
+        return np.divide(dots, denominators, out=np.zeros_like(dots), where=denominators > 0)
+
+    def _sparse_matrix(self):
+        # The label vocabulary of the library changes with every insertion, the matrix is rebuilt on the next query
+        if self._sparse is None:
+            labels = [features[0] for features in self._features]
+            vocabulary, columns = np.unique(np.concatenate(labels), return_inverse=True)
+            rows = np.repeat(np.arange(len(labels)), [len(label) for label in labels])
+            counts = np.concatenate([features[1] for features in self._features])
+            X = sps.csr_matrix((counts, (rows, columns)), shape=(len(labels), len(vocabulary)))
+            norms = np.sqrt(np.asarray(X.multiply(X).sum(axis=1)).ravel())
+            self._sparse = X, vocabulary, norms
+        return self._sparse
+
+    def _projections(self, features):
+        if self.distance == "wl":
+            # Sparse features are projected on hyperplanes with a hashed +-1 coordinate per label
+            labels, counts = features
+            plane_seeds = _mix(np.arange(self.num_tables * self.num_bits, dtype=np.uint64) + np.uint64(self.seed))
+            projections = np.zeros(len(plane_seeds))
+            for start in range(0, len(labels), 8192):
+                chunk = slice(start, start + 8192)
+                signs = (_mix(labels[chunk, None] ^ plane_seeds[None, :]) >> np.uint64(63)).astype(np.float64) * 2 - 1
+                projections += counts[chunk] @ signs
+            return projections
+
+        # Dense features are compared on a log scale around the library center, so that features of very different
+        # magnitudes all count
+        vector = np.asarray(features, dtype=np.float64)
+        vector = np.nan_to_num(np.sign(vector) * np.log1p(np.abs(vector))) - self._center
+        return self._planes @ vector
+
+    def _codes(self, features):
+        if self.distance == "minhash":
+            # MinHash signatures are banded: AIGs agreeing on all rows of a band share its bucket
+            bands = np.asarray(features, dtype=np.uint64)[:self.num_tables * MINHASH_ROWS]
+            bands = bands.reshape(self.num_tables, MINHASH_ROWS) ^ _mix(np.arange(MINHASH_ROWS, dtype=np.uint64))
+            return np.bitwise_xor.reduce(_mix(bands), axis=1)
+
+        bits = self._projections(features).reshape(self.num_tables, self.num_bits) > 0
+        return bits.astype(np.int64) @ (1 << np.arange(self.num_bits))
+
+    def _insert(self, position, codes):
+        for table, code in zip(self._tables, codes):
+            table.setdefault(int(code), []).append(position)
+
+    def _build_tables(self):
+        if self.distance not in ("wl", "minhash"):
+            dense = self._dense[:len(self)]
+            self._center = np.nan_to_num(np.sign(dense) * np.log1p(np.abs(dense))).mean(axis=0)
+            rng = np.random.default_rng(self.seed)
+            self._planes = rng.normal(size=(self.num_tables * self.num_bits, dense.shape[1]))
+
+        self._tables = [{} for _ in range(self.num_tables)]
+        for position, features in enumerate(self._features):
+            self._insert(position, self._codes(features))
+
+    def _candidates(self, features):
+        if len(self) == 0:
+            return np.empty(0, dtype=np.int64)
+        if self._tables is None:
+            self._build_tables()
+
+        # Multi-probe: the bucket of the query and the buckets one bit away, bands of MinHash signatures match exactly
+        probes = [0] if self.distance == "minhash" else [0] + [1 << bit for bit in range(self.num_bits)]
+        candidates = set()
+        for table, code in zip(self._tables, self._codes(features)):
+            for probe in probes:
+                candidates.update(table.get(int(code) ^ probe, ()))
+        return np.array(sorted(candidates), dtype=np.int64)
+
+    def save(self, path: str):
+        """Write the index to a file, see load."""
+        state = {"version": INDEX_VERSION, "metric": self.metric, "approximate": self.approximate,
+                 "num_tables": self.num_tables, "num_bits": self.num_bits, "seed": self.seed,
+                 "featurize_params": self.featurize_params, "keys": self.keys, "features": self._features}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "wb") as file:
+            pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path: str) -> "SimilarityIndex":
+        """Read an index written by save, its hash tables are rebuilt on the first approximate query."""
+        with open(path, "rb") as file:
+            state = pickle.load(file)
+        if state["version"] != INDEX_VERSION:
+            raise ValueError(f"Index version {state['version']} of {path} is not supported.")
+
+        index = cls(state["metric"], state["approximate"], state["num_tables"], state["num_bits"], state["seed"],
+                    **state["featurize_params"])
+        for key, features in zip(state["keys"], state["features"]):
+            index.add_features(key, features)
+        return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a similarity index of the AIG dataset, or query it with an AIG.")
+    parser.add_argument("command", choices=["build", "query"])
+    parser.add_argument("--index_path", type=str, help="Path of the index file", default="data/index/netsimile.index")
+    parser.add_argument("--metric", type=str, choices=FEATURIZERS.keys(), default="netsimile",
+                        help="Metric of a new index")
+    parser.add_argument("--folder_path", type=str, help="Folder with a subfolder of AIG files per AIG type",
+                        default="data/aigs/")
+    parser.add_argument("--id_path", type=str, help="Path to the txt file with aig_ids to be indexed",
+                        default="data/aigs/indices.txt")
+    parser.add_argument("--aig", type=str, help="AIGER file to query")
+    parser.add_argument("--k", type=int, default=10, help="Number of neighbors of a query")
+    args = parser.parse_args()
+
+    if args.command == "query":
+        index = SimilarityIndex.load(args.index_path)
+        for rank, (key, value) in enumerate(index.query(read_aiger_into_aig(args.aig), args.k), start=1):
+            print(rank, *key, value, sep="\t")
+        return
+
+    index = SimilarityIndex.load(args.index_path) if os.path.exists(args.index_path) else SimilarityIndex(args.metric)
+    with open(args.id_path, "r") as file:
+        aig_ids = sorted(line.strip() for line in file if line.strip())
+    for aig_type in sorted(os.listdir(args.folder_path)):
+        for filename in aig_ids:
+            aig_path = os.path.join(args.folder_path, aig_type, filename + ".aig")
+            if (filename, aig_type) in index or not os.path.exists(aig_path):
+                continue
+            try:
+                index.add((filename, aig_type), read_aiger_into_aig(aig_path))
+            except ValueError as error:
+                print(f"AIG {filename} {aig_type} skipped: {error}")
+    index.save(args.index_path)
+    print(f"Index of {len(index)} AIGs written to {args.index_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import argparse
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from aigverse import Aig, to_index_list, write_aiger
+
+from aig_arrays import to_aig_arrays, arrays_to_aig
+from aig_cache import build_cache, save_aig_arrays, load_aig_arrays
+from graph_utils import get_edge_list
+from main import read_aig
+
+
+class TestAigCache(unittest.TestCase):
+    def setUp(self):
+        self.aig = Aig()
+        x0 = self.aig.create_pi()
+        x1 = self.aig.create_pi()
+        x2 = self.aig.create_pi()
+        n0 = self.aig.create_and(x0, ~x2)
+        n1 = self.aig.create_and(~x1, ~x2)
+        n2 = self.aig.create_and(~n0, n1)
+        self.aig.create_po(n2)
+        self.aig.create_po(~n0)
+        self.aig.create_po(n2)
+
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.cache_file = os.path.join(self.cache_dir.name, "strash", "ex00.npy")
+
+    def tearDown(self):
+        self.cache_dir.cleanup()
+
+    def test_aig_arrays(self):
+        arrays = to_aig_arrays(self.aig)
+
+        self.assertEqual(arrays.num_pis, 3)
+        self.assertEqual(arrays.num_gates, 3)
+        self.assertEqual(arrays.pos.tolist(), [12, 9, 12])
+        self.assertEqual(arrays.levels.tolist(), [0, 0, 0, 0, 1, 1, 2])
+
+    def test_round_trip(self):
+        arrays = to_aig_arrays(self.aig)
+        save_aig_arrays(arrays, self.cache_file)
+        loaded = load_aig_arrays(self.cache_file)
+
+        self.assertEqual(loaded.num_pis, arrays.num_pis)
+        for field in ["fanin0", "fanin1", "pos", "levels"]:
+            np.testing.assert_array_equal(getattr(loaded, field), getattr(arrays, field))
+
+        # The cached arrays are read-only views of the memory-mapped file
+        self.assertIsInstance(loaded.fanin0.base, np.memmap)
+
+    def test_rebuild_aig(self):
+        save_aig_arrays(to_aig_arrays(self.aig), self.cache_file)
+        rebuilt = arrays_to_aig(load_aig_arrays(self.cache_file))
+
+        self.assertEqual(to_index_list(rebuilt).raw(), to_index_list(self.aig).raw())
+
+    def test_edge_list_matches_aigverse(self):
+        save_aig_arrays(to_aig_arrays(self.aig), self.cache_file)
+        loaded = load_aig_arrays(self.cache_file)
+
+        for weights in [(-1, 1), (1, 1)]:
+            self.assertEqual(get_edge_list(loaded, weights), get_edge_list(self.aig, weights))
+
+    def test_build_cache_read_by_main(self):
+        folder_path = os.path.join(self.cache_dir.name, "optimized")
+        os.makedirs(os.path.join(folder_path, "strash"))
+        write_aiger(self.aig, os.path.join(folder_path, "strash", "ex00.aig"))
+        cache_path = os.path.join(self.cache_dir.name, "cache")
+        self.assertEqual(build_cache(folder_path, cache_path), 1)
+
+        # main.py reads the cache file written by the CLI instead of rebuilding it
+        args = argparse.Namespace(metric="level_profile_cosine", cache_path=cache_path)
+        cache_file = os.path.join(cache_path, "optimized", "strash", "ex00.npy")
+        modified = os.path.getmtime(cache_file)
+        loaded = read_aig(args, folder_path, "strash", "ex00")
+        self.assertIsInstance(loaded.fanin0.base, np.memmap)
+        self.assertEqual(os.listdir(cache_path), ["optimized"])
+        self.assertEqual(os.path.getmtime(cache_file), modified)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from aigverse import Aig, simulate, to_index_list, write_aiger
+
+from aig_arrays import AigArrays, to_aig_arrays
+from aig_pack import AigPack, build_pack
+from aig_simulation import load_truth_table
+from main import open_pack, read_aig
+
+
+class TestAigPack(unittest.TestCase):
+    def setUp(self):
+        self.aig = Aig()
+        x0 = self.aig.create_pi()
+        x1 = self.aig.create_pi()
+        x2 = self.aig.create_pi()
+        n0 = self.aig.create_and(x0, ~x2)
+        n1 = self.aig.create_and(~x1, ~x2)
+        self.aig.create_po(self.aig.create_and(~n0, n1))
+
+        # Build a dataset in the repository layout with one flavor in two flows and a truth table
+        self.data_dir = tempfile.TemporaryDirectory()
+        for flow in ["aigs", "optimized"]:
+            os.makedirs(os.path.join(self.data_dir.name, flow, "strash"))
+            write_aiger(self.aig, os.path.join(self.data_dir.name, flow, "strash", "ex00.aig"))
+
+        os.makedirs(os.path.join(self.data_dir.name, "truths"))
+        self.truth_path = os.path.join(self.data_dir.name, "truths", "ex00.truth")
+        with open(self.truth_path, "w") as file:
+            for truth_table in simulate(self.aig):
+                file.write(truth_table.to_binary() + "\n")
+
+        self.pack_path = os.path.join(self.data_dir.name, "dataset.pack")
+        build_pack(self.data_dir.name, self.pack_path)
+
+    def tearDown(self):
+        load_truth_table.cache_clear()
+        self.data_dir.cleanup()
+
+    def test_entries(self):
+        pack = AigPack(self.pack_path)
+
+        self.assertTrue(pack.has_aig("ex00", "strash"))
+        self.assertTrue(pack.has_aig("ex00", "strash", "optimized"))
+        self.assertFalse(pack.has_aig("ex00", "bdd"))
+        self.assertTrue(pack.has_truth_table("ex00"))
+        self.assertEqual(len(pack.keys()), 3)
+
+    def test_aig_arrays(self):
+        pack = AigPack(self.pack_path)
+        arrays = pack.aig_arrays("ex00", "strash", "optimized")
+        expected = to_aig_arrays(self.aig)
+
+        self.assertEqual(arrays.num_pis, expected.num_pis)
+        for field in ["fanin0", "fanin1", "pos", "levels"]:
+            np.testing.assert_array_equal(getattr(arrays, field), getattr(expected, field))
+
+    def test_aig(self):
+        pack = AigPack(self.pack_path)
+        self.assertEqual(to_index_list(pack.aig("ex00", "strash")).raw(), to_index_list(self.aig).raw())
+
+    def test_truth_table(self):
+        pack = AigPack(self.pack_path)
+        words, num_vars = pack.truth_table("ex00")
+        expected_words, expected_num_vars = load_truth_table(self.truth_path)
+
+        self.assertEqual(num_vars, expected_num_vars)
+        np.testing.assert_array_equal(words, expected_words)
+
+    def test_invalid_file(self):
+        with self.assertRaises(ValueError):
+            AigPack(self.truth_path)
+
+    def test_copies_and_stale_entries(self):
+        # A copy of the pack serves a copy of the dataset at another path
+        copy_path = os.path.join(self.data_dir.name, "copy")
+        shutil.copytree(os.path.join(self.data_dir.name, "optimized"), os.path.join(copy_path, "optimized"))
+        shutil.copy2(self.pack_path, os.path.join(copy_path, "dataset.pack"))
+        pack = AigPack(os.path.join(copy_path, "dataset.pack"))
+        folder_path = os.path.join(copy_path, "optimized")
+
+        args = argparse.Namespace(metric="level_profile_cosine", cache_path=None)
+        self.assertIsInstance(read_aig(args, folder_path, "strash", "ex00", pack), AigArrays)
+
+        # A regenerated AIG is read from its file instead of the pack
+        regenerated = Aig()
+        regenerated.create_po(regenerated.create_and(regenerated.create_pi(), regenerated.create_pi()))
+        aig_path = os.path.join(folder_path, "strash", "ex00.aig")
+        write_aiger(regenerated, aig_path)
+        os.utime(aig_path, (os.path.getatime(aig_path), os.path.getmtime(aig_path) + 10))
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            aig = read_aig(args, folder_path, "strash", "ex00", pack)
+        self.assertEqual(aig.num_gates(), 1)
+        self.assertIn("rebuild the pack", output.getvalue())
+        self.assertFalse(pack.has_aig("ex00", "strash", "optimized", aig_path))
+
+    def test_missing_pack(self):
+        self.assertIsNone(open_pack(argparse.Namespace(pack_path=None)))
+        with self.assertRaises(FileNotFoundError):
+            open_pack(argparse.Namespace(pack_path=os.path.join(self.data_dir.name, "missing.pack")))
+
+
+if __name__ == '__main__':
+    unittest.main()
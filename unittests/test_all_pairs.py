@@ -0,0 +1,75 @@
+import unittest
+import warnings
+
+import numpy as np
+
+from all_pairs import FEATURIZERS, SIMILARITIES, all_pairs, featurize_all
+from benchmark_metrics import random_aig
+from sim_scores.kernel_sim import get_kernel_sim
+from sim_scores.level_metrics import level_profile_euclidean_metric, level_profile_cosine_metric
+from sim_scores.netcomp_distances import get_net_simile, get_ns_dir_inverted
+from sim_scores.spectral import get_adj_spectral_dist, get_lap_spectral_dist
+
+
+class TestAllPairs(unittest.TestCase):
+    def setUp(self):
+        self.aigs = [random_aig(8, 110 + 10 * i, 4, seed=i) for i in range(7)]
+
+    def test_matrix_matches_pair_metrics(self):
+        metrics = {
+            "netsimile": get_net_simile,
+            "ns_inv": get_ns_dir_inverted,
+            "adj_sd": get_adj_spectral_dist,
+            "kernel_sim": get_kernel_sim,
+            "level_profile_euclidean": level_profile_euclidean_metric,
+            "level_profile_cosine": level_profile_cosine_metric,
+        }
+        for name, metric in metrics.items():
+            featurizer = FEATURIZERS[name]
+            matrix = np.zeros((7, 7), dtype=np.float32)
+            all_pairs(featurize_all(featurizer.featurize, self.aigs), featurizer.distance, out=matrix, block_size=3)
+
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                expected = [[metric(aig1, aig2) for aig2 in self.aigs] for aig1 in self.aigs]
+            np.testing.assert_allclose(matrix, expected, rtol=1e-4, atol=1e-5, err_msg=name)
+
+    def test_small_graph_spectra(self):
+        # Pairs with a graph of at most SPECTRUM_SIZE nodes compare fewer eigenvalues
+        aigs = [random_aig(4, 10 + 25 * i, 2, seed=i) for i in range(5)]
+        for name, metric in [("lap_sd", get_lap_spectral_dist), ("adj_sd", get_adj_spectral_dist)]:
+            featurizer = FEATURIZERS[name]
+            matrix = np.zeros((5, 5))
+            all_pairs(featurize_all(featurizer.featurize, aigs), featurizer.distance, out=matrix, block_size=2)
+
+            expected = [[metric(aig1, aig2) for aig2 in aigs] for aig1 in aigs]
+            np.testing.assert_allclose(matrix, expected, rtol=1e-6, atol=1e-8, err_msg=name)
+
+    def test_top_k(self):
+        featurizer = FEATURIZERS["netsimile"]
+        features = featurize_all(featurizer.featurize, self.aigs + [None])
+        matrix = np.zeros((8, 8))
+        all_pairs(features, featurizer.distance, out=matrix, block_size=2)
+        top_indices, top_values = all_pairs(features, featurizer.distance, top_k=3, block_size=2)
+
+        for row in range(7):
+            distances = np.where(np.arange(8) == row, np.inf, np.nan_to_num(matrix[row], nan=np.inf))
+            np.testing.assert_array_equal(top_indices[row], np.argsort(distances, kind="stable")[:3])
+            np.testing.assert_allclose(top_values[row], matrix[row, top_indices[row]])
+        # An AIG without features has no neighbors and is nobody's neighbor
+        self.assertTrue((top_indices[7] == -1).all())
+        self.assertNotIn(7, top_indices)
+
+    def test_similarity_top_k(self):
+        featurizer = FEATURIZERS["kernel_sim"]
+        self.assertIn(featurizer.distance, SIMILARITIES)
+        top_indices, top_values = all_pairs(featurize_all(featurizer.featurize, self.aigs + [self.aigs[2].clone()]),
+                                            featurizer.distance, top_k=1)
+
+        # The copy of an AIG is its most similar AIG
+        self.assertEqual(top_indices[7, 0], 2)
+        self.assertAlmostEqual(top_values[7, 0], 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import tempfile
+import unittest
+
+from benchmark_metrics import random_aig, synthetic_cases, measure, compare_reports
+from profiling import Profiler, profile, phase, collect
+
+
+class TestBenchmarkMetrics(unittest.TestCase):
+    def test_random_aig(self):
+        aig = random_aig(8, 50, 4, seed=1)
+
+        self.assertEqual(aig.num_pis(), 8)
+        self.assertEqual(aig.num_pos(), 4)
+        self.assertLessEqual(aig.num_gates(), 50)
+        self.assertGreater(aig.num_gates(), 0)
+
+    def test_phases(self):
+        profiler = Profiler()
+        with phase("parse"):
+            pass
+        self.assertEqual(profiler.summary(), {})
+
+        with profile(profiler):
+            with phase("parse"):
+                with phase("graph_build"):
+                    pass
+        self.assertEqual(set(profiler.summary()), {"parse", "graph_build"})
+        self.assertGreaterEqual(profiler.timings["parse"], profiler.timings["graph_build"])
+
+    def test_collect_memory(self):
+        profiler = Profiler(trace_memory=True)
+        with profile(profiler):
+            with phase("compare"):
+                with phase("feature"):
+                    data = bytearray(4 * 1024 * 1024)
+                    del data
+            collect(aig_ids="ex00", aig_types="bdd,sop")
+
+        rows = {row["phase"]: row for row in profiler.rows}
+        self.assertEqual(set(rows), {"compare", "feature"})
+        self.assertEqual(rows["feature"]["aig_types"], "bdd,sop")
+        # The allocation of the nested phase counts towards the enclosing phase as well
+        self.assertGreaterEqual(rows["feature"]["peak_alloc_mb"], 4)
+        self.assertGreaterEqual(rows["compare"]["peak_alloc_mb"], 4)
+        self.assertEqual(profiler.summary(), {})
+
+    def test_measure(self):
+        with tempfile.TemporaryDirectory() as work_path:
+            case = synthetic_cases([30], work_path)[0]
+            result = measure("veo", case)
+            truth_result = measure("truth_agreement", case)
+
+        self.assertNotIn("error", result)
+        self.assertTrue({"parse", "graph_build", "compare"} <= set(result["phases"]))
+        self.assertGreater(result["peak_rss_mb"], 0)
+        self.assertGreaterEqual(truth_result["value"], 0)
+
+    def test_compare_reports(self):
+        baseline = {"results": [
+            {"metric": "veo", "source": "dataset", "case": "ex00", "aig_types": ["bdd", "sop"], "wall_time": 1.0},
+            {"metric": "veo", "source": "dataset", "case": "ex01", "aig_types": ["bdd", "sop"], "wall_time": 1.0},
+            {"metric": "veo", "source": "dataset", "case": "ex02", "aig_types": ["bdd", "sop"], "wall_time": 1.0},
+        ]}
+        report = {"results": [
+            {"metric": "veo", "source": "dataset", "case": "ex00", "aig_types": ["bdd", "sop"], "wall_time": 1.1},
+            {"metric": "veo", "source": "dataset", "case": "ex01", "aig_types": ["bdd", "sop"], "wall_time": 2.0},
+            {"metric": "veo", "source": "dataset", "case": "ex02", "aig_types": ["bdd", "sop"], "error": "Timeout"},
+        ]}
+
+        regressions = compare_reports(report, baseline, tolerance=0.25, min_time=0.05)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(regressions[0].startswith("veo on ex01"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+
+from aigverse import Aig
+
+from sim_scores import optimizers
+from sim_scores.combined_optimization_metrics import rrr_profile, relative_rrr_metrics
+from utils import FUNCTION_MAP, METRIC_GROUPS
+
+
+def xor_aig(redundant: bool) -> Aig:
+    aig = Aig()
+    x0 = aig.create_pi()
+    x1 = aig.create_pi()
+    n0 = aig.create_and(x0, ~x1)
+    n1 = aig.create_and(~x0, x1)
+    out = ~aig.create_and(~n0, ~n1)
+    if redundant:
+        # x0 & (x0 ^ x1) is implemented with a redundant AND of x0
+        out = aig.create_and(aig.create_and(x0, out), x0)
+    aig.create_po(out)
+    return aig
+
+
+class TestCombinedOptimizationMetrics(unittest.TestCase):
+    def setUp(self):
+        optimizers._results.clear()
+        self.aig1 = xor_aig(redundant=False)
+        self.aig2 = xor_aig(redundant=True)
+
+    def test_profile_cached_per_aig(self):
+        profile = rrr_profile(self.aig1)
+
+        self.assertEqual(len(profile), 3)
+        # A clone has the same content, so its profile comes from the cached optimization results
+        self.assertEqual(rrr_profile(self.aig1.clone()), profile)
+        self.assertEqual(len(optimizers._results), 3)
+
+    def test_empty_aig(self):
+        aig = Aig()
+        aig.create_pi()
+        aig.create_po(aig.get_constant(False))
+
+        self.assertEqual(rrr_profile(aig), (0.0, 0.0, 0.0))
+        self.assertEqual(len(optimizers._results), 0)
+
+    def test_metric_group(self):
+        values = relative_rrr_metrics(self.aig1, self.aig2)
+
+        self.assertEqual(list(values), METRIC_GROUPS["rel_rrr_all"])
+        for name, value in values.items():
+            self.assertAlmostEqual(value, FUNCTION_MAP[name](self.aig1, self.aig2))
+
+    def test_identical_aigs(self):
+        values = relative_rrr_metrics(self.aig1, self.aig1.clone())
+
+        self.assertEqual(values["rel_rrr_euclidean"], 0.0)
+        self.assertEqual(values["rel_rrr_bray_curtis"], 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
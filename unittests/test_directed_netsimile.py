@@ -0,0 +1,84 @@
+import unittest
+
+import networkx as nx
+import numpy as np
+
+from benchmark_metrics import random_aig
+from graph_utils import get_graph, get_adjacency
+from NetComp.features import DIRECTED_FEATURES, get_directed_features, aggregate_features, \
+    aggregate_sampled_directed_features
+from NetComp.netsimile import directed_netsimile
+from NetComp.netsimile import netsimile
+from sim_scores.netcomp_distances import get_ns_dir, get_ns_dir_inverted, get_ns_dir_uninverted, \
+    get_ns_dir_uninverted_directed
+
+
+def egonet_features(G, node):
+    egonet = set(G.successors(node)) | {node}
+    edges = [(u, v) for u in egonet for v in G.successors(u)]
+    inside = sum(v in egonet for _, v in edges)
+    return inside, len({v for _, v in edges} - egonet), len(edges) - inside
+
+
+class TestDirectedNetSimile(unittest.TestCase):
+    def setUp(self):
+        self.G = nx.gnm_random_graph(150, 500, seed=3, directed=True)
+        self.G.remove_edges_from(list(nx.selfloop_edges(self.G)))
+        self.A = nx.to_scipy_sparse_array(self.G, nodelist=list(self.G.nodes()), format="csr")
+
+    def test_features_match_networkx(self):
+        features = get_directed_features(self.A)
+        clustering = nx.clustering(self.G)
+        reverse = self.G.reverse()
+
+        self.assertEqual(features.shape, (150, len(DIRECTED_FEATURES)))
+        for node in [0, 7, 42, 149]:
+            fanins, fanouts = list(self.G.predecessors(node)), list(self.G.successors(node))
+            neighbors = set(fanins) | set(fanouts)
+            fanin_ego, fanout_ego = egonet_features(reverse, node), egonet_features(self.G, node)
+            expected = [
+                len(fanins), len(fanouts), clustering[node],
+                np.mean([self.G.in_degree(u) for u in fanins]) if fanins else 0,
+                np.mean([self.G.out_degree(u) for u in fanouts]) if fanouts else 0,
+                np.mean([clustering[u] for u in neighbors]) if neighbors else 0,
+                fanin_ego[0], fanout_ego[0], fanin_ego[1], fanout_ego[1], fanin_ego[2], fanout_ego[2],
+            ]
+            np.testing.assert_allclose(features[node], expected, atol=1e-12)
+
+        np.testing.assert_allclose(get_directed_features(self.A, [42, 7]), features[[42, 7]])
+
+    def test_adjacency_matches_graph(self):
+        aig = random_aig(8, 100, 4, seed=0)
+        for weights in [(-1, 1), (1, 1)]:
+            G, _ = get_graph(aig, aig, directed=True, weights=weights)
+            A, _ = get_adjacency(aig, aig, weights=weights)
+            expected = nx.to_scipy_sparse_array(G, nodelist=sorted(G.nodes()), format="csr")
+
+            self.assertEqual((A != expected).nnz, 0)
+
+    def test_all_nodes_sample_is_exact(self):
+        description, error = aggregate_sampled_directed_features(self.A, 1000, batch_size=40)
+
+        np.testing.assert_allclose(description, aggregate_features(get_directed_features(self.A)), atol=1e-9)
+        self.assertFalse(error.any())
+
+    def test_metrics(self):
+        aig1, aig2 = random_aig(8, 150, 4, seed=1), random_aig(8, 150, 4, seed=2)
+
+        self.assertEqual(directed_netsimile(self.A, self.A.copy()), 0)
+        for metric in [get_ns_dir_inverted, get_ns_dir_uninverted, get_ns_dir, get_ns_dir_uninverted_directed]:
+            self.assertAlmostEqual(metric(aig1, aig1.clone()), 0)
+            self.assertGreater(metric(aig1, aig2), 0)
+
+        # ns_inv and ns_dir_uninverted keep the networkx features of the directed graphs, the direction-aware
+        # features are those of ns_dir and ns_dir_uninverted_directed
+        for weights, metric, directed_metric in [((-1, 1), get_ns_dir_inverted, get_ns_dir),
+                                                 ((1, 1), get_ns_dir_uninverted, get_ns_dir_uninverted_directed)]:
+            self.assertAlmostEqual(metric(aig1, aig2), netsimile(*get_graph(aig1, aig2, directed=True,
+                                                                            weights=weights)))
+            self.assertAlmostEqual(directed_metric(aig1, aig2),
+                                   directed_netsimile(*get_adjacency(aig1, aig2, weights=weights)))
+
+
+if __name__ == '__main__':
+    unittest.main()
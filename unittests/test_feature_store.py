@@ -0,0 +1,121 @@
+import argparse
+import multiprocessing
+import os
+import socket
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from benchmark_metrics import random_aig
+from feature_store import FeatureStore, use_feature_store, active_feature_store, cached_feature, on_network_filesystem
+from main import open_feature_store
+from sim_scores.kernel_sim import wl_features
+from sim_scores.netcomp_distances import get_net_simile, get_ns_dir_inverted
+from sim_scores.spectral import get_adj_spectral_dist, get_lap_spectral_dist
+
+
+def _write_features(path, worker):
+    store = FeatureStore(path)
+    for i in range(20):
+        store.put(f"aig{i}", "feature", {"worker": worker}, 1, np.full(10, worker))
+
+
+class TestFeatureStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "features.sqlite")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        store = FeatureStore(self.path)
+        store.put("digest", "spectrum", {"k": 100}, 1, (3, np.arange(3.0)))
+
+        n, values = FeatureStore(self.path).get("digest", "spectrum", {"k": 100})
+        self.assertEqual(n, 3)
+        np.testing.assert_array_equal(values, np.arange(3.0))
+        # Parameters and code version are part of the key
+        self.assertIsNone(store.get("digest", "spectrum", {"k": 10}))
+        self.assertIsNone(store.get("digest", "spectrum", {"k": 100}, version=2))
+
+    def test_journal_mode(self):
+        self.assertFalse(on_network_filesystem(self.directory.name))
+        journal_mode = FeatureStore(self.path)._connect().execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(journal_mode, "wal")
+
+        # WAL mode needs the shared memory of a single host
+        path = os.path.join(self.directory.name, "network", "features.sqlite")
+        with mock.patch("feature_store.on_network_filesystem", return_value=True):
+            store = FeatureStore(path)
+        self.assertEqual(store._connect().execute("PRAGMA journal_mode").fetchone()[0], "delete")
+        store.put("digest", "feature", {}, 1, 1)
+        self.assertEqual(FeatureStore(path, journal_mode="DELETE").get("digest", "feature"), 1)
+
+        # Queue workers on several hosts each get a store of their own
+        args = argparse.Namespace(feature_store=self.path, feature_store_limit=None, queue=True)
+        self.assertEqual(open_feature_store(args).path, f"{self.path}.{socket.gethostname()}")
+
+    def test_eviction(self):
+        store = FeatureStore(self.path, max_bytes=10000)
+        for i in range(20):
+            store.put(f"aig{i}", "feature", {}, 1, np.zeros(100))
+
+        # Least recently used features are evicted first
+        self.assertLess(len(store), 20)
+        self.assertIsNotNone(store.get("aig19", "feature"))
+        self.assertIsNone(store.get("aig0", "feature"))
+
+    def test_cached_feature(self):
+        aig = random_aig(6, 40, 3, seed=0)
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return len(calls)
+
+        self.assertIsNone(active_feature_store())
+        self.assertEqual(cached_feature("feature", aig, {}, compute), 1)
+        with use_feature_store(FeatureStore(self.path)):
+            self.assertEqual(cached_feature("feature", aig, {}, compute), 2)
+            self.assertEqual(cached_feature("feature", aig.clone(), {}, compute), 2)
+        self.assertIsNone(active_feature_store())
+
+    def test_concurrent_writers(self):
+        FeatureStore(self.path)
+        context = multiprocessing.get_context("fork")
+        processes = [context.Process(target=_write_features, args=(self.path, worker)) for worker in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        self.assertTrue(all(process.exitcode == 0 for process in processes))
+        self.assertEqual(len(FeatureStore(self.path)), 80)
+
+    def test_metrics_with_store(self):
+        aig1, aig2 = random_aig(8, 120, 4, seed=1), random_aig(8, 90, 4, seed=2)
+        for metric in [get_net_simile, get_ns_dir_inverted, get_adj_spectral_dist, get_lap_spectral_dist]:
+            expected = metric(aig1, aig2)
+            with use_feature_store(FeatureStore(self.path)):
+                self.assertAlmostEqual(metric(aig1, aig2), expected, places=6)
+                # The second computation reads both AIGs from the store
+                self.assertAlmostEqual(metric(aig1, aig2), expected, places=6)
+
+    def test_feature_versions(self):
+        aig = random_aig(6, 40, 3, seed=0)
+        with use_feature_store(FeatureStore(self.path)) as store:
+            wl_features(aig)
+            self.assertEqual(len(store), 1)
+            wl_features(aig)
+            self.assertEqual(len(store), 1)
+            # Features of an older version of the code are not read
+            with mock.patch("sim_scores.kernel_sim.WL_FEATURES_VERSION", 2):
+                wl_features(aig)
+            self.assertEqual(len(store), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import unittest
+
+from benchmark_metrics import random_aig
+from sim_scores import fingerprint_metrics
+from sim_scores.fingerprint_metrics import optimization_fingerprint_metric, optimization_fingerprint, trajectories
+from sim_scores.optimizers import parse_script
+
+
+class TestFingerprintMetrics(unittest.TestCase):
+    def setUp(self):
+        fingerprint_metrics._trajectories.clear()
+        self.script = parse_script("rewrite; balance; resub*2")
+        self.aig1 = random_aig(8, 150, 4, seed=1)
+        self.aig2 = random_aig(8, 150, 4, seed=2)
+
+    def test_fingerprint(self):
+        trajectory, = trajectories([self.aig1], self.script)
+        fingerprint = optimization_fingerprint(trajectory)
+
+        # Relative gates and levels after each of the 4 iterations
+        self.assertEqual(fingerprint.shape, (8,))
+        self.assertTrue((fingerprint[:4] <= 1).all())
+
+    def test_cached_per_aig_and_script(self):
+        trajectories([self.aig1, self.aig1.clone()], self.script)
+        self.assertEqual(len(fingerprint_metrics._trajectories), 1)
+
+        trajectories([self.aig1], parse_script("rewrite"))
+        self.assertEqual(len(fingerprint_metrics._trajectories), 2)
+
+    def test_metric(self):
+        self.assertEqual(optimization_fingerprint_metric(self.aig1, self.aig1.clone(), self.script), 0.0)
+        self.assertGreaterEqual(optimization_fingerprint_metric(self.aig1, self.aig2, self.script), 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import os
+import tempfile
+import unittest
+
+from aigverse import Aig, simulate
+
+from aig_simulation import load_truth_table
+from sim_scores.functional_metrics import truth_table_agreement, truth_agreement_metric, shared_function_metric
+
+
+def write_truth_file(aig):
+    # Write the exhaustive simulation of an AIG in the data/truths format
+    handle, path = tempfile.mkstemp(suffix=".truth")
+    with os.fdopen(handle, "w") as file:
+        for truth_table in simulate(aig):
+            file.write(truth_table.to_binary() + "\n")
+    return path
+
+
+class TestFunctionalMetrics(unittest.TestCase):
+    def setUp(self):
+        # f = x0 * !x1, g = x0 + x1
+        self.aig1 = Aig()
+        x0 = self.aig1.create_pi()
+        x1 = self.aig1.create_pi()
+        self.aig1.create_po(self.aig1.create_and(x0, ~x1))
+        self.aig1.create_po(self.aig1.create_or(x0, x1))
+
+        # Same functions with a redundant gate structure
+        self.aig2 = Aig()
+        x0 = self.aig2.create_pi()
+        x1 = self.aig2.create_pi()
+        n0 = self.aig2.create_and(x0, ~x1)
+        self.aig2.create_po(self.aig2.create_and(n0, x0))
+        self.aig2.create_po(~self.aig2.create_and(~x0, ~x1))
+
+        # f = x0 * x1, g = x0 + x1 (differs in two of eight output bits)
+        self.aig3 = Aig()
+        x0 = self.aig3.create_pi()
+        x1 = self.aig3.create_pi()
+        self.aig3.create_po(self.aig3.create_and(x0, x1))
+        self.aig3.create_po(self.aig3.create_or(x0, x1))
+
+        self.truth_path = write_truth_file(self.aig1)
+
+    def tearDown(self):
+        load_truth_table.cache_clear()
+        os.remove(self.truth_path)
+
+    def test_load_truth_table(self):
+        words, num_vars = load_truth_table(self.truth_path)
+
+        # Minterm m is stored in bit m, f is only true for x0 = 1, x1 = 0 and g is false only for x0 = x1 = 0
+        self.assertEqual(num_vars, 2)
+        self.assertEqual(words.shape, (2, 1))
+        self.assertEqual(int(words[0, 0]), 0b0010)
+        self.assertEqual(int(words[1, 0]), 0b1110)
+
+    def test_truth_table_agreement(self):
+        truth = load_truth_table(self.truth_path)
+
+        self.assertEqual(truth_table_agreement(self.aig1, truth), 1.0)
+        self.assertEqual(truth_table_agreement(self.aig2, truth), 1.0)
+        self.assertAlmostEqual(truth_table_agreement(self.aig3, truth), 0.75)
+
+    def test_truth_agreement_metric(self):
+        truth = load_truth_table(self.truth_path)
+
+        self.assertEqual(truth_agreement_metric(self.aig1, self.aig2, truth), 1.0)
+        self.assertAlmostEqual(truth_agreement_metric(self.aig1, self.aig3, truth), 0.75)
+        self.assertAlmostEqual(truth_agreement_metric(self.aig3, self.aig1, truth), 0.75)
+
+    def test_interface_mismatch(self):
+        truth = load_truth_table(self.truth_path)
+
+        aig = Aig()
+        x0 = aig.create_pi()
+        aig.create_po(x0)
+
+        with self.assertRaises(ValueError):
+            truth_agreement_metric(self.aig1, aig, truth)
+
+    def test_shared_function_metric(self):
+        # Identical AIGs and AIGs with the same gate functions share all functions
+        self.assertEqual(shared_function_metric(self.aig1, self.aig1.clone()), 1.0)
+        self.assertEqual(shared_function_metric(self.aig1, self.aig2), 1.0)
+
+        # Only the !x0 * !x1 gate is shared out of three distinct functions
+        self.assertAlmostEqual(shared_function_metric(self.aig1, self.aig3), 1 / 3)
+        self.assertAlmostEqual(shared_function_metric(self.aig3, self.aig1), 1 / 3)
+
+    def test_shared_function_metric_empty_aigs(self):
+        self.assertEqual(shared_function_metric(Aig(), Aig()), 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+
+import numpy as np
+from aigverse import Aig
+
+from aig_arrays import to_aig_arrays
+from benchmark_metrics import random_aig
+from sim_scores.level_metrics import LEVEL_BINS, FANOUT_BINS, level_profile, level_descriptor, \
+    level_profile_euclidean_metric, level_profile_cosine_metric
+
+
+def xor_aig() -> Aig:
+    aig = Aig()
+    x0 = aig.create_pi()
+    x1 = aig.create_pi()
+    n0 = aig.create_and(x0, ~x1)
+    n1 = aig.create_and(~x0, x1)
+    aig.create_po(~aig.create_and(~n0, ~n1))
+    return aig
+
+
+class TestLevelMetrics(unittest.TestCase):
+    def test_profile(self):
+        profile = level_profile(xor_aig())
+
+        np.testing.assert_array_equal(profile.gates_per_level, [0, 2, 1])
+        np.testing.assert_array_equal(profile.complemented_per_level, [0, 2, 2])
+        # Both inputs feed two gates, every gate drives one gate or output
+        np.testing.assert_array_equal(profile.fanout_histogram, [0, 3, 2])
+        # The fanins of the output gate share both inputs
+        self.assertEqual(profile.reconvergent_gates, 1)
+
+    def test_descriptor(self):
+        aig = random_aig(8, 300, 4, seed=0)
+        descriptor = level_descriptor(aig)
+
+        self.assertEqual(len(descriptor), 2 * LEVEL_BINS + len(FANOUT_BINS) + 1)
+        self.assertAlmostEqual(descriptor[:LEVEL_BINS].sum(), 1)
+        np.testing.assert_array_equal(level_descriptor(to_aig_arrays(aig)), descriptor)
+
+    def test_empty_aig(self):
+        aig = Aig()
+        aig.create_pi()
+        aig.create_po(aig.get_constant(False))
+
+        self.assertEqual(level_profile(aig).reconvergent_gates, 0)
+        self.assertFalse(level_descriptor(aig)[:2 * LEVEL_BINS].any())
+
+    def test_metrics(self):
+        aig1, aig2 = random_aig(8, 300, 4, seed=1), random_aig(8, 100, 8, seed=2)
+
+        self.assertEqual(level_profile_euclidean_metric(aig1, aig1.clone()), 0.0)
+        self.assertGreater(level_profile_euclidean_metric(aig1, aig2), 0.0)
+        self.assertAlmostEqual(level_profile_cosine_metric(aig1, aig1.clone()), 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
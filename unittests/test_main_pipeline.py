@@ -0,0 +1,61 @@
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from main import write_rows, write_result_rows, merge_results
+
+
+class TestResultsSink(unittest.TestCase):
+    def setUp(self):
+        self.save_dir = tempfile.TemporaryDirectory()
+        self.result_csv_path = os.path.join(self.save_dir.name, "veo_scores.csv")
+        self.partial_csv_path = self.result_csv_path + ".partial"
+
+    def tearDown(self):
+        self.save_dir.cleanup()
+
+    def test_new_results(self):
+        rows = ({"aig_ids": f"ex0{i}", "bdd,dsd": i / 3} for i in range(3))
+        write_rows(rows, self.partial_csv_path)
+        merge_results(self.result_csv_path, self.partial_csv_path)
+
+        results_df = pd.read_csv(self.result_csv_path, float_precision="round_trip")
+        self.assertEqual(results_df["aig_ids"].tolist(), ["ex00", "ex01", "ex02"])
+        self.assertEqual(results_df["bdd,dsd"].tolist(), [0.0, 1 / 3, 2 / 3])
+        self.assertFalse(os.path.exists(self.partial_csv_path))
+
+    def test_merge_into_existing_results(self):
+        pd.DataFrame({"aig_ids": ["ex00", "ex01"], "bdd,dsd": [0.5, 0.5], "bdd,sop": [0.1, 0.2]}) \
+            .to_csv(self.result_csv_path, index=False)
+
+        # Rerun one pair on one benchmark and add a benchmark
+        rows = [{"aig_ids": "ex01", "bdd,sop": 0.3}, {"aig_ids": "ex02", "bdd,sop": 0.4}]
+        write_rows(iter(rows), self.partial_csv_path)
+        merge_results(self.result_csv_path, self.partial_csv_path)
+
+        results_df = pd.read_csv(self.result_csv_path)
+        self.assertEqual(list(results_df.columns), ["aig_ids", "bdd,dsd", "bdd,sop"])
+        self.assertEqual(results_df["aig_ids"].tolist(), ["ex00", "ex01", "ex02"])
+        self.assertEqual(results_df["bdd,dsd"].tolist()[:2], [0.5, 0.5])
+        self.assertTrue(pd.isna(results_df["bdd,dsd"][2]))
+        self.assertEqual(results_df["bdd,sop"].tolist(), [0.1, 0.3, 0.4])
+
+    def test_empty_run(self):
+        write_result_rows(iter([]), {"veo": self.partial_csv_path}, fieldnames=["aig_ids", "bdd,dsd"])
+        merge_results(self.result_csv_path, self.partial_csv_path)
+        self.assertEqual(list(pd.read_csv(self.result_csv_path).columns), ["aig_ids", "bdd,dsd"])
+
+        # An empty run keeps the results of earlier runs
+        write_rows(iter([{"aig_ids": "ex00", "bdd,dsd": 0.5}]), self.partial_csv_path)
+        merge_results(self.result_csv_path, self.partial_csv_path)
+        for fieldnames in [["aig_ids", "bdd,dsd"], None]:
+            write_result_rows(iter([]), {"veo": self.partial_csv_path}, fieldnames=fieldnames)
+            merge_results(self.result_csv_path, self.partial_csv_path)
+            self.assertEqual(pd.read_csv(self.result_csv_path)["bdd,dsd"].tolist(), [0.5])
+            self.assertFalse(os.path.exists(self.partial_csv_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import os
+import subprocess
+import sys
+import unittest
+
+from all_pairs import FEATURIZERS
+from utils import COST_CLASSES, FUNCTION_MAP, METRICS, FEATURIZABLE_METRICS, METRIC_GROUPS, LazyFunctionMap
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestMetricRegistry(unittest.TestCase):
+    def test_registry(self):
+        self.assertEqual(list(FUNCTION_MAP), list(METRICS))
+        self.assertEqual(FEATURIZABLE_METRICS, set(FEATURIZERS))
+        for name, spec in METRICS.items():
+            self.assertIn(spec.cost, COST_CLASSES)
+            self.assertTrue(callable(FUNCTION_MAP[name]), name)
+        for members in METRIC_GROUPS.values():
+            self.assertTrue(set(members) <= set(METRICS))
+
+    def test_lazy_import(self):
+        # Listing the metrics and running a cheap one never imports the graph libraries
+        code = ("import sys, main; from utils import FUNCTION_MAP; "
+                "assert 'netsimile' in FUNCTION_MAP.keys(); FUNCTION_MAP['abs_gate_count']; "
+                "print(sorted(set(sys.modules) & {'networkx', 'scipy', 'grakel', 'pandas', 'all_pairs'}))")
+        output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+        self.assertEqual(output.stdout.strip(), "[]")
+
+    def test_override(self):
+        functions = LazyFunctionMap(METRICS)
+        functions["abs_gate_count"] = len
+        self.assertIs(functions["abs_gate_count"], len)
+        del functions["abs_gate_count"]
+        self.assertNotIn("abs_gate_count", functions)
+        self.assertEqual(len(functions), len(METRICS) - 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
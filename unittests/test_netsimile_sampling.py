@@ -0,0 +1,65 @@
+import unittest
+
+import networkx as nx
+import numpy as np
+
+from NetComp.features import get_features, aggregate_features, aggregate_sampled_features
+from NetComp.netsimile import netsimile
+from NetComp.sampling import sample_nodes, StreamingMoments, QuantileSketch
+
+
+class TestNetSimileSampling(unittest.TestCase):
+    def setUp(self):
+        self.G = nx.gnm_random_graph(600, 1800, seed=1)
+        self.DG = nx.gnm_random_graph(600, 1800, seed=2, directed=True)
+
+    def test_features_of_node_subset(self):
+        for G in [self.G, self.DG]:
+            nodes = [3, 141, 59]
+            np.testing.assert_allclose(get_features(G, nodes), get_features(G)[nodes])
+
+    def test_all_nodes_is_exact(self):
+        # Without sampling, the streaming estimators reproduce aggregate_features
+        description, error = aggregate_sampled_features(self.DG, 10 ** 6, batch_size=100)
+
+        np.testing.assert_allclose(description, aggregate_features(get_features(self.DG)), rtol=1e-9, atol=1e-12)
+        self.assertFalse(error.any())
+
+    def test_streaming_moments(self):
+        values = np.random.default_rng(0).exponential(size=(1000, 2))
+        moments = StreamingMoments(2)
+        for start in range(0, 1000, 64):
+            moments.update(values[start:start + 64], np.ones(len(values[start:start + 64])))
+
+        np.testing.assert_allclose(moments.mean, values.mean(axis=0))
+        np.testing.assert_allclose(moments.std(), values.std(axis=0))
+
+    def test_quantile_sketch(self):
+        values = np.random.default_rng(0).normal(size=10000)
+        sketch = QuantileSketch(capacity=100)
+        for start in range(0, 10000, 500):
+            sketch.update(values[start:start + 500], np.ones(500))
+
+        self.assertTrue(sketch.compressed)
+        self.assertAlmostEqual(sketch.quantile(0.5), np.median(values), delta=0.05)
+
+    def test_sampling_is_seeded(self):
+        for method in ["uniform", "degree"]:
+            nodes, weights = sample_nodes(self.G, 100, method, seed=3)
+
+            self.assertEqual(nodes, sample_nodes(self.G, 100, method, seed=3)[0])
+            # Weights scale the sample back to the whole graph
+            self.assertAlmostEqual(weights.sum(), self.G.number_of_nodes())
+        with self.assertRaises(ValueError):
+            sample_nodes(self.G, 100, "random_walk")
+
+    def test_sampled_netsimile(self):
+        exact = netsimile(self.G, self.DG)
+        approximate, error = netsimile(self.G, self.DG, sample_size=200, sampling="degree", return_error=True)
+
+        self.assertLessEqual(abs(approximate - exact), error)
+        self.assertEqual(netsimile(self.G, self.DG, sample_size=1000, return_error=True), (exact, 0.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+
+from benchmark_metrics import random_aig
+from scheduler import Task, run_tasks, OK
+from sim_scores.combined_optimization_metrics import relative_rrr_metrics
+from sim_scores import optimizers
+from sim_scores.optimizers import OptimizationStep, optimized_gate_counts, optimization_results, \
+    optimization_trajectories, parse_script
+
+
+class TestOptimizers(unittest.TestCase):
+    def setUp(self):
+        self.aigs = [random_aig(8, 200, 4, seed=seed) for seed in range(3)]
+        # Refactoring is left out, its results are not reproducible across calls in some aigverse versions
+        self.runs = [(aig, optimization) for aig in self.aigs for optimization in ["rewrite", "resub"]]
+
+        self.workers, self.backend = optimizers.OPTIMIZER_WORKERS, optimizers.OPTIMIZER_BACKEND
+        optimizers.OPTIMIZER_WORKERS = 1
+        optimizers._results.clear()
+        self.serial = optimized_gate_counts(self.runs)
+
+    def tearDown(self):
+        optimizers.OPTIMIZER_WORKERS, optimizers.OPTIMIZER_BACKEND = self.workers, self.backend
+        self.reset_pool()
+
+    @staticmethod
+    def reset_pool():
+        if optimizers._pool is not None:
+            optimizers._pool.shutdown()
+        optimizers._pool = None
+        optimizers._results.clear()
+
+    def test_inputs_not_modified(self):
+        sizes = [aig.num_gates() for aig in self.aigs]
+        optimized_gate_counts(self.runs)
+
+        self.assertEqual([aig.num_gates() for aig in self.aigs], sizes)
+        self.assertTrue(all(size <= aig.num_gates() for size, (aig, _) in zip(self.serial, self.runs)))
+
+    def test_backends(self):
+        for backend in ["thread", "process"]:
+            optimizers.OPTIMIZER_WORKERS, optimizers.OPTIMIZER_BACKEND = 2, backend
+            self.reset_pool()
+
+            self.assertEqual(optimized_gate_counts(self.runs), self.serial)
+
+    def test_in_scheduler_process(self):
+        # Pair processes of the scheduler are daemons, which cannot start a process pool
+        expected = relative_rrr_metrics(self.aigs[0], self.aigs[1])
+        for backend in ["thread", "process"]:
+            optimizers.OPTIMIZER_WORKERS, optimizers.OPTIMIZER_BACKEND = 2, backend
+            self.reset_pool()
+            optimizers._results.clear()
+
+            result, = run_tasks([Task("rrr", 1, relative_rrr_metrics, (self.aigs[0], self.aigs[1]))], jobs=1)
+            self.assertEqual(result.status, OK, result.value)
+            self.assertEqual(result.value, expected)
+
+    def test_optimized_once_per_aig(self):
+        calls = []
+        rewrite = optimizers.OPTIMIZERS["rewrite"]
+        optimizers.OPTIMIZERS["rewrite"] = lambda aig: calls.append(aig) or rewrite(aig)
+        try:
+            optimizers._results.clear()
+            # A clone has the same content as its original, so it is not optimized again
+            results = optimization_results([(self.aigs[0], "rewrite"), (self.aigs[0].clone(), "rewrite")])
+            optimization_results([(self.aigs[0], "rewrite")])
+        finally:
+            optimizers.OPTIMIZERS["rewrite"] = rewrite
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(results[0].gates, self.serial[0])
+
+    def test_parse_script(self):
+        script = parse_script("balance; rewrite(allow_zero_gain=True, cut_size=4)*2;; resub")
+
+        self.assertEqual(script, (
+            OptimizationStep("balance"),
+            OptimizationStep("rewrite", (("allow_zero_gain", True), ("cut_size", 4)), 2),
+            OptimizationStep("resub"),
+        ))
+        for text in ["dc2", "rewrite(4)", "rewrite*x", "rewrite(cut_size=)", "rewrite(bogus=1)", "balance*0",
+                     "resub(ntk=None)"]:
+            with self.assertRaises(ValueError):
+                parse_script(text)
+
+    def test_trajectories(self):
+        script = parse_script("rewrite*2; resub")
+        trajectory, = optimization_trajectories([(self.aigs[0], script)])
+
+        self.assertEqual(len(trajectory), 4)
+        self.assertEqual(trajectory[0][0], self.aigs[0].num_gates())
+        # Steps without zero-gain moves never increase the gate count
+        self.assertTrue(all(after[0] <= before[0] for before, after in zip(trajectory, trajectory[1:])))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import sys
+import time
+import unittest
+
+from scheduler import Task, run_tasks, OK, TIMEOUT, OUT_OF_MEMORY, ERROR
+
+
+def square(x):
+    return x * x
+
+
+def sleep(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def fail():
+    raise ValueError("undefined for empty graphs")
+
+
+def allocate(num_bytes):
+    return len(bytearray(num_bytes))
+
+
+class TestScheduler(unittest.TestCase):
+    def test_largest_first(self):
+        tasks = [Task(x, cost, square, (x,)) for x, cost in [(1, 10), (2, 30), (3, 20)]]
+        results = list(run_tasks(tasks, jobs=1))
+
+        self.assertEqual([result.key for result in results], [2, 3, 1])
+        self.assertEqual([result.value for result in results], [4, 9, 1])
+        self.assertTrue(all(result.status == OK for result in results))
+
+    def test_feed(self):
+        batches = [[Task(x, x, square, (x,)) for x in [4, 5]], [], [Task(6, 6, square, (6,))]]
+        results = list(run_tasks([Task(1, 1, square, (1,)), Task(2, 2, square, (2,))], jobs=1,
+                                 feed=lambda: batches.pop(0) if batches else []))
+
+        # Fed tasks start largest-first with the pending ones, the feed is called before the first task and after
+        # every result
+        self.assertEqual([result.key for result in results], [5, 4, 6, 2, 1])
+        self.assertEqual([result.value for result in results], [25, 16, 36, 4, 1])
+
+    def test_timeout(self):
+        tasks = [Task("slow", 2, sleep, (30,)), Task("fast", 1, sleep, (0,))]
+        start = time.monotonic()
+        results = {result.key: result for result in run_tasks(tasks, jobs=2, timeout=1)}
+
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertEqual(results["slow"].status, TIMEOUT)
+        self.assertEqual(results["fast"].status, OK)
+
+    def test_error(self):
+        results = list(run_tasks([Task("fail", 0, fail, ())]))
+
+        self.assertEqual(results[0].status, ERROR)
+        self.assertIn("ValueError", results[0].value)
+
+    @unittest.skipUnless(sys.platform.startswith("linux"), "memory budget relies on RLIMIT_AS")
+    def test_memory_limit(self):
+        tasks = [Task("large", 1, allocate, (1024 ** 3,)), Task("small", 0, allocate, (1024,))]
+        results = {result.key: result for result in run_tasks(tasks, memory_limit=64 * 1024 ** 2)}
+
+        self.assertEqual(results["large"].status, OUT_OF_MEMORY)
+        self.assertEqual(results["small"].value, 1024)
+
+
+if __name__ == '__main__':
+    unittest.main()
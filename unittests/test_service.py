@@ -0,0 +1,119 @@
+import http.client
+import json
+import os
+import socket
+import tempfile
+import threading
+import unittest
+
+from aigverse import write_aiger
+
+from benchmark_metrics import random_aig
+from feature_store import use_feature_store
+from service import SimilarityService, make_server
+from similarity_index import SimilarityIndex
+from sim_scores.netcomp_distances import get_net_simile
+
+
+class _UnixConnection(http.client.HTTPConnection):
+    def __init__(self, path):
+        super().__init__("localhost")
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.socket_path)
+
+
+class TestService(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.aigs = [random_aig(8, 80 + 20 * i, 4, seed=i) for i in range(3)]
+        self.paths = []
+        for i, aig in enumerate(self.aigs):
+            self.paths.append(os.path.join(self.directory.name, f"aig{i}.aig"))
+            write_aiger(aig, self.paths[-1])
+        self.service = SimilarityService()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _serve(self, **address):
+        server = make_server(self.service, **address)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    @staticmethod
+    def _post(connection, path, body):
+        connection.request("POST", path, json.dumps(body), {"Content-Type": "application/json"})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+
+    def test_compare_and_caches(self):
+        with use_feature_store(self.service.features):
+            first = self.service.handle({"op": "compare", "metric": "netsimile", "aig1": self.paths[0],
+                                         "aig2": self.paths[1]})
+            second = self.service.handle({"op": "compare", "metric": "netsimile", "aig1": self.paths[0],
+                                          "aig2": self.paths[2]})
+
+        self.assertAlmostEqual(first["value"], get_net_simile(self.aigs[0], self.aigs[1]))
+        stats = self.service.stats()
+        # The first AIG is parsed and featurized once for both pairs
+        self.assertEqual(stats["aigs"], {"items": 3, "hits": 1, "misses": 3})
+        self.assertEqual(stats["features"]["hits"], 1)
+        self.assertIn("value", second)
+
+    def test_errors(self):
+        self.assertIn("error", self.service.handle({"op": "compare", "metric": "nope", "aig1": self.paths[0],
+                                                    "aig2": self.paths[1]}))
+        self.assertIn("error", self.service.handle({"op": "featurize", "metric": "veo", "aig": self.paths[0]}))
+        self.assertIn("error", self.service.handle({"op": "explode"}))
+
+    def test_http_batch(self):
+        server = self._serve(port=0)
+        connection = http.client.HTTPConnection("127.0.0.1", server.server_address[1])
+        requests = [{"op": "compare", "metric": "abs_gate_count", "aig1": self.paths[0], "aig2": self.paths[1]},
+                    {"op": "featurize", "metric": "level_profile_cosine", "aig": self.paths[2]},
+                    {"op": "compare", "metric": "netsimile", "aig1": self.paths[0], "aig2": self.paths[0],
+                     "params": {"sample_size": 50}}]
+        status, response = self._post(connection, "/batch", {"requests": requests})
+
+        self.assertEqual(status, 200)
+        self.assertEqual(response["results"][0], {"value": 20})
+        self.assertEqual(len(response["results"][1]["features"]), 40)
+        self.assertEqual(response["results"][2], {"value": 0.0})
+
+        status, response = self._post(connection, "/compare", {"metric": "veo"})
+        self.assertEqual(status, 400)
+        connection.close()
+
+    def test_unix_socket_query(self):
+        index = SimilarityIndex("level_profile_euclidean")
+        for i, aig in enumerate(self.aigs):
+            index.add(f"aig{i}", aig)
+        index_path = os.path.join(self.directory.name, "library.index")
+        index.save(index_path)
+
+        self.service = SimilarityService(index_dir=self.directory.name)
+        socket_path = os.path.join(self.directory.name, "service.sock")
+        self._serve(socket_path=socket_path)
+        connection = _UnixConnection(socket_path)
+        status, response = self._post(connection, "/query", {"index": "library.index", "aig": self.paths[1], "k": 2})
+
+        self.assertEqual(status, 200)
+        self.assertEqual(response["neighbors"][0], ["aig1", 0.0])
+
+        # Indexes are only loaded from the index directory
+        for index in [index_path, "../library.index", "subdirectory/library.index"]:
+            status, response = self._post(connection, "/query", {"index": index, "aig": self.paths[1]})
+            self.assertEqual(status, 400, index)
+        connection.close()
+        self.assertIn("error", SimilarityService().handle({"op": "query", "index": "library.index",
+                                                           "aig": self.paths[1]}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import argparse
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from main import parse_shard, shard_benchmarks, write_rows, write_result_rows
+from merge_shards import merge_shards
+
+
+class TestShards(unittest.TestCase):
+    def setUp(self):
+        self.save_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.save_dir.cleanup()
+
+    def test_parse_shard(self):
+        self.assertEqual(parse_shard("2/8"), (2, 8))
+        for value in ["8/8", "-1/8", "2", "a/b"]:
+            with self.assertRaises(argparse.ArgumentTypeError):
+                parse_shard(value)
+
+    def test_shard_benchmarks(self):
+        costs = {f"ex{i:02d}": cost for i, cost in enumerate([100, 1, 1, 1, 50, 50, 2, 3, 90, 5])}
+        shards = [shard_benchmarks(list(costs), costs, shard, 3) for shard in range(3)]
+
+        self.assertEqual(sorted(sum(shards, [])), sorted(costs))
+        self.assertEqual(shards, [shard_benchmarks(list(reversed(costs)), costs, shard, 3) for shard in range(3)])
+        loads = [sum(costs[filename] for filename in shard) for shard in shards]
+        self.assertLessEqual(max(loads), 106)
+
+    def _write_shard(self, shard, num_shards, rows, metric="veo"):
+        path = os.path.join(self.save_dir.name, f"{metric}_scores.shard{shard}of{num_shards}.csv")
+        write_rows(iter(rows), path)
+
+    def test_merge(self):
+        self._write_shard(0, 2, [{"aig_ids": "ex00", "bdd,dsd": 0.5}, {"aig_ids": "ex02", "bdd,dsd": 1 / 3}])
+        self._write_shard(1, 2, [{"aig_ids": "ex01", "bdd,dsd": float("nan")}])
+        with self.assertRaises(ValueError):
+            merge_shards(self.save_dir.name, "veo", aig_ids=["ex00", "ex01", "ex02", "ex03"])
+
+        merge_shards(self.save_dir.name, "veo", aig_ids=["ex00", "ex01", "ex02"], remove=True)
+        results_df = pd.read_csv(os.path.join(self.save_dir.name, "veo_scores.csv"), float_precision="round_trip")
+        self.assertEqual(results_df["aig_ids"].tolist(), ["ex00", "ex01", "ex02"])
+        self.assertEqual(results_df["bdd,dsd"][2], 1 / 3)
+        self.assertTrue(pd.isna(results_df["bdd,dsd"][1]))
+        self.assertEqual(os.listdir(self.save_dir.name), ["veo_scores.csv"])
+
+    def test_empty_shard(self):
+        self._write_shard(0, 3, [{"aig_ids": "ex00", "bdd,dsd": 1}, {"aig_ids": "ex01", "bdd,dsd": 2}])
+        # A shard without benchmarks writes its header, shards of older runs may be empty files
+        write_result_rows(iter([]), {"veo": os.path.join(self.save_dir.name, "veo_scores.shard1of3.csv")},
+                          fieldnames=["aig_ids", "bdd,dsd"])
+        open(os.path.join(self.save_dir.name, "veo_scores.shard2of3.csv"), "w").close()
+
+        merge_shards(self.save_dir.name, "veo", aig_ids=["ex00", "ex01"])
+        results_df = pd.read_csv(os.path.join(self.save_dir.name, "veo_scores.csv"))
+        self.assertEqual(results_df["aig_ids"].tolist(), ["ex00", "ex01"])
+        self.assertEqual(results_df["bdd,dsd"].tolist(), [1, 2])
+
+    def test_invalid_shards(self):
+        self._write_shard(0, 3, [{"aig_ids": "ex00", "bdd,dsd": 0.5}])
+        self._write_shard(2, 3, [{"aig_ids": "ex00", "bdd,dsd": 0.5}])
+        with self.assertRaisesRegex(ValueError, "Missing shards"):
+            merge_shards(self.save_dir.name, "veo")
+
+        self._write_shard(1, 3, [{"aig_ids": "ex01", "bdd,dsd": 0.5}])
+        with self.assertRaisesRegex(ValueError, "several shards"):
+            merge_shards(self.save_dir.name, "veo")
+
+        self._write_shard(2, 3, [{"aig_ids": "ex02", "bdd,sop": 0.5}])
+        with self.assertRaisesRegex(ValueError, "Columns"):
+            merge_shards(self.save_dir.name, "veo")
+        self.assertFalse(os.path.exists(os.path.join(self.save_dir.name, "veo_scores.csv")))
+
+
+if __name__ == '__main__':
+    unittest.main()
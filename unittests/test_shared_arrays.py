@@ -0,0 +1,78 @@
+import multiprocessing
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from aig_arrays import to_aig_arrays
+from benchmark_metrics import random_aig
+import main
+from main import attach_benchmark, share_benchmark
+from shared_arrays import SharedArrays, attach
+
+
+def _sum_shared(handle):
+    return int(attach(handle).sum())
+
+
+class TestSharedArrays(unittest.TestCase):
+    def test_share_and_release(self):
+        array = np.arange(1000, dtype=np.int64).reshape(10, 100)
+        with SharedArrays() as shared:
+            handle = shared.share(array)
+            # A spawned process only gets the handle
+            with multiprocessing.get_context("spawn").Pool(1) as pool:
+                self.assertEqual(pool.apply(_sum_shared, (handle,)), int(array.sum()))
+
+            view = attach(handle)
+            np.testing.assert_array_equal(view, array)
+            self.assertFalse(view.flags.writeable)
+
+            shared.release([handle])
+            self.assertEqual(len(shared), 0)
+            # Mapped arrays stay valid after the block is removed
+            self.assertEqual(int(view[9, 99]), 999)
+
+        with self.assertRaises(FileNotFoundError):
+            attach(handle._replace(name=handle.name + "_missing"))
+
+    def test_share_benchmark(self):
+        aigs = {"bdd": random_aig(8, 100, 4, seed=0), "sop": to_aig_arrays(random_aig(6, 50, 2, seed=1))}
+        truth = (np.arange(4, dtype=np.uint64), 8)
+        with SharedArrays() as shared:
+            handles = share_benchmark(shared, aigs, truth)
+            self.assertEqual(len(shared), 3)
+            shared_aigs, shared_truth = attach_benchmark(handles, ["bdd", "sop"])
+
+            for aig_type, aig in aigs.items():
+                expected = aig if aig_type == "sop" else to_aig_arrays(aig)
+                self.assertEqual(shared_aigs[aig_type].num_pis, expected.num_pis)
+                for field in ["fanin0", "fanin1", "pos", "levels"]:
+                    np.testing.assert_array_equal(getattr(shared_aigs[aig_type], field), getattr(expected, field))
+            np.testing.assert_array_equal(shared_truth[0], truth[0])
+            self.assertEqual(shared_truth[1], 8)
+
+    def test_benchmarks_shared_in_window(self):
+        with mock.patch("sys.argv", ["main.py", "bdd", "sop", "strash", "level_profile_cosine", "--jobs", "2"]):
+            args = main.parse_arguments()
+        aig_ids = ["ex01", "ex02", "ex03", "ex04", "ex05"]
+
+        in_shared_memory = []
+
+        def share(shared, aigs, truth=None):
+            handles = share_benchmark(shared, aigs, truth)
+            in_shared_memory.append(len(shared))
+            return handles
+
+        with mock.patch("main.share_benchmark", share):
+            rows = list(main.get_scheduled_results(args, aig_ids, [], []))
+
+        self.assertEqual(sorted(row["aig_ids"] for row in rows), aig_ids)
+        # At most two benchmarks of three AIG types at a time, a benchmark is shared once another one is done
+        self.assertEqual(len(in_shared_memory), 5)
+        self.assertEqual(max(in_shared_memory), 6)
+        self.assertEqual(rows, list(main.get_scheduled_results(args, aig_ids, [], [])))
+
+
+if __name__ == '__main__':
+    unittest.main()
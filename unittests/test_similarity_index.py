@@ -0,0 +1,69 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from all_pairs import FEATURIZERS
+from benchmark_metrics import random_aig
+from similarity_index import SimilarityIndex
+
+
+class TestSimilarityIndex(unittest.TestCase):
+    def setUp(self):
+        self.aigs = [random_aig(8, 60 + 15 * i, 4, seed=i) for i in range(10)]
+
+    def test_exact_query(self):
+        for metric in ["netsimile", "kernel_sim", "level_profile_cosine"]:
+            index = SimilarityIndex(metric)
+            for i, aig in enumerate(self.aigs):
+                index.add(("aig", i), aig)
+
+            # An AIG already in the library is its own nearest neighbor
+            neighbors = index.query(self.aigs[4].clone(), k=3)
+            self.assertEqual(len(neighbors), 3)
+            self.assertEqual(neighbors[0][0], ("aig", 4))
+            with self.assertRaises(ValueError):
+                index.add(("aig", 4), self.aigs[4])
+
+    def test_approximate_query(self):
+        rng = np.random.default_rng(0)
+        library = rng.lognormal(size=(2000, 20))
+        index = SimilarityIndex("level_profile_euclidean", approximate=True)
+        for i, features in enumerate(library[:1500]):
+            index.add_features(i, features)
+        # Insertion after the hash tables are built
+        index.query_features(library[0], k=1)
+        for i, features in enumerate(library[1500:], start=1500):
+            index.add_features(i, features)
+
+        found = 0
+        for i in rng.choice(2000, size=50, replace=False):
+            query = library[i] * (1 + 0.01 * rng.normal(size=20))
+            neighbors = index.query_features(query, k=5)
+            exact = index.query_features(query, k=5, exact=True)
+            found += neighbors[0][0] == exact[0][0]
+            # Values of the candidates are exact
+            self.assertAlmostEqual(neighbors[0][1], np.linalg.norm(library[neighbors[0][0]] - query))
+        self.assertGreaterEqual(found, 45)
+
+    def test_save_load(self):
+        index = SimilarityIndex("kernel_sim", approximate=True)
+        for i, aig in enumerate(self.aigs):
+            index.add(i, aig)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "kernel_sim.index")
+            index.save(path)
+            loaded = SimilarityIndex.load(path)
+
+        self.assertEqual(len(loaded), 10)
+        self.assertIn(3, loaded)
+        features = FEATURIZERS["kernel_sim"].featurize(self.aigs[3])
+        self.assertEqual(loaded.query_features(features, k=4, exact=True), index.query_features(features, k=4,
+                                                                                                exact=True))
+        self.assertEqual(loaded.query_features(features, k=1)[0][0], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
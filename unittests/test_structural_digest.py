@@ -0,0 +1,59 @@
+import argparse
+import unittest
+from unittest import mock
+
+from aigverse import Aig
+
+import main
+from aig_arrays import aig_digest, structural_digest
+
+
+def and_aig(gate_order: int, swap_fanins: bool = False, complement_output: bool = False) -> Aig:
+    aig = Aig()
+    x0, x1, x2 = aig.create_pi(), aig.create_pi(), aig.create_pi()
+    fanins = [(x0, ~x1), (x1, x2)]
+    if swap_fanins:
+        fanins = [(b, a) for a, b in fanins]
+    gates = {}
+    for i in [gate_order, 1 - gate_order]:
+        gates[i] = aig.create_and(*fanins[i])
+    out = aig.create_and(gates[0], ~gates[1])
+    aig.create_po(~out if complement_output else out)
+    aig.create_po(gates[1])
+    return aig
+
+
+class TestStructuralDigest(unittest.TestCase):
+    def test_independent_of_node_numbering(self):
+        aig, renumbered = and_aig(0), and_aig(1, swap_fanins=True)
+
+        self.assertNotEqual(aig_digest(aig), aig_digest(renumbered))
+        self.assertEqual(structural_digest(aig), structural_digest(renumbered))
+
+    def test_structure_changes(self):
+        self.assertNotEqual(structural_digest(and_aig(0)), structural_digest(and_aig(0, complement_output=True)))
+
+    def test_identical_pairs_computed_once(self):
+        aigs = {"bdd": and_aig(0), "dsd": and_aig(1), "sop": and_aig(0, complement_output=True)}
+        args = argparse.Namespace(metric="netsimile", aig_types=list(aigs), fingerprint_script=None,
+                                  netsimile_sample=None)
+        calls = []
+
+        def metric(aig1, aig2):
+            calls.append((aig1, aig2))
+            return float(len(calls))
+
+        with mock.patch.dict(main.FUNCTION_MAP, {"netsimile": metric}):
+            row, = main.compare_benchmarks(args, iter([("ex00", aigs, None)]))
+
+        # bdd and dsd only differ in numbering: (bdd, dsd) is computed and (dsd, sop) copies (bdd, sop)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(row["bdd,sop"], row["dsd,sop"])
+
+        # Node samples depend on the numbering, sampled NetSimile compares AIGs that only differ in it
+        args.netsimile_sample = 2
+        self.assertEqual(len(set(main.benchmark_classes(args, aigs).values())), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
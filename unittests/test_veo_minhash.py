@@ -0,0 +1,70 @@
+import unittest
+
+import numpy as np
+
+from all_pairs import FEATURIZERS, all_pairs, featurize_all
+from benchmark_metrics import random_aig
+from graph_utils import get_graph
+from similarity_index import SimilarityIndex
+from sim_scores.veo_minhash import graph_sets, minhash_sketch, estimate_veo, estimate_jaccard, MinHashLSH, \
+    get_veo_minhash, get_directed_veo_minhash
+
+
+def exact_veo(aig1, aig2, directed=False, weights=(-1, 1)):
+    (vertices1, edges1), (vertices2, edges2) = graph_sets(aig1, directed, weights), graph_sets(aig2, directed, weights)
+    common = len(np.intersect1d(vertices1, vertices2)) + len(np.intersect1d(edges1, edges2))
+    return 2 * common / (len(vertices1) + len(vertices2) + len(edges1) + len(edges2))
+
+
+class TestVeoMinHash(unittest.TestCase):
+    def setUp(self):
+        self.aig = random_aig(10, 400, 5, seed=0)
+        # Same inputs and first gates, then diverging
+        self.similar = random_aig(10, 440, 5, seed=0)
+        self.different = random_aig(10, 400, 5, seed=1)
+
+    def test_graph_sets_match_graph(self):
+        for directed, weights in [(False, (-1, 1)), (True, (-1, 1)), (True, (1, 1))]:
+            G, _ = get_graph(self.aig, self.aig, directed=directed, weights=weights)
+            vertices, edges = graph_sets(self.aig, directed, weights)
+
+            self.assertEqual(set(vertices.tolist()), set(G.nodes()))
+            expected = {(u, v) if directed else (min(u, v), max(u, v)) for u, v in G.edges()}
+            self.assertEqual({(int(key) >> 32, int(key) & 0xFFFFFFFF) for key in edges}, expected)
+
+    def test_estimate_within_bound(self):
+        for directed in [False, True]:
+            for other in [self.similar, self.different]:
+                estimate, error = estimate_veo(minhash_sketch(self.aig, directed), minhash_sketch(other, directed),
+                                               confidence=0.99)
+                self.assertLessEqual(abs(estimate - exact_veo(self.aig, other, directed)), error)
+
+        self.assertEqual(get_veo_minhash(self.aig, self.aig.clone()), 1.0)
+        self.assertEqual(get_directed_veo_minhash(self.aig, self.aig.clone()), 1.0)
+
+    def test_lsh_candidates(self):
+        lsh = MinHashLSH(bands=32, rows=4)
+        sketches = {"aig": minhash_sketch(self.aig), "similar": minhash_sketch(self.similar),
+                    "different": minhash_sketch(self.different)}
+        for key, sketch in sketches.items():
+            lsh.insert(key, sketch)
+
+        self.assertGreater(estimate_jaccard(sketches["aig"].mins, sketches["similar"].mins), lsh.threshold())
+        self.assertIn(("aig", "similar"), lsh.candidate_pairs())
+        self.assertNotIn("different", lsh.candidates(sketches["aig"]))
+
+    def test_all_pairs_and_index(self):
+        aigs = [self.aig, self.similar, self.different]
+        featurizer = FEATURIZERS["veo_minhash"]
+        matrix = np.zeros((3, 3))
+        all_pairs(featurize_all(featurizer.featurize, aigs), featurizer.distance, out=matrix)
+        self.assertAlmostEqual(matrix[0, 1], get_veo_minhash(self.aig, self.similar))
+
+        index = SimilarityIndex("veo_minhash", approximate=True, num_tables=32)
+        for i, aig in enumerate(aigs):
+            index.add(i, aig)
+        self.assertEqual([key for key, _ in index.query(self.aig, k=2)], [0, 1])
+
+
+if __name__ == '__main__':
+    unittest.main()
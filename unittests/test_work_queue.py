@@ -0,0 +1,133 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from main import parse_arguments, run_digest
+from work_queue import WorkQueue
+
+
+class TestWorkQueue(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.costs = {"small": 1, "large": 100, "medium": 10}
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _queue(self, **options):
+        return WorkQueue(self.directory.name, list(self.costs), self.costs, **options)
+
+    def test_claims_largest_first(self):
+        first, second = self._queue(), self._queue()
+        claims = [first.claim(), second.claim(), first.claim()]
+        self.assertEqual([claim.key for claim in claims], ["large", "medium", "small"])
+        self.assertIsNone(second.claim())
+
+        first.complete(claims[0], {"value": 1})
+        self.assertEqual(second.pending(), ["medium", "small"])
+        self.assertEqual(second.result("large"), {"value": 1})
+        for claim in claims:
+            first.release(claim)
+        self.assertEqual(os.listdir(self.directory.name), ["large.done"])
+
+    def test_stale_claim(self):
+        crashed, worker = self._queue(), self._queue(stale_after=0.2, heartbeat=0.05)
+        claim = crashed.claim()
+        # The crashed worker stops heartbeating
+        claim.stop.set()
+
+        self.assertEqual(worker.claim().key, "medium")
+        self.assertEqual(worker.claim().key, "small")
+        self.assertIsNone(worker.claim())
+        time.sleep(0.3)
+        reclaimed = worker.claim()
+        self.assertEqual(reclaimed.key, "large")
+
+        # The reclaimed claim survives the release by the stale worker
+        crashed.release(claim)
+        time.sleep(0.1)
+        self.assertFalse(reclaimed.lost.is_set())
+        worker.complete(reclaimed, 2)
+        self.assertEqual(worker.result("large"), 2)
+
+    def test_reclaim_race(self):
+        crashed, first, second = self._queue(), self._queue(stale_after=0.2), self._queue(stale_after=0.2)
+        claim = crashed.claim()
+        claim.stop.set()
+        for worker in [first, second]:
+            worker._is_stale(claim.key)
+        time.sleep(0.3)
+        self.assertTrue(first._is_stale(claim.key))
+        self.assertTrue(second._is_stale(claim.key))
+
+        # The first worker reclaims the task before the second one renames the claim file it saw stale
+        reclaimed = first._reclaim(claim.key)
+        self.assertIsNotNone(reclaimed)
+        self.assertIsNone(second._reclaim(claim.key))
+        self.assertTrue(first._owns(reclaimed))
+        first.release(reclaimed)
+
+    def test_lost_claim(self):
+        self.costs = {"task": 1}
+        calls = []
+
+        def compute(key):
+            calls.append(key)
+            if len(calls) == 1:
+                # Another worker reclaims the task while this one computes it
+                with open(os.path.join(self.directory.name, "task.claim"), "w") as file:
+                    json.dump({"worker": "other", "token": "other", "claimed": time.time()}, file)
+            return len(calls)
+
+        self.assertEqual(self._queue(stale_after=0.2, heartbeat=0.05).run(compute, poll=0.05), 1)
+        # The result of the lost claim is dropped, the task is computed again once the other claim is stale
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(self._queue().result("task"), 2)
+
+    def test_heartbeat(self):
+        owner, worker = self._queue(heartbeat=0.05), self._queue(stale_after=0.2)
+        claim = owner.claim()
+        worker._is_stale(claim.key)
+        time.sleep(0.3)
+        self.assertFalse(worker._is_stale(claim.key))
+        owner.release(claim)
+
+    def test_run(self):
+        self.costs = {f"task{i}": i for i in range(30)}
+        computed, counts = [], []
+
+        def compute(key):
+            computed.append(key)
+            time.sleep(0.001)
+            return key.upper()
+
+        def work():
+            counts.append(self._queue(heartbeat=0.05).run(compute, poll=0.01))
+
+        workers = [threading.Thread(target=work) for _ in range(3)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        self.assertEqual(sorted(computed), sorted(self.costs))
+        self.assertEqual(sum(counts), 30)
+        self.assertEqual(self._queue().result("task7"), "TASK7")
+
+    def test_run_digest(self):
+        def digest(*arguments):
+            with mock.patch("sys.argv", ["main.py", "bdd", "sop", *arguments]):
+                return run_digest(parse_arguments())
+
+        base = digest("netsimile")
+        self.assertEqual(digest("netsimile", "--jobs", "4", "--queue"), base)
+        for arguments in [["veo"], ["netsimile", "--netsimile_sample", "100"], ["netsimile", "--folder_path", "other"]]:
+            self.assertNotEqual(digest(*arguments), base)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,61 +1,185 @@
-from sim_scores.spectral import get_lap_spectral_dist, get_adj_spectral_dist, get_directed_adj_sd
-from sim_scores.netcomp_distances import get_net_simile, get_deltacon0, get_ns_dir_inverted, get_ns_dir_uninverted
-from sim_scores.kernel_sim import get_kernel_sim
-from sim_scores.veo import get_veo, get_directed_veo, get_directed_uninverted
-from sim_scores.resub_metrics import absolute_resub_metric, relative_resub_metric
-from sim_scores.rewrite_metrics import absolute_rewrite_metric, relative_rewrite_metric
-from sim_scores.refactor_metrics import absolute_refactor_metric, relative_refactor_metric
-from sim_scores.size_diff_metrics import absolute_size_diff_metric, relative_size_diff_metric
-from sim_scores.characteristics_metrics import absolute_gate_count_metric, relative_gate_count_metric, \
-    absolute_edge_count_metric, relative_edge_count_metric, absolute_level_count_metric, relative_level_count_metric, \
-    gate_level_normalized_euclidean_similarity_metric, gate_level_cosine_similarity_metric
-from sim_scores.combined_optimization_metrics import relative_rrr_euclidean_metric, relative_rrr_cosine_metric, \
-    relative_rrr_canberra_metric, relative_rrr_bray_curtis_metric
+import importlib
+from collections.abc import MutableMapping
+from typing import NamedTuple
 
-# Map function names to actual function calls
-FUNCTION_MAP = {
-    "deltacon0": get_deltacon0,  # takes forever, not for no known node correspondence
+# Cost classes of the metrics, from counting gates to running optimizations or kernels on both AIGs
+COST_CLASSES = ("cheap", "moderate", "expensive")
+
+
+class MetricSpec(NamedTuple):
+    """
+    Registry entry of a metric: where its function lives and what it needs. The module is imported on first use, so
+    that listing the metrics or running a cheap one never imports networkx, scipy or grakel.
+
+    Fields:
+    -------
+    module, function : str
+        The module path and name of the comparison function.
+    cost : str
+        Cost class of one comparison, one of COST_CLASSES.
+    needs_graphs : bool
+        Whether the metric builds graphs of the AIGs (networkx or sparse matrices).
+    needs_optimizers : bool
+        Whether the metric runs optimizations on the AIGs.
+    symmetric : bool
+        Whether the result is the same for (aig1, aig2) and (aig2, aig1).
+    featurizable : bool
+        Whether the metric compares per-AIG features, see all_pairs.FEATURIZERS.
+    accepts_arrays : bool
+        Whether the metric also accepts the AigArrays of aig_cache, so it never needs to parse the AIGER files.
+    order_invariant : bool
+        Whether the metric does not depend on the numbering of the gates, identical AIGs are found with the
+        structural digest for it and the exact content digest otherwise, see main.benchmark_classes.
+    sampled : bool
+        Whether the metric can aggregate its node features over a node sample, see main.py --netsimile_sample.
+    members : tuple of str
+        For a metric computing several metrics at once, the member metrics of the dict it returns.
+    """
+    module: str
+    function: str
+    cost: str = "cheap"
+    needs_graphs: bool = False
+    needs_optimizers: bool = False
+    symmetric: bool = True
+    featurizable: bool = False
+    accepts_arrays: bool = False
+    order_invariant: bool = False
+    sampled: bool = False
+    members: tuple = ()
+
+
+_NETCOMP = "sim_scores.netcomp_distances"
+_SPECTRAL = "sim_scores.spectral"
+_CHARACTERISTICS = "sim_scores.characteristics_metrics"
+_COMBINED = "sim_scores.combined_optimization_metrics"
+_GRAPH = {"needs_graphs": True, "accepts_arrays": True}
+_NETSIMILE = {**_GRAPH, "cost": "moderate", "featurizable": True, "order_invariant": True, "sampled": True}
+_SPECTRUM = {**_GRAPH, "cost": "expensive", "order_invariant": True}
+_VEO = {**_GRAPH, "cost": "moderate"}
+_MINHASH = {**_VEO, "featurizable": True}
+_COUNT = {"order_invariant": True}
+_LEVELS = {"featurizable": True, "order_invariant": True}
+_OPTIMIZATION = {"cost": "moderate", "needs_optimizers": True}
+_RRR = {"cost": "expensive", "needs_optimizers": True, "featurizable": True}
+_TRUTH = {"cost": "moderate", "accepts_arrays": True, "order_invariant": True}
 
-    "netsimile": get_net_simile,
-    "ns_inv": get_ns_dir_inverted,
-    "ns_dir_uninverted": get_ns_dir_uninverted,
+# Every metric by name
+METRICS = {
+    # takes forever, not for no known node correspondence
+    "deltacon0": MetricSpec(_NETCOMP, "get_deltacon0", cost="expensive", needs_graphs=True, accepts_arrays=True),
 
-    "lap_sd": get_lap_spectral_dist,
-    "adj_sd": get_adj_spectral_dist,
-    "dir_edj_sd": get_directed_adj_sd,
+    "netsimile": MetricSpec(_NETCOMP, "get_net_simile", **_NETSIMILE),
+    "ns_inv": MetricSpec(_NETCOMP, "get_ns_dir_inverted", **_NETSIMILE),
+    "ns_dir_uninverted": MetricSpec(_NETCOMP, "get_ns_dir_uninverted", **_NETSIMILE),
+    # direction-aware features (fanin and fanout egonets, directed clustering) of the graphs of ns_inv and
+    # ns_dir_uninverted, see NetComp.features.get_directed_features
+    "ns_dir": MetricSpec(_NETCOMP, "get_ns_dir", **_NETSIMILE),
+    "ns_dir_uninverted_directed": MetricSpec(_NETCOMP, "get_ns_dir_uninverted_directed", **_NETSIMILE),
 
-    "veo": get_veo,
-    "veo_dir": get_directed_veo,
-    "veo_dir_uninverted": get_directed_uninverted,
+    "lap_sd": MetricSpec(_SPECTRAL, "get_lap_spectral_dist", featurizable=True, **_SPECTRUM),
+    "adj_sd": MetricSpec(_SPECTRAL, "get_adj_spectral_dist", featurizable=True, **_SPECTRUM),
+    "dir_edj_sd": MetricSpec(_SPECTRAL, "get_directed_adj_sd", **_SPECTRUM),
 
-    "kernel_sim": get_kernel_sim,
+    "veo": MetricSpec("sim_scores.veo", "get_veo", **_VEO),
+    "veo_dir": MetricSpec("sim_scores.veo", "get_directed_veo", **_VEO),
+    "veo_dir_uninverted": MetricSpec("sim_scores.veo", "get_directed_uninverted", **_VEO),
+    # MinHash estimates of the VEO metrics, see sim_scores/veo_minhash.py
+    "veo_minhash": MetricSpec("sim_scores.veo_minhash", "get_veo_minhash", **_MINHASH),
+    "veo_dir_minhash": MetricSpec("sim_scores.veo_minhash", "get_directed_veo_minhash", **_MINHASH),
+    "veo_dir_uninverted_minhash": MetricSpec("sim_scores.veo_minhash", "get_directed_uninverted_veo_minhash",
+                                             **_MINHASH),
 
-    "rel_resub": relative_resub_metric,
-    "abs_resub": absolute_resub_metric,
+    "kernel_sim": MetricSpec("sim_scores.kernel_sim", "get_kernel_sim", cost="expensive", featurizable=True,
+                             **_GRAPH),
 
-    "rel_rewrite": relative_rewrite_metric,
-    "abs_rewrite": absolute_rewrite_metric,
+    "rel_resub": MetricSpec("sim_scores.resub_metrics", "relative_resub_metric", **_OPTIMIZATION),
+    "abs_resub": MetricSpec("sim_scores.resub_metrics", "absolute_resub_metric", **_OPTIMIZATION),
 
-    "rel_refactor": relative_refactor_metric,
-    "abs_refactor": absolute_refactor_metric,
+    "rel_rewrite": MetricSpec("sim_scores.rewrite_metrics", "relative_rewrite_metric", **_OPTIMIZATION),
+    "abs_rewrite": MetricSpec("sim_scores.rewrite_metrics", "absolute_rewrite_metric", **_OPTIMIZATION),
 
-    "abs_size_diff": absolute_size_diff_metric,
-    "rel_size_diff": relative_size_diff_metric,
+    "rel_refactor": MetricSpec("sim_scores.refactor_metrics", "relative_refactor_metric", **_OPTIMIZATION),
+    "abs_refactor": MetricSpec("sim_scores.refactor_metrics", "absolute_refactor_metric", **_OPTIMIZATION),
 
-    "abs_gate_count": absolute_gate_count_metric,
-    "rel_gate_count": relative_gate_count_metric,
+    # compare the AIGs with their optimized AIGs of --optimized_path
+    "abs_size_diff": MetricSpec("sim_scores.size_diff_metrics", "absolute_size_diff_metric"),
+    "rel_size_diff": MetricSpec("sim_scores.size_diff_metrics", "relative_size_diff_metric"),
 
-    "abs_edge_count": absolute_edge_count_metric,
-    "rel_edge_count": relative_edge_count_metric,
+    "abs_gate_count": MetricSpec(_CHARACTERISTICS, "absolute_gate_count_metric", **_COUNT),
+    "rel_gate_count": MetricSpec(_CHARACTERISTICS, "relative_gate_count_metric", **_COUNT),
 
-    "abs_level_count": absolute_level_count_metric,
-    "rel_level_count": relative_level_count_metric,
+    "abs_edge_count": MetricSpec(_CHARACTERISTICS, "absolute_edge_count_metric", **_COUNT),
+    "rel_edge_count": MetricSpec(_CHARACTERISTICS, "relative_edge_count_metric", **_COUNT),
 
-    "gate_level_euclidean": gate_level_normalized_euclidean_similarity_metric,
-    "gate_level_cosine": gate_level_cosine_similarity_metric,
+    "abs_level_count": MetricSpec(_CHARACTERISTICS, "absolute_level_count_metric", **_COUNT),
+    "rel_level_count": MetricSpec(_CHARACTERISTICS, "relative_level_count_metric", **_COUNT),
 
-    "rel_rrr_euclidean": relative_rrr_euclidean_metric,
-    "rel_rrr_cosine": relative_rrr_cosine_metric,
-    "rel_rrr_canberra": relative_rrr_canberra_metric,
-    "rel_rrr_bray_curtis": relative_rrr_bray_curtis_metric
+    "gate_level_euclidean": MetricSpec(_CHARACTERISTICS, "gate_level_normalized_euclidean_similarity_metric",
+                                       **_LEVELS),
+    "gate_level_cosine": MetricSpec(_CHARACTERISTICS, "gate_level_cosine_similarity_metric", **_LEVELS),
+    "level_profile_euclidean": MetricSpec("sim_scores.level_metrics", "level_profile_euclidean_metric",
+                                          accepts_arrays=True, **_LEVELS),
+    "level_profile_cosine": MetricSpec("sim_scores.level_metrics", "level_profile_cosine_metric",
+                                       accepts_arrays=True, **_LEVELS),
+
+    "rel_rrr_euclidean": MetricSpec(_COMBINED, "relative_rrr_euclidean_metric", **_RRR),
+    "rel_rrr_cosine": MetricSpec(_COMBINED, "relative_rrr_cosine_metric", **_RRR),
+    "rel_rrr_canberra": MetricSpec(_COMBINED, "relative_rrr_canberra_metric", **_RRR),
+    "rel_rrr_bray_curtis": MetricSpec(_COMBINED, "relative_rrr_bray_curtis_metric", **_RRR),
+    # all four RRR metrics at once, see METRIC_GROUPS
+    "rel_rrr_all": MetricSpec(_COMBINED, "relative_rrr_metrics", cost="expensive", needs_optimizers=True,
+                              members=("rel_rrr_euclidean", "rel_rrr_cosine", "rel_rrr_canberra",
+                                       "rel_rrr_bray_curtis")),
+
+    # script set with main.py --fingerprint_script
+    "opt_fingerprint": MetricSpec("sim_scores.fingerprint_metrics", "optimization_fingerprint_metric",
+                                  cost="expensive", needs_optimizers=True),
+
+    # needs the benchmark truth table, see main.get_results
+    "truth_agreement": MetricSpec("sim_scores.functional_metrics", "truth_agreement_metric", **_TRUTH),
+    "shared_functions": MetricSpec("sim_scores.functional_metrics", "shared_function_metric", **_TRUTH),
 }
+
+
+class LazyFunctionMap(MutableMapping):
+    """
+    Map metric names to their comparison functions, importing the module of a metric the first time its function is
+    looked up. Listing the names does not import anything. Entries may also be set to functions directly.
+    """
+
+    def __init__(self, specs: dict):
+        self._entries = dict(specs)
+
+    def __getitem__(self, name):
+        entry = self._entries[name]
+        if isinstance(entry, MetricSpec):
+            entry = getattr(importlib.import_module(entry.module), entry.function)
+            self._entries[name] = entry
+        return entry
+
+    def __setitem__(self, name, function):
+        self._entries[name] = function
+
+    def __delitem__(self, name):
+        del self._entries[name]
+
+    def __contains__(self, name):
+        # Mapping.__contains__ would look the function up, importing its module
+        return name in self._entries
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Map function names to actual function calls
+FUNCTION_MAP = LazyFunctionMap(METRICS)
+
+# Views of the registry by capability
+ARRAY_METRICS = {name for name, spec in METRICS.items() if spec.accepts_arrays}
+METRIC_GROUPS = {name: list(spec.members) for name, spec in METRICS.items() if spec.members}
+NETSIMILE_METRICS = {name for name, spec in METRICS.items() if spec.sampled}
+ORDER_INVARIANT_METRICS = {name for name, spec in METRICS.items() if spec.order_invariant}
+FEATURIZABLE_METRICS = {name for name, spec in METRICS.items() if spec.featurizable}
@@ -0,0 +1,235 @@
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import NamedTuple
+
+import numpy as np
+
+# Seconds without a heartbeat after which a claim is taken to be abandoned and its task is claimed again
+STALE_AFTER = 120.0
+
+
+class Claim(NamedTuple):
+    """A task claimed by this worker, token identifies the claim in its claim file."""
+    key: str
+    token: str
+    stop: threading.Event
+    lost: threading.Event
+
+
+def _to_json(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class WorkQueue:
+    """
+    Work queue over a shared directory: each task has a claim file and a done file, so workers on any number of hosts
+    share the tasks with no service other than the filesystem.
+
+    - A worker claims a task by creating <key>.claim with O_CREAT | O_EXCL, which succeeds for a single worker.
+    - While computing the task, a thread of the worker touches the claim file every heartbeat seconds.
+    - A finished task is written to <key>.done (a JSON value) with an atomic rename, then its claim file is removed.
+    - A claim whose file was not touched for stale_after seconds is abandoned (crashed or killed worker). The worker
+      that notices renames the claim file away, which succeeds for a single worker, and claims the task again. If the
+      renamed file is not the claim it saw stale, e.g. a fresh claim another worker created in the meantime, it is
+      put back.
+
+    Staleness is measured with the local clock from the first time a worker sees a claim file unchanged, so the clocks
+    of the hosts and of the file server need not agree. A worker that was only paused past stale_after notices that
+    its claim was lost with its next heartbeat, and run drops its result instead of writing it.
+
+    Tasks are claimed largest-first, free tasks before abandoned ones, so that the workers finish close together.
+    """
+
+    def __init__(self, path: str, keys: list, costs: dict = None, stale_after: float = STALE_AFTER,
+                 heartbeat: float = None):
+        """
+        Parameters:
+        -----------
+        path : str
+            The shared queue directory, created if needed.
+        keys : list of str
+            The tasks, used in file names.
+        costs : dict
+            The estimated cost of every task, tasks are claimed in order of decreasing cost.
+        stale_after : float
+            Seconds without a heartbeat after which a claim is abandoned.
+        heartbeat : float
+            Seconds between two heartbeats, stale_after / 4 by default.
+        """
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.keys = sorted(keys, key=lambda key: -costs[key]) if costs is not None else list(keys)
+        self.stale_after = stale_after
+        self.heartbeat = heartbeat if heartbeat is not None else stale_after / 4
+        self.worker = f"{socket.gethostname()}:{os.getpid()}"
+        # Claim files of other workers: key -> (mtime, token, local time it was first seen)
+        self._seen = {}
+
+    def _file(self, key: str, kind: str) -> str:
+        return os.path.join(self.path, f"{key}.{kind}")
+
+    def is_done(self, key: str) -> bool:
+        return os.path.exists(self._file(key, "done"))
+
+    def pending(self) -> list:
+        """Tasks that are not done yet."""
+        return [key for key in self.keys if not self.is_done(key)]
+
+    def _create_claim(self, key: str) -> Claim:
+        token = uuid.uuid4().hex
+        try:
+            descriptor = os.open(self._file(key, "claim"), os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return None
+        with os.fdopen(descriptor, "w") as file:
+            json.dump({"worker": self.worker, "token": token, "claimed": time.time()}, file)
+
+        claim = Claim(key, token, threading.Event(), threading.Event())
+        threading.Thread(target=self._beat, args=(claim,), daemon=True).start()
+        # Done between the check and the claim
+        if self.is_done(key):
+            self.release(claim)
+            return None
+        return claim
+
+    @staticmethod
+    def _token(path: str) -> str:
+        try:
+            with open(path, "r") as file:
+                return json.load(file)["token"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _owns(self, claim: Claim) -> bool:
+        return self._token(self._file(claim.key, "claim")) == claim.token
+
+    def _beat(self, claim: Claim):
+        while not claim.stop.wait(self.heartbeat):
+            if not self._owns(claim):
+                claim.lost.set()
+                return
+            try:
+                os.utime(self._file(claim.key, "claim"))
+            except OSError:
+                pass
+
+    def _is_stale(self, key: str) -> bool:
+        try:
+            mtime = os.stat(self._file(key, "claim")).st_mtime_ns
+        except FileNotFoundError:
+            self._seen.pop(key, None)
+            return False
+        now = time.monotonic()
+        seen_mtime, _, seen_at = self._seen.get(key, (None, None, None))
+        if seen_mtime != mtime:
+            self._seen[key] = (mtime, self._token(self._file(key, "claim")), now)
+            return False
+        return now - seen_at >= self.stale_after
+
+    def _reclaim(self, key: str) -> Claim:
+        claim_path = self._file(key, "claim")
+        stale_path = f"{claim_path}.stale.{uuid.uuid4().hex}"
+        stale_mtime, stale_token, _ = self._seen.pop(key)
+        try:
+            os.rename(claim_path, stale_path)
+        except FileNotFoundError:
+            # Reclaimed or finished by another worker
+            return None
+
+        try:
+            moved_mtime = os.stat(stale_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        if moved_mtime != stale_mtime or self._token(stale_path) != stale_token:
+            # Another worker reclaimed the task since it was seen stale, its live claim goes back unless the task
+            # was claimed once more in the meantime
+            try:
+                os.link(stale_path, claim_path)
+            except FileExistsError:
+                pass
+            os.remove(stale_path)
+            return None
+
+        os.remove(stale_path)
+        return self._create_claim(key)
+
+    def claim(self) -> Claim:
+        """Claim the largest free task, or else the largest abandoned task. Returns None if there is none."""
+        pending = self.pending()
+        for key in pending:
+            if not os.path.exists(self._file(key, "claim")):
+                claim = self._create_claim(key)
+                if claim is not None:
+                    return claim
+        for key in pending:
+            if self._is_stale(key):
+                claim = self._reclaim(key)
+                if claim is not None:
+                    return claim
+        return None
+
+    def complete(self, claim: Claim, value):
+        """Write the result of a claimed task and release its claim."""
+        done_path = self._file(claim.key, "done")
+        temporary_path = f"{done_path}.{uuid.uuid4().hex}.tmp"
+        with open(temporary_path, "w") as file:
+            json.dump(value, file, default=_to_json)
+        os.replace(temporary_path, done_path)
+        self.release(claim)
+
+    def release(self, claim: Claim):
+        """Stop the heartbeat of a claim and remove its claim file if it still holds it."""
+        claim.stop.set()
+        if self._owns(claim):
+            try:
+                os.remove(self._file(claim.key, "claim"))
+            except FileNotFoundError:
+                pass
+
+    def result(self, key: str):
+        with open(self._file(key, "done"), "r") as file:
+            return json.load(file)
+
+    def run(self, function, poll: float = None) -> int:
+        """
+        Claim and compute tasks until all tasks are done. While other workers hold the last tasks, poll every poll
+        seconds (heartbeat by default) for abandoned ones.
+
+        Parameters:
+        -----------
+        function : callable
+            Computes the JSON-serializable result of a task from its key.
+        poll : float
+            Seconds between two looks for abandoned tasks.
+
+        Returns:
+        --------
+        count : int
+            The number of tasks this worker completed.
+        """
+        count = 0
+        while True:
+            claim = self.claim()
+            if claim is None:
+                if not self.pending():
+                    return count
+                time.sleep(poll if poll is not None else self.heartbeat)
+                continue
+            try:
+                value = function(claim.key)
+            except BaseException:
+                # Leave the task to another worker
+                self.release(claim)
+                raise
+            if claim.lost.is_set() or not self._owns(claim):
+                # The task was claimed again while this worker was paused, the new claim writes its result
+                self.release(claim)
+                continue
+            self.complete(claim, value)
+            count += 1